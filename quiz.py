@@ -1,183 +1,165 @@
-import re
-import random
+import argparse
+import getpass
 import os
+import sqlite3
+import time
+import uuid
+
+import numpy as np
+
+import quiz_cache
+import quiz_dedup
+import quiz_grade
+import quiz_metrics
+import quiz_paper
+import quiz_parser
+import quiz_review
+import quiz_search
+import quiz_source
+import quiz_static
+import quiz_stats
+import quiz_weighted
 
 
 class QuizSystem:
-    def __init__(self, filename="tiku.txt"):
+    def __init__(self, filename="tiku.txt", user=None, chapters=None, pages=None):
+        # filename 也可以是题库目录，目录下每个 .txt / .docx 是一个分库
         self.filename = filename
-        self.single_choice_questions = []
-        self.multi_choice_questions = []
+        self.bank = None
         self.raw_data = ""
-
-    def load_file(self):
+        # 复习记录按用户分开保存，默认用系统登录名
+        self.user = user or getpass.getuser()
+        self.review = None
+        self.log = None
+        # 只出这些章节 / 页码区间的题（按答案解析里的出处），None 为不限
+        self.chapters = chapters
+        self.pages = pages
+
+    def _check_file(self):
         if not os.path.exists(self.filename):
             print(f"错误：未找到文件 '{self.filename}'。")
             print("请创建一个名为 tiku.txt 的文件，并将题库内容粘贴进去。")
             return False
+        return True
+
+    def load_file(self):
+        if not self._check_file():
+            return False
 
         try:
-            with open(self.filename, 'r', encoding='utf-8') as f:
-                self.raw_data = f.read()
+            # 只读一次文件，UTF-8 / GBK (Windows) 编码在内存中探测
+            self.raw_data = quiz_parser.read_bank_text(self.filename)
             return True
-        except UnicodeDecodeError:
-            # Fallback for Windows encoding
-            try:
-                with open(self.filename, 'r', encoding='gbk') as f:
-                    self.raw_data = f.read()
-                return True
-            except Exception as e:
-                print(f"读取文件出错: {e}")
-                return False
+        except (OSError, ValueError) as e:
+            print(f"读取文件出错: {e}")
+            return False
 
     def parse_questions(self):
         print("正在解析题库...")
-        lines = self.raw_data.split('\n')
-
-        current_section = None  # 'single', 'multi', or None
-        current_q = None
-
-        # Regex patterns
-        # 匹配标题，如 "一、单项选择题"
-        section_pat = re.compile(r'^[一二三四]、\s*(.*)')
-        # 匹配题目开头，如 "1.关于..." 或 "10."
-        q_start_pat = re.compile(r'^(\d+)\s*[.．](.*)')
-        # 匹配选项，如 "A.xxx" 或 "A．xxx"
-        opt_start_pat = re.compile(r'^\s*([A-E])\s*[.．]\s*(.*)')
-        # 匹配答案，如 "答案：B" 或 "答案: ACD"
-        ans_pat = re.compile(r'^\s*答案\s*[：:]\s*([A-E]+)', re.IGNORECASE)
-        # 匹配解析
-        expl_pat = re.compile(r'^\s*答案解析\s*[：:]\s*(.*)')
-
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-
-            # 1. Check Section Header
-            sec_match = section_pat.match(line)
-            if sec_match:
-                title = sec_match.group(1)
-                if "单项" in title:
-                    current_section = 'single'
-                elif "多项" in title:
-                    current_section = 'multi'
-                else:
-                    current_section = 'ignore'  # 忽略判断题和简答题
-                # 保存上一个题目（如果存在）
-                if current_q:
-                    self._save_question(current_q)
-                    current_q = None
-                continue
-
-            if current_section == 'ignore':
-                continue
-
-            # 2. Check Question Start
-            q_match = q_start_pat.match(line)
-            if q_match:
-                # Save previous question
-                if current_q:
-                    self._save_question(current_q)
-
-                # Start new question
-                current_q = {
-                    'type': current_section,
-                    'id': q_match.group(1),
-                    'content': q_match.group(2),
-                    'options': {},
-                    'answer': '',
-                    'explanation': ''
-                }
-                continue
+        with quiz_metrics.timed('parse', source='cli'):
+            bank = quiz_cache.CompiledBank.from_questions(quiz_parser.iter_text_questions(self.raw_data))
+        self.bank = quiz_cache.MultiBank([bank], [quiz_cache.bank_tag(self.filename)])
+        self._print_counts()
+
+    def load_questions(self):
+        """优先直接加载编译缓存 (tiku.txt.qbank)，缓存过期才重新解析（多个文件时并行）"""
+        if not self._check_file():
+            return False
 
-            # 3. Check Data within a question
-            if current_q:
-                # Check Answer
-                ans_match = ans_pat.match(line)
-                if ans_match:
-                    current_q['answer'] = ans_match.group(1).upper()
-                    continue
-
-                # Check Explanation
-                expl_match = expl_pat.match(line)
-                if expl_match:
-                    current_q['explanation'] = expl_match.group(1)
-                    continue  # Assuming explanation is the last part usually
-
-                # Check Options
-                # 处理一行可能有多个选项的情况 (e.g., A.xxx B.xxx)
-                # 使用正则查找行内所有 "A. " 模式
-                # Pattern look for Letter+Dot followed by content until next Letter+Dot or End
-                inline_opts = list(re.finditer(r'([A-E])\s*[.．]\s*(.*?)(?=\s+[A-E]\s*[.．]|$)', line))
-
-                if inline_opts:
-                    for m in inline_opts:
-                        key = m.group(1)
-                        val = m.group(2).strip()
-                        current_q['options'][key] = val
-                elif not line.startswith("答案"):
-                    # 如果不是选项开头，也不是答案，可能是题目内容的换行
-                    # 但也要防止解析内容被误加
-                    if not current_q['answer']:
-                        # 还没找到答案，说明这行属于题目描述或者上一行选项的延续
-                        # 简单的逻辑：如果没有选项，拼接到题目；如果有选项，拼接到最后一个选项
-                        if not current_q['options']:
-                            current_q['content'] += "\n" + line
-                        else:
-                            # 拼接到最后一个选项
-                            last_key = sorted(current_q['options'].keys())[-1]
-                            current_q['options'][last_key] += " " + line
-
-        # Save the very last question
-        if current_q:
-            self._save_question(current_q)
-
-        print(
-            f"解析完成！共加载 {len(self.single_choice_questions)} 道单选题，{len(self.multi_choice_questions)} 道多选题。")
-
-    def _save_question(self, q):
-        if q['type'] == 'single':
-            self.single_choice_questions.append(q)
-        elif q['type'] == 'multi':
-            self.multi_choice_questions.append(q)
+        try:
+            self.bank = quiz_cache.load_banks(self.filename)
+        except (OSError, ValueError) as e:
+            print(f"读取文件出错: {e}")
+            return False
+        self._print_counts()
+        return True
+
+    def _print_counts(self):
+        single, multi, judge = self.bank.counts()
+        print(f"解析完成！共加载 {single} 道单选题，{multi} 道多选题。")
+        if len(self.bank.tags) > 1:
+            print(f"共 {len(self.bank.tags)} 个分库：{'、'.join(self.bank.tags)}")
+
+    def _choose_tags(self):
+        """多个分库时让用户选择范围，直接回车为全部"""
+        tags = self.bank.tags
+        if len(tags) <= 1:
+            return None
+        for i, tag in enumerate(tags, 1):
+            print(f"  {i}: {tag}")
+        picked = input("请选择分库编号（可多个，空格分隔，直接回车为全部）: ").split()
+        chosen = [tags[int(p) - 1] for p in picked if p.isdigit() and 0 < int(p) <= len(tags)]
+        return chosen or None
 
     def run_quiz(self):
         print("\n" + "=" * 30)
         print("    习概题库随机刷题系统")
         print("=" * 30)
 
+        try:
+            self.review = quiz_review.ReviewStore()
+            self.log = quiz_review.AnswerLog(self.review)
+            print(f"用户 {self.user}：当前有 {self.review.due_count(self.user)} 道题到期待复习")
+        except sqlite3.Error as e:
+            print(f"复习记录不可用 ({e})，本次作答不会保存。")
+
         while True:
-            mode = input("\n请选择题型 (1: 单选题, 2: 多选题, 3: 混合模式, q: 退出): ").strip()
+            mode = input("\n请选择题型 (1: 单选题, 2: 多选题, 3: 混合模式, 4: 复习模式, 5: 错题优先, q: 退出): ").strip()
             if mode == 'q':
                 break
 
-            pool = []
+            # 题目池只是题号，真正出题时才从题库解码
             if mode == '1':
-                pool = self.single_choice_questions
+                q_types = ('single',)
             elif mode == '2':
-                pool = self.multi_choice_questions
-            elif mode == '3':
-                pool = self.single_choice_questions + self.multi_choice_questions
+                q_types = ('multi',)
+            elif mode in ('3', '4', '5'):
+                q_types = ('single', 'multi')
             else:
                 print("无效输入")
                 continue
 
-            if not pool:
+            tags = self._choose_tags()
+            limited = self.chapters is not None or self.pages is not None
+            if limited:
+                # 出处索引只建一次，之后按章节 / 页码筛题只是数组运算
+                source_mask = quiz_source.index_for(self.bank).mask(self.chapters, self.pages)
+                pool_size = int((quiz_weighted.pool_mask(self.bank, q_types, tags)[0] & source_mask).sum())
+            else:
+                counts = dict(zip(quiz_cache.TYPES, self.bank.counts(tags)))
+                pool_size = sum(counts[t] for t in q_types)
+            if not pool_size:
                 print("当前题库为空，无法开始。")
                 continue
 
             try:
-                num = int(input(f"请输入刷题数量 (最大 {len(pool)}): "))
+                num = int(input(f"请输入刷题数量 (最大 {pool_size}): "))
             except ValueError:
                 num = 5
 
-            num = min(num, len(pool))
-            quiz_set = random.sample(pool, num)
+            if mode in ('4', '5') and self.review is not None:
+                self.log.flush()  # 上一轮的作答先落盘，记录才是最新的
+            if mode == '4' and self.review is not None:
+                # 复习模式：先出到期最久的题，不够再补新题
+                quiz_ids = quiz_review.pick_review(self.review, self.bank, self.user, q_types, num, tags=tags)
+            elif mode == '5' and self.review is not None:
+                # 错题优先：按历史错误率和距上次作答的时间加权抽题
+                weights = quiz_weighted.error_weights(self.bank, self.review.answer_stats(self.user))
+                if limited:
+                    weights *= source_mask
+                quiz_ids = quiz_weighted.weighted_sample(self.bank, weights, q_types, num, tags=tags)
+            elif limited:
+                quiz_ids = quiz_source.sample(self.bank, q_types, num, self.chapters, self.pages, tags=tags)
+            else:
+                quiz_ids = self.bank.sample(q_types, num, tags=tags)
+            num = len(quiz_ids)
 
             score = 0
+            session = uuid.uuid4().hex[:12]
             print(f"\n=== 开始测试 (共 {num} 题) ===")
 
-            for idx, q in enumerate(quiz_set, 1):
+            for idx, q_id in enumerate(quiz_ids, 1):
+                q = self.bank.question(q_id)
                 q_type_str = "单选" if q['type'] == 'single' else "多选"
                 print(f"\n[{idx}/{num}] 【{q_type_str}】 {q['content']}")
 
@@ -185,28 +167,319 @@ class QuizSystem:
                 for key in sorted_keys:
                     print(f"  {key}. {q['options'][key]}")
 
+                shown_at = time.monotonic()
                 user_ans = input("请输入答案: ").strip().upper()
-                # 去除可能的空格或标点，只保留字母
-                user_ans_clean = "".join(filter(str.isalpha, user_ans))
-                # 多选题自动排序比较 (比如输入BA，自动变成AB进行比对)
-                user_ans_sorted = "".join(sorted(user_ans_clean))
-                correct_ans_sorted = "".join(sorted(q['answer']))
-
-                if user_ans_sorted == correct_ans_sorted:
+                latency = time.monotonic() - shown_at
+                # 去除可能的空格或标点，只保留字母；多选题自动排序比较 (比如输入BA，自动变成AB进行比对)
+                # 批量阅卷 (quiz.py grade) 用的是同一个规范化函数
+                user_ans_sorted = quiz_grade.normalize_answer(user_ans)
+                correct_ans_sorted = quiz_grade.normalize_answer(q['answer'])
+
+                is_correct = (user_ans_sorted == correct_ans_sorted)
+                if is_correct:
                     print("✅ 回答正确！")
                     score += 1
                 else:
                     print(f"❌ 回答错误。正确答案是: {q['answer']}")
                     if q['explanation']:
                         print(f"   解析: {q['explanation']}")
+                if self.log is not None:
+                    # 只入队，后台线程写库并更新复习时间
+                    self.log.submit(self.user, self.bank.key(q_id), user_ans_sorted, is_correct, latency,
+                                    session=session, q_id=q_id, bank=self.bank.version)
 
             print(f"\n测试结束！你的得分: {score}/{num} ({(score / num) * 100:.1f}%)")
 
+        if self.log is not None:
+            self.log.close()
 
-if __name__ == "__main__":
-    app = QuizSystem()
-    if app.load_file():
-        app.parse_questions()
+
+def build_cache(paths, force=False, jobs=None):
+    """部署时预编译题库缓存，之后启动直接加载 .qbank 文件；目录下的多个题库并行编译"""
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            banks = quiz_cache.load_banks(path, workers=jobs, force=force)
+        except (OSError, ValueError) as e:
+            print(f"{path}: 编译失败 ({e})")
+            continue
+        for filename, bank in zip(quiz_cache.bank_files(path), banks.banks):
+            single, multi, judge = bank.counts()
+            print(f"{filename} -> {quiz_cache.cache_path(filename)}: 单选 {single}，多选 {multi}，判断 {judge}")
+        print(f"{path}: {len(banks.banks)} 个题库，共 {len(banks)} 题（{time.perf_counter() - start:.2f} 秒）")
+        banks.close()
+
+
+def _load_banks(path):
+    """子命令用的题库；文件缺失或读不了时打印错误并返回 None"""
+    try:
+        return quiz_cache.load_banks(path)
+    except (OSError, ValueError) as e:
+        print(f"读取文件出错: {e}")
+        return None
+
+
+def show_stats(path, top=10, rebuild=False):
+    """批处理：重算各题难度 / 区分度，列出最难、区分度最低和疑似答案有误的题"""
+    bank = _load_banks(path)
+    if bank is None:
+        return
+    store = quiz_review.ReviewStore()
+    if rebuild:
+        store.rebuild_question_stats()
+    count = quiz_stats.refresh_irt(store)
+    arrays = quiz_stats.item_arrays(store, bank)
+    print(f"已根据作答记录估计 {count} 道题的难度和区分度（作答不足 {quiz_stats.MIN_ATTEMPTS} 次的题不参与排名）。")
+
+    def line(i):
+        q = bank.question(i)
+        attempts = arrays['attempts'][i]
+        rate = arrays['correct'][i] / attempts * 100
+        return (f"  [{q['id']}] 难度 {arrays['difficulty'][i]:+.2f}，区分度 {arrays['discrimination'][i]:+.2f}，"
+                f"正确率 {rate:.0f}% ({attempts} 次)  {q['content'][:40]}")
+
+    print("\n最难的题：")
+    for i in quiz_stats.ranked(arrays, 'difficulty', top):
+        print(line(i))
+    print("\n区分度最低的题：")
+    for i in quiz_stats.ranked(arrays, 'discrimination', top, descending=False):
+        print(line(i))
+    print("\n疑似答案有误（干扰项比标准答案选的人还多）：")
+    for i, answer, picks in quiz_stats.suspicious_keys(bank, arrays)[:top]:
+        chosen = "，".join(f"{k}:{c}" for k, c in zip(quiz_cache.OPTION_KEYS, picks) if c)
+        print(f"  [{bank.question(i)['id']}] 答案 {answer}，各选项被选次数 {chosen}  {bank.question(i)['content'][:40]}")
+    bank.close()
+    store.close()
+
+
+def find_duplicates(path, threshold=quiz_dedup.THRESHOLD, collapse_to=None):
+    """跨分库查找近似重复题并列出重复簇；指定 collapse_to 时答案一致的簇只保留第一题，写出合并后的题库"""
+    start = time.perf_counter()
+    bank = _load_banks(path)
+    if bank is None:
+        return
+    questions = [bank.question(i) for i in range(len(bank))]
+    clusters = quiz_dedup.find_duplicates(questions, threshold)
+    print(f"共 {len(questions)} 题，发现 {len(clusters)} 组近似重复（{time.perf_counter() - start:.2f} 秒）")
+    for n, cluster in enumerate(clusters, 1):
+        answers = {questions[i]['answer'] for i in cluster}
+        note = "，答案不一致！" if len(answers) > 1 else ""
+        print(f"\n第 {n} 组（{len(cluster)} 题{note}）")
+        for i in cluster:
+            q = questions[i]
+            print(f"  [{q['tag']} {q['id']}] 答案 {q['answer']}  {q['content'][:50]}")
+    if collapse_to:
+        # 答案不一致的组可能只是题干相近的不同题，留给人工判断，不自动合并
+        same = [c for c in clusters if len({questions[i]['answer'] for i in c}) == 1]
+        kept = [questions[i] for i in quiz_dedup.collapse(len(questions), same)]
+        with open(collapse_to, 'w', encoding='utf-8') as f:
+            f.write(quiz_parser.format_questions(kept))
+        print(f"\n已去重：保留 {len(kept)} 题，写入 {collapse_to}")
+    bank.close()
+
+
+def search_bank(path, query, top=10):
+    """按关键词搜索题目（题干、选项、解析），列出题目、选项和答案"""
+    bank = _load_banks(path)
+    if bank is None:
+        return
+    start = time.perf_counter()
+    quiz_search.index_for(bank)
+    built = time.perf_counter()
+    results = quiz_search.search(bank, query, top)
+    print(f"加载 {len(bank)} 题的索引用时 {built - start:.2f} 秒，查询用时 {(time.perf_counter() - built) * 1000:.1f} 毫秒，"
+          f"找到 {len(results)} 题：")
+    for i, _ in results:
+        q = bank.question(i)
+        print(f"\n[{q['tag']} {q['id']}] {q['content']}")
+        if q['type'] != 'judge':
+            for key, value in sorted(q['options'].items()):
+                print(f"  {key}. {value}")
+        answer = {'A': '对', 'B': '错'}.get(q['answer'], q['answer']) if q['type'] == 'judge' else q['answer']
+        print(f"  答案：{answer}")
+        if q['explanation']:
+            print(f"  解析：{q['explanation']}")
+    bank.close()
+
+
+def show_chapters(path, top=20):
+    """列出各章题数、页码范围、引用的其他文件，以及解析里认不出出处的题"""
+    bank = _load_banks(path)
+    if bank is None:
+        return
+    index = quiz_source.index_for(bank)
+    print("各章题数：")
+    for chapter, count in index.chapter_counts():
+        print(f"  {quiz_parser.chapter_label(chapter)}: {count} 题")
+    pages = index.page_range()
+    if pages:
+        print(f"页码范围：第 {pages[0]} - {pages[1]} 页")
+    if index.documents:
+        print("引用的其他文件：")
+        for doc, ids in sorted(index.documents.items(), key=lambda item: -len(item[1])):
+            print(f"  《{doc}》: {len(ids)} 题")
+    unresolved = index.unresolved()
+    print(f"\n认不出出处的题：{len(unresolved)} 道")
+    for i in unresolved[:top].tolist():
+        q = bank.question(i)
+        print(f"  [{q['tag']} {q['id']}] {q['content'][:30]}  解析：{q['explanation'][:40] or '（无）'}")
+    if len(unresolved) > top:
+        print(f"  ……其余 {len(unresolved) - top} 道未列出（--top 调整）")
+    bank.close()
+
+
+def make_papers(path, count, quotas, chapters=None, per_chapter=1, max_overlap=quiz_paper.MAX_OVERLAP,
+                out_dir="papers", title="试卷", seed=None):
+    """批量组卷：按题型配额、章节覆盖和重复率上限生成 count 套试卷，连同答案卷写到 out_dir"""
+    bank = _load_banks(path)
+    if bank is None:
+        return
+    start = time.perf_counter()
+    try:
+        papers = quiz_paper.generate_papers(bank, count, quotas, chapters, per_chapter, max_overlap,
+                                            rng=np.random.default_rng(seed))
+    except ValueError as e:
+        print(f"组卷失败：{e}")
+        bank.close()
+        return
+    built = time.perf_counter()
+    quiz_paper.export_papers(bank, papers, out_dir, title)
+    print(f"已生成 {count} 套试卷（组卷 {built - start:.2f} 秒，导出 {time.perf_counter() - built:.2f} 秒），"
+          f"写入 {out_dir}/：每套一份试卷和一份答案，papers.json 为阅卷用的答案清单")
+    bank.close()
+
+
+def grade_sheets(papers_path, sheets_path, paper=None, points=None, out="成绩.csv", summary_out="各题统计.csv"):
+    """批量阅卷：按 papers.json 给答题卡 (CSV / JSONL) 判分，写出学生成绩和各题统计"""
+    start = time.perf_counter()
+    try:
+        papers = quiz_grade.load_papers(papers_path)
+        if paper is None and len(papers) == 1:
+            paper = next(iter(papers))
+        students, summary = quiz_grade.grade(papers, quiz_grade.read_sheets(sheets_path, paper), points)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"阅卷失败：{e}")
+        return
+    quiz_grade.write_csv(out, students, ['student', 'paper', 'score', 'total', 'correct', 'answered'])
+    quiz_grade.write_csv(summary_out, summary, ['paper', 'no', 'label', 'type', 'answer', 'count', 'correct',
+                                                'blank', 'top_wrong', 'key'])
+    print(f"共批阅 {len(students)} 份答题卡（{time.perf_counter() - start:.2f} 秒），成绩写入 {out}，各题统计写入 {summary_out}")
+    if students:
+        scores = [s['score'] for s in students]
+        print(f"平均分 {sum(scores) / len(scores):.1f}，最高 {max(scores):g}，最低 {min(scores):g}（满分 {students[0]['total']:g}）")
+    hardest = sorted((q for q in summary if q['count']), key=lambda q: q['correct'] / q['count'])[:5]
+    if hardest:
+        print("正确率最低的题：")
+        for q in hardest:
+            print(f"  {q['paper']} {q['label']}：正确率 {q['correct'] / q['count']:.0%}，"
+                  f"答案 {q['answer']}，最多人错选 {q['top_wrong'] or '-'}")
+
+
+def export_bundle(path, out_dir="bundle", title="习概刷题", chunk_size=quiz_static.CHUNK_SIZE):
+    """导出离线静态题库包：抽题和判分都在浏览器里完成，任何静态文件服务都能托管"""
+    bank = _load_banks(path)
+    if bank is None:
+        return
+    start = time.perf_counter()
+    n, chunks = quiz_static.export_bundle(bank, out_dir, title, chunk_size)
+    size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(out_dir) for f in files)
+    print(f"已导出 {n} 题（{chunks} 个数据块，共 {size / 1024:.0f} KB，{time.perf_counter() - start:.2f} 秒）到 {out_dir}/")
+    print(f"本机预览：python -m http.server -d {out_dir} 8000，然后打开 http://localhost:8000/")
+    bank.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="习概题库随机刷题系统（不带参数时进入交互刷题）")
+    parser.add_argument("--bank", default="tiku.txt", help="交互刷题用的题库文件或题库目录，默认 tiku.txt")
+    parser.add_argument("--user", default=None, help="复习记录的用户名，默认系统登录名")
+    parser.add_argument("--chapter", default=None, help="只出这些章节的题，如 \"导论 第九章 15\"")
+    parser.add_argument("--pages", default=None, help="只出教材这些页的题，如 120-150")
+    sub = parser.add_subparsers(dest="command")
+    p = sub.add_parser("build-cache", help="预编译题库缓存（部署时执行）")
+    p.add_argument("files", nargs="*", default=["tiku.txt"], help="题库文件（.txt 或 .docx）或题库目录，默认 tiku.txt")
+    p.add_argument("--force", action="store_true", help="忽略已有缓存，强制重新解析")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="并行解析的进程数，默认 CPU 核数")
+    p = sub.add_parser("stats", help="根据作答记录分析题目难度、区分度和疑似错误答案")
+    p.add_argument("--top", type=int, default=10, help="每项列出的题数，默认 10")
+    p.add_argument("--rebuild", action="store_true", help="先按原始作答日志重算累计统计")
+    p = sub.add_parser("dedup", help="查找各分库之间的近似重复题，可选合并去重")
+    p.add_argument("--threshold", type=float, default=quiz_dedup.THRESHOLD, help="相似度阈值 (0-1)，默认 0.8")
+    p.add_argument("--collapse", metavar="OUT", default=None, help="答案一致的重复组只保留第一题，写出去重后的题库文本")
+    p = sub.add_parser("search", help="按关键词搜索题目（题干、选项、解析）")
+    p.add_argument("query", nargs="+", help="关键词，如 六个必须坚持")
+    p.add_argument("--top", type=int, default=10, help="最多列出的题数，默认 10")
+    p = sub.add_parser("chapters", help="按答案解析里的出处统计各章题数，列出认不出出处的题")
+    p.add_argument("--top", type=int, default=20, help="最多列出的未识别题数，默认 20")
+    p = sub.add_parser("papers", help="批量组卷（可配合 --chapter 限定并覆盖章节），导出试卷和答案")
+    p.add_argument("-n", "--count", type=int, default=10, help="试卷套数，默认 10")
+    for q_type, name in (("single", "单选"), ("multi", "多选"), ("judge", "判断")):
+        p.add_argument(f"--{q_type}", type=int, default=quiz_paper.DEFAULT_QUOTAS[q_type],
+                       help=f"每套{name}题数，默认 {quiz_paper.DEFAULT_QUOTAS[q_type]}")
+    p.add_argument("--per-chapter", type=int, default=1, help="指定 --chapter 时每套每章至少几题，默认 1")
+    p.add_argument("--max-overlap", type=float, default=quiz_paper.MAX_OVERLAP,
+                   help="任意两套试卷重复题数占比上限 (0-1)，默认 0.3")
+    p.add_argument("--out", default="papers", help="输出目录，默认 papers")
+    p.add_argument("--title", default="试卷", help="试卷文件名前缀，默认 试卷")
+    p.add_argument("--seed", type=int, default=None, help="随机种子，相同种子生成相同的试卷")
+    p = sub.add_parser("grade", help="批量阅卷：按组卷导出的 papers.json 给答题卡 (CSV / JSONL) 判分")
+    p.add_argument("papers", help="试卷定义 papers.json")
+    p.add_argument("sheets", help="答题卡：CSV（student、paper 列，其余按卷面顺序每题一列）或 JSONL")
+    p.add_argument("--paper", default=None, help="答题卡里没写试卷名时使用的试卷")
+    p.add_argument("--points", type=float, nargs=3, metavar=("单选", "多选", "判断"), default=None,
+                   help="各题型每题分值，默认都是 1")
+    p.add_argument("--out", default="成绩.csv", help="学生成绩输出文件，默认 成绩.csv")
+    p.add_argument("--summary", default="各题统计.csv", help="各题统计输出文件，默认 各题统计.csv")
+    p = sub.add_parser("bundle", help="导出离线静态题库包（浏览器内抽题判分，可放在任意静态文件服务上）")
+    p.add_argument("--out", default="bundle", help="输出目录，默认 bundle")
+    p.add_argument("--title", default="习概刷题", help="页面标题，默认 习概刷题")
+    p.add_argument("--chunk", type=int, default=quiz_static.CHUNK_SIZE,
+                   help=f"每个数据块的题数，默认 {quiz_static.CHUNK_SIZE}")
+    args = parser.parse_args(argv)
+
+    if args.command == "build-cache":
+        build_cache(args.files, force=args.force, jobs=args.jobs)
+        return
+    if args.command == "stats":
+        show_stats(args.bank, top=args.top, rebuild=args.rebuild)
+        return
+
+    if args.command == "dedup":
+        find_duplicates(args.bank, threshold=args.threshold, collapse_to=args.collapse)
+        return
+
+    if args.command == "search":
+        search_bank(args.bank, " ".join(args.query), top=args.top)
+        return
+
+    if args.command == "grade":
+        points = dict(zip(quiz_cache.TYPES, args.points)) if args.points else None
+        grade_sheets(args.papers, args.sheets, args.paper, points, out=args.out, summary_out=args.summary)
+        return
+    if args.command == "bundle":
+        export_bundle(args.bank, args.out, args.title, max(1, args.chunk))
+        return
+    if args.command == "chapters":
+        show_chapters(args.bank, top=args.top)
+        return
+
+    chapters = None if args.chapter is None else quiz_source.parse_chapters(args.chapter)
+    if chapters is not None and not chapters:
+        # 认不出的章节名会被忽略；全都认不出时不能当成“不限章节”或“没有题”，直接报错
+        parser.error("--chapter 里没有认出任何章节，可写 导论 / 第九章 / 九 / 9")
+    pages = None if args.pages is None else quiz_source.parse_pages(args.pages)
+    if args.pages is not None and pages is None:
+        parser.error("--pages 的格式应为 起始页-结束页，如 120-150")
+    if args.command == "papers":
+        quotas = {"single": args.single, "multi": args.multi, "judge": args.judge}
+        make_papers(args.bank, args.count, quotas, chapters, args.per_chapter, args.max_overlap,
+                    out_dir=args.out, title=args.title, seed=args.seed)
+        return
+    app = QuizSystem(args.bank, user=args.user, chapters=chapters, pages=pages)
+    if app.load_questions():
         app.run_quiz()
 
     input("\n按回车键退出...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+
+import quiz_cache
+import quiz_grade
+import quiz_metrics
+import quiz_review
+import quiz_source
+import quiz_weighted
+
+# ===========================
+# 轻量 JSON 接口（asyncio，单进程单线程）
+# ===========================
+# 给移动端用：不经过 Streamlit，每次请求只做一次字典查找和一道题的解码。
+#   POST /quiz                     {"mode", "num", "tags", "user", "chapters", "pages"} -> {"session", "total"}
+#   GET  /quiz/<session>/question  当前题（不含答案）
+#   POST /quiz/<session>/answer    {"answer": "AB"} -> 对错、正确答案、解析、当前得分
+#   GET  /quiz/<session>           进度和得分
+#   GET  /health
+#   GET  /metrics                  Prometheus 文本格式的热点计时（设置 QUIZ_METRICS 时才有）
+# 题库与网页端相同（QUIZ_BANK，进程级共享、文件变化时原子替换），作答同样经 AnswerLog 异步写库。
+# 会话状态放在服务端，每个会话只有几个整数和一个题号数组（__slots__），空闲超时或超过上限时淘汰最旧的。
+# HTTP 部分直接用 asyncio.start_server 解析（支持 keep-alive），不引入额外依赖。
+
+BANK_PATH = os.environ.get("QUIZ_BANK", "tiku.txt")
+MAX_SESSIONS = 100000
+SESSION_TTL = 6 * 3600       # 秒：超过这么久没有请求的会话被淘汰
+MAX_BODY = 64 << 10
+MODES = {
+    'single': ('single',),
+    'multi': ('multi',),
+    'judge': ('judge',),
+    'mixed': ('single', 'multi', 'judge'),
+    'review': ('single', 'multi', 'judge'),
+    'weighted': ('single', 'multi', 'judge'),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _string_list(value, name):
+    """请求里的字符串列表（如分库标签）；传成单个字符串会被逐字匹配，直接拒绝"""
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} 应为字符串列表")
+    return value
+
+
+def _int_list(value, name, length=None):
+    """请求里的整数列表（章号、页码区间），元素可以是整数或数字字符串"""
+    if value is None:
+        return None
+    if (not isinstance(value, list) or (length is not None and len(value) != length)
+            or not all(isinstance(v, int) and not isinstance(v, bool) or isinstance(v, str) and v.strip().isdigit()
+                       for v in value)):
+        shape = f"含 {length} 个整数的列表" if length else "整数列表"
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} 应为{shape}")
+    return [int(v) for v in value]
+
+
+class Session:
+    """一次测验的服务端状态"""
+    __slots__ = ('bank', 'ids', 'idx', 'score', 'user', 'shown_at', 'touched')
+
+    def __init__(self, bank, ids, user):
+        self.bank = bank          # 出题时的题库版本号
+        self.ids = ids            # 题号数组 (uint32)
+        self.idx = 0
+        self.score = 0
+        self.user = user
+        self.shown_at = None
+        self.touched = time.monotonic()
+
+
+class QuizService:
+    """接口逻辑，与 HTTP 无关，便于单独调用"""
+
+    def __init__(self, bank_path=BANK_PATH, review=True):
+        self.banks = quiz_cache.BankStore(bank_path)
+        self.review = None
+        self.log = None
+        if review:
+            try:
+                self.review = quiz_review.ReviewStore()
+                self.log = quiz_review.AnswerLog(self.review)
+            except sqlite3.Error:
+                pass
+        self.sessions = OrderedDict()
+        quiz_metrics.gauge('active_sessions', lambda: len(self.sessions), source='api')
+
+    def _session(self, sid):
+        session = self.sessions.get(sid)
+        if session is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, "会话不存在或已过期")
+        session.touched = time.monotonic()
+        self.sessions.move_to_end(sid)
+        return session
+
+    def _bank(self, session):
+        bank = self.banks.get(session.bank)
+        if bank is None:
+            raise ApiError(HTTPStatus.GONE, "题库已更新，请重新开始测验")
+        return bank
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.sessions:
+            sid, session = next(iter(self.sessions.items()))
+            if len(self.sessions) <= MAX_SESSIONS and now - session.touched < SESSION_TTL:
+                break
+            del self.sessions[sid]
+
+    def create(self, mode='mixed', num=20, tags=None, user='', chapters=None, pages=None):
+        """开始一次测验，返回 {'session', 'total'}"""
+        return self.open(*self.draw(mode, num, tags, user, chapters, pages))
+
+    @quiz_metrics.instrument('start_quiz', source='api')
+    def draw(self, mode='mixed', num=20, tags=None, user='', chapters=None, pages=None):
+        """
+        出题，返回 (题库版本号, 题号数组, 用户)。可能重新加载题库、等作答日志落盘、查复习库，
+        HTTP 服务里放到线程中调用；不碰会话表，线程安全。
+        """
+        if mode not in MODES:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"mode 应为 {', '.join(MODES)} 之一")
+        try:
+            num = max(1, min(int(num), 500))
+        except (TypeError, ValueError):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "num 应为整数")
+        tags = _string_list(tags, "tags")
+        chapters = _int_list(chapters, "chapters")
+        pages = _int_list(pages, "pages", length=2)
+        chapters = None if chapters is None else set(chapters)
+        pages = None if pages is None else (min(pages), max(pages))
+        q_types = MODES[mode]
+        bank = self.banks.current()
+        user = str(user or '').strip()
+        limited = chapters is not None or pages is not None
+        if mode in ('review', 'weighted'):
+            if not user or self.review is None:
+                raise ApiError(HTTPStatus.BAD_REQUEST, "复习 / 错题优先模式需要 user")
+            self.log.flush()
+        if mode == 'review':
+            ids = quiz_review.pick_review(self.review, bank, user, q_types, num, tags=tags)
+        elif mode == 'weighted':
+            weights = quiz_weighted.error_weights(bank, self.review.answer_stats(user))
+            if limited:
+                weights *= quiz_source.index_for(bank).mask(chapters, pages)
+            ids = quiz_weighted.weighted_sample(bank, weights, q_types, num, tags=tags)
+        elif limited:
+            ids = quiz_source.sample(bank, q_types, num, chapters, pages, tags=tags)
+        else:
+            ids = bank.sample(q_types, num, tags=tags)
+        if not ids:
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY, "没有符合条件的题目")
+        return bank.version, ids, user
+
+    def open(self, version, ids, user):
+        """登记新会话（只在事件循环线程里调用）"""
+        sid = secrets.token_urlsafe(12)
+        self.sessions[sid] = Session(version, ids, user)
+        self._evict()
+        return {'session': sid, 'total': len(ids)}
+
+    def status(self, sid):
+        session = self._session(sid)
+        return {'index': session.idx, 'total': len(session.ids), 'score': session.score,
+                'finished': session.idx >= len(session.ids)}
+
+    def question(self, sid):
+        session = self._session(sid)
+        if session.idx >= len(session.ids):
+            return self.status(sid)
+        q = self._bank(session).question(session.ids[session.idx])
+        if session.shown_at is None:
+            session.shown_at = time.time()
+        return {'index': session.idx, 'total': len(session.ids), 'type': q['type'], 'content': q['content'],
+                'options': q['options'], 'tag': q['tag'], 'finished': False}
+
+    @quiz_metrics.instrument('grade', source='api')
+    def answer(self, sid, answer):
+        session = self._session(sid)
+        if session.idx >= len(session.ids):
+            raise ApiError(HTTPStatus.CONFLICT, "测验已结束")
+        bank = self._bank(session)
+        q_id = session.ids[session.idx]
+        q = bank.question(q_id)
+        answer = str(answer or '')
+        chosen = quiz_grade.normalize_judge(answer) if q['type'] == 'judge' else quiz_grade.normalize_answer(answer)
+        if not chosen:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "answer 不能为空")
+        correct = chosen == quiz_grade.normalize_answer(q['answer'])
+        latency = None if session.shown_at is None else time.time() - session.shown_at
+        if self.log is not None:
+            self.log.submit(session.user, bank.key(q_id), chosen, correct, latency,
+                            session=sid, q_id=q_id, bank=session.bank)
+        quiz_metrics.count('answers', source='api', correct=correct)
+        session.score += correct
+        session.idx += 1
+        session.shown_at = None
+        return {'correct': correct, 'answer': q['answer'], 'explanation': q['explanation'],
+                'score': session.score, 'index': session.idx, 'total': len(session.ids),
+                'finished': session.idx >= len(session.ids)}
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+
+# ===========================
+# HTTP/1.1 (keep-alive)
+# ===========================
+async def _route(service, method, path, body):
+    parts = [p for p in path.split('?', 1)[0].split('/') if p]
+    if parts == ['health'] and method == 'GET':
+        return {'ok': True, 'sessions': len(service.sessions)}
+    if parts == ['metrics'] and method == 'GET' and quiz_metrics.ENABLED:
+        return quiz_metrics.render()
+    if parts == ['quiz'] and method == 'POST':
+        # 出题可能阻塞（重新解析题库、等作答日志落盘、查 SQLite），放到线程里，不卡住其他连接
+        drawn = await asyncio.to_thread(service.draw, **{k: body[k] for k in
+                                                         ('mode', 'num', 'tags', 'user', 'chapters', 'pages')
+                                                         if k in body})
+        return service.open(*drawn)
+    if len(parts) == 2 and parts[0] == 'quiz' and method == 'GET':
+        return service.status(parts[1])
+    if len(parts) == 3 and parts[0] == 'quiz' and parts[2] == 'question' and method == 'GET':
+        return service.question(parts[1])
+    if len(parts) == 3 and parts[0] == 'quiz' and parts[2] == 'answer' and method == 'POST':
+        return service.answer(parts[1], body.get('answer'))
+    raise ApiError(HTTPStatus.NOT_FOUND, "没有这个接口")
+
+
+def _response(status, payload, keep_alive):
+    if isinstance(payload, str):
+        # /metrics：Prometheus 文本格式
+        body, content_type = payload.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        content_type = "application/json; charset=utf-8"
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Access-Control-Allow-Origin: *\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def _handle(service, reader, writer):
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            lines = head.decode('latin-1').split('\r\n')
+            try:
+                method, path, version = lines[0].split(' ', 2)
+            except ValueError:
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = (headers.get('connection', '').lower() != 'close'
+                          if version == 'HTTP/1.1' else headers.get('connection', '').lower() == 'keep-alive')
+            try:
+                length = headers.get('content-length') or '0'
+                length = int(length) if length.isdecimal() else -1
+                if length < 0 or length > MAX_BODY:
+                    # 请求体没有读，连接上剩下的字节分不清边界，回完错误就断开
+                    keep_alive = False
+                    if length < 0:
+                        raise ApiError(HTTPStatus.BAD_REQUEST, "Content-Length 无效")
+                    raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "请求体过大")
+                raw = await reader.readexactly(length) if length else b''
+                body = json.loads(raw) if raw else {}
+                if not isinstance(body, dict):
+                    raise ApiError(HTTPStatus.BAD_REQUEST, "请求体应为 JSON 对象")
+                if method == 'OPTIONS':
+                    status, payload = HTTPStatus.OK, {}
+                else:
+                    status, payload = HTTPStatus.OK, await _route(service, method, path, body)
+            except ApiError as e:
+                status, payload = e.status, {'error': str(e)}
+            except (ValueError, TypeError) as e:
+                status, payload = HTTPStatus.BAD_REQUEST, {'error': f"请求格式错误：{e}"}
+            except OSError as e:
+                status, payload = HTTPStatus.SERVICE_UNAVAILABLE, {'error': f"题库不可用：{e}"}
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host='127.0.0.1', port=8502):
+    server = await asyncio.start_server(lambda r, w: _handle(service, r, w), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="刷题 JSON 接口（供移动端使用，不经过 Streamlit）")
+    parser.add_argument("--bank", default=BANK_PATH, help="题库文件或题库目录，默认取环境变量 QUIZ_BANK 或 tiku.txt")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502, help="监听端口，默认 8502")
+    args = parser.parse_args(argv)
+
+    service = QuizService(args.bank)
+    service.banks.current()  # 启动时先加载题库，第一个请求不必等
+    print(f"JSON 接口已启动：http://{args.host}:{args.port}/")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,581 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import quiz
+import quiz_cache
+import quiz_parser
+import quiz_weighted
+
+# ===========================
+# 解析性能基准（合成题库 + 基线比对）
+# ===========================
+# generate_bank 按 tiku.txt 格式生成任意规模的题库，并给出每道题应当解析出的结果。
+# 解析器要处理的各种不规范写法都按比例混入：
+#   一行多个选项 "A.xxx   B.xxx"、题干后面粘着选项、全角点 "．"、题干 / 选项 / 解析折行、
+#   判断题大节（答案写 对 / 错），落盘时可以用 GBK 编码。
+# run_size 对每个规模依次计时各阶段（命令行 QuizSystem.parse_questions 与网页 load_and_parse_questions 的
+# 完整路径、整段解析、逐行状态机、局部修改后的增量解析、GBK 文件流式解析、编译缓存、mmap 加载），每个阶段都先核对解析结果与生成时的预期完全一致，再记录
+# 题/秒、MB/秒和 tracemalloc 峰值内存。另有改写前的两个旧解析器（legacy_cli / legacy_web）作对照，
+# 报告里列出整段解析比它们快多少倍。error_weights / weighted_sample 两个阶段量“错题优先”模式每次开始测验
+# 都要付的整库开销（按作答记录算全库权重、对全库权重做前缀和后抽题），不是解析，但同样随题库规模线性增长；
+# 单次只要几毫秒，按连续 WEIGHTED_ROUNDS 次计时。基线存成 JSON（仓库里带着一份 bench_baseline.json），
+# 之后的结果比基线慢或占内存多超过容差就失败退出；没有基线文件也算失败，用 --update 记录一份。
+
+BASELINE_PATH = "bench_baseline.json"
+DEFAULT_SIZES = (1000, 10000, 100000)
+TOLERANCE = 0.3         # 吞吐低于基线 70% 或峰值内存超过基线 130% 算退化
+MEMORY_SLACK = 1 << 20  # 峰值内存比较时额外容许的字节数（小规模下的噪声）
+WEIGHTED_DRAW = 20     # 错题优先每次开始测验抽的题数
+WEIGHTED_ROUNDS = 100  # 单次只要几毫秒，按连续开始这么多次测验计时
+MIN_SECONDS = 0.01      # 基线耗时短于此的阶段计时误差太大，不比较吞吐
+TYPE_SHARE = (('single', 0.5), ('multi', 0.25), ('judge', 0.25))
+
+_TERMS = ("中国特色社会主义", "新时代", "人民至上", "高质量发展", "全过程人民民主", "全面依法治国",
+          "社会主义核心价值观", "生态文明建设", "总体国家安全观", "人类命运共同体", "党的领导",
+          "自我革命", "共同富裕", "科技自立自强", "乡村振兴", "文化自信", "改革开放", "一国两制",
+          "新发展理念", "中国式现代化", "从严治党", "统一战线", "强军目标", "国家治理体系")
+_VERBS = ("坚持", "推进", "完善", "实现", "加强", "深化", "构建", "统筹", "弘扬", "落实")
+_CHAPTERS = "一二三四五六七八九十"
+
+
+def _phrase(rng, words=3):
+    return "".join(rng.choice(_VERBS) + rng.choice(_TERMS) for _ in range(words))
+
+
+def _choice_question(rng, n, q_type, tricky):
+    """一道单选 / 多选题的文本行和预期结果"""
+    dot = '．' if rng.random() < tricky else '.'
+    content = _phrase(rng) + "的根本要求是（  ）。"
+    keys = 'ABCDE' if rng.random() < 0.2 else 'ABCD'
+    options = {k: _phrase(rng, 1) for k in keys}
+    if q_type == 'single':
+        answer = rng.choice(keys)
+    else:
+        answer = ''.join(sorted(rng.sample(keys, rng.randint(2, len(keys)))))
+    chapter = rng.randrange(len(_CHAPTERS))
+    explanation = f"参见《概论》2023版教材第{_CHAPTERS[chapter]}章第{rng.randint(1, 400)}页。"
+    expected = {'type': q_type, 'id': str(n), 'content': content, 'options': dict(options),
+                'answer': answer, 'explanation': explanation}
+
+    lines = []
+    opt_lines = [f"{k}{dot}{v}" for k, v in options.items()]
+    style = rng.random()
+    if style < tricky:
+        # 题干与选项粘在同一行
+        lines.append(f"{n}{dot}{content} " + "  ".join(opt_lines))
+    else:
+        if rng.random() < tricky:
+            # 题干折行
+            cut = len(content) // 2
+            lines += [f"{n}{dot}{content[:cut]}", content[cut:]]
+        else:
+            lines.append(f"{n}{dot}{content}")
+        if style < 2 * tricky:
+            # 一行两个选项
+            lines += ["   ".join(opt_lines[i:i + 2]) for i in range(0, len(opt_lines), 2)]
+        else:
+            lines += opt_lines
+            if rng.random() < tricky:
+                # 最后一个选项折行，续行以空格接在选项后面
+                tail = _phrase(rng, 1)
+                lines.append(tail)
+                expected['options'][keys[-1]] += " " + tail
+    lines.append(f"答案：{answer}")
+    if rng.random() < tricky:
+        cut = len(explanation) // 2
+        lines += [f"答案解析：{explanation[:cut]}", explanation[cut:]]
+    else:
+        lines.append(f"答案解析：{explanation}")
+    return lines, expected
+
+
+def _judge_question(rng, n, tricky):
+    """一道判断题的文本行和预期结果"""
+    dot = '．' if rng.random() < tricky else '.'
+    content = _phrase(rng) + "是新时代的重要任务。"
+    right = rng.random() < 0.5
+    expected = {'type': 'judge', 'id': str(n), 'content': content, 'options': {'A': '对', 'B': '错'},
+                'answer': 'A' if right else 'B', 'explanation': ''}
+    if rng.random() < tricky:
+        cut = len(content) // 2
+        lines = [f"{n}{dot}{content[:cut]}", content[cut:]]
+    else:
+        lines = [f"{n}{dot}{content}"]
+    lines.append(f"答案：{'对' if right else '错'}")
+    return lines, expected
+
+
+def generate_bank(count, seed=0, tricky=0.15):
+    """
+    生成 count 道题的题库文本，返回 (文本, 预期题目列表)；预期结果与解析器输出的题目字典逐字段一致。
+    tricky 为每种不规范写法出现的比例。
+    """
+    rng = random.Random(seed)
+    lines = []
+    expected = []
+    remaining = count
+    for i, (q_type, share) in enumerate(TYPE_SHARE):
+        k = remaining if i == len(TYPE_SHARE) - 1 else round(count * share)
+        remaining -= k
+        if not k:
+            continue
+        lines.append(quiz_parser.SECTION_TITLES[q_type])
+        for n in range(1, k + 1):
+            if q_type == 'judge':
+                q_lines, q = _judge_question(rng, n, tricky)
+            else:
+                q_lines, q = _choice_question(rng, n, q_type, tricky)
+            lines += q_lines
+            expected.append(q)
+    return '\n'.join(lines) + '\n', expected
+
+
+def write_bank(path, count, seed=0, encoding='utf-8', tricky=0.15):
+    """生成题库并按指定编码写到文件，返回预期题目列表"""
+    text, expected = generate_bank(count, seed, tricky)
+    with open(path, 'w', encoding=encoding, newline='\r\n' if encoding == 'gbk' else '\n') as f:
+        f.write(text)
+    return expected
+
+
+def _check(questions, expected, phase):
+    questions = list(questions)
+    if len(questions) != len(expected):
+        raise AssertionError(f"{phase}: 解析出 {len(questions)} 题，应为 {len(expected)} 题")
+    for i, (got, want) in enumerate(zip(questions, expected)):
+        got = {k: got[k] for k in want}
+        if got != want:
+            raise AssertionError(f"{phase}: 第 {i + 1} 题解析结果不符\n  得到 {got}\n  应为 {want}")
+
+
+def _phases(count, workdir, seed, tricky=0.15):
+    """
+    一个规模的全部阶段：[(名称, 准备函数)]，准备函数返回 (要计时的函数, 核对结果的函数)。
+    准备工作（生成文本、写文件）不计入时间。
+    """
+    text, expected = generate_bank(count, seed, tricky)
+    utf8_path = os.path.join(workdir, f"bank_{count}.txt")
+    gbk_path = os.path.join(workdir, f"bank_{count}_gbk.txt")
+    with open(utf8_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    with open(gbk_path, 'w', encoding='gbk', newline='\r\n') as f:
+        f.write(text)
+    # 局部修改：改掉中间一道题的题干；增量结果应与整段重新解析完全相同
+    mid = expected[len(expected) // 2]['content']
+    edited = text.replace(mid, mid[:-1] + "！", 1)
+    edited_expected = list(quiz_parser.iter_text_questions(edited))
+
+    def bank_questions(phase, want=expected):
+        return lambda bank: _check((bank.question(i) for i in range(len(bank))), want, phase)
+
+    def incremental_edit():
+        parser = quiz_parser.IncrementalParser(text)
+        return lambda: parser.update(edited), lambda _: _check(parser.questions(), edited_expected, "incremental_edit")
+
+    def compile_cache():
+        path = quiz_cache.cache_path(utf8_path)
+        if os.path.exists(path):
+            os.remove(path)
+        return lambda: quiz_cache.build_cache(utf8_path), bank_questions("compile")
+
+    def load_cache():
+        quiz_cache.build_cache(utf8_path).close()
+        return lambda: quiz_cache.load_bank(utf8_path), bank_questions("load")
+
+    def weighted():
+        # 错题优先：约 1/10 的题有作答记录；建题库和 key_index 不计时，和网页里已加载好的题库一样
+        bank = quiz_cache.load_banks(utf8_path)
+        bank.key_index()
+        rng = random.Random(seed)
+        stats = [(bank.key(i), rng.randint(1, 5), rng.randint(0, 1), time.time() - rng.random() * 30 * 86400)
+                 for i in rng.sample(range(len(bank)), len(bank) // 10)]
+        return bank, stats
+
+    def error_weights():
+        bank, stats = weighted()
+        return (lambda: [quiz_weighted.error_weights(bank, stats) for _ in range(WEIGHTED_ROUNDS)][-1],
+                lambda w: _check_weights(w, bank, len(stats)))
+
+    def weighted_sample():
+        bank, stats = weighted()
+        weights = quiz_weighted.error_weights(bank, stats)
+        return (lambda: [quiz_weighted.weighted_sample(bank, weights, quiz_cache.TYPES, WEIGHTED_DRAW)
+                         for _ in range(WEIGHTED_ROUNDS)][-1],
+                lambda ids: _check_draw(ids, bank))
+
+    def quiz_system():
+        # 命令行 QuizSystem.parse_questions 本身（读文件不计时，屏幕输出丢掉）
+        system = quiz.QuizSystem(utf8_path)
+        system.load_file()
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                system.parse_questions()
+            return system.bank
+        return run, bank_questions("quiz_system")
+
+    def web_editor():
+        # 网页 load_and_parse_questions 本身；会话里放一个空的增量解析器，等于整份粘贴进编辑框
+        web = _web_module()
+        web.st.session_state.custom_parser = quiz_parser.IncrementalParser()
+        return lambda: web.load_and_parse_questions(text), bank_questions("web_editor")
+
+    return text, [
+        ("quiz_system", quiz_system),
+        ("web_editor", web_editor),
+        ("parse_text", lambda: (lambda: quiz_parser.parse_text(text),
+                                lambda parts: _check([q for part in parts for q in part], _by_type(expected),
+                                                     "parse_text"))),
+        ("line_parser", lambda: (lambda: list(quiz_parser.iter_questions(text.splitlines())),
+                                 lambda qs: _check(qs, expected, "line_parser"))),
+        ("legacy_cli", lambda: (lambda: legacy_cli_parse(text),
+                                lambda parts: _check_count(parts, expected, "legacy_cli"))),
+        ("legacy_web", lambda: (lambda: legacy_web_parse(text),
+                                lambda parts: _check_count(parts, expected, "legacy_web"))),
+        ("incremental_edit", incremental_edit),
+        ("error_weights", error_weights),
+        ("weighted_sample", weighted_sample),
+        ("stream_gbk", lambda: (lambda: list(quiz_parser.iter_file_questions(gbk_path)),
+                                lambda qs: _check(qs, expected, "stream_gbk"))),
+        ("compile", compile_cache),
+        ("load", load_cache),
+    ]
+
+
+# ===========================
+# 旧解析器（对照用，原样保留自 quiz_parser 之前的 quiz.py / quiz_web.py）
+# ===========================
+def legacy_cli_parse(text):
+    """原命令行 QuizSystem.parse_questions 的逐行解析，返回 (单选, 多选)；判断题不解析"""
+    single, multi = [], []
+
+    def save(q):
+        if q['type'] == 'single':
+            single.append(q)
+        elif q['type'] == 'multi':
+            multi.append(q)
+
+    current_section = None
+    current_q = None
+    section_pat = re.compile(r'^[一二三四]、\s*(.*)')
+    q_start_pat = re.compile(r'^(\d+)\s*[.．](.*)')
+    ans_pat = re.compile(r'^\s*答案\s*[：:]\s*([A-E]+)', re.IGNORECASE)
+    expl_pat = re.compile(r'^\s*答案解析\s*[：:]\s*(.*)')
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        sec_match = section_pat.match(line)
+        if sec_match:
+            title = sec_match.group(1)
+            if "单项" in title:
+                current_section = 'single'
+            elif "多项" in title:
+                current_section = 'multi'
+            else:
+                current_section = 'ignore'
+            if current_q:
+                save(current_q)
+                current_q = None
+            continue
+        if current_section == 'ignore':
+            continue
+        q_match = q_start_pat.match(line)
+        if q_match:
+            if current_q:
+                save(current_q)
+            current_q = {'type': current_section, 'id': q_match.group(1), 'content': q_match.group(2),
+                         'options': {}, 'answer': '', 'explanation': ''}
+            continue
+        if current_q:
+            ans_match = ans_pat.match(line)
+            if ans_match:
+                current_q['answer'] = ans_match.group(1).upper()
+                continue
+            expl_match = expl_pat.match(line)
+            if expl_match:
+                current_q['explanation'] = expl_match.group(1)
+                continue
+            inline_opts = list(re.finditer(r'([A-E])\s*[.．]\s*(.*?)(?=\s+[A-E]\s*[.．]|$)', line))
+            if inline_opts:
+                for m in inline_opts:
+                    current_q['options'][m.group(1)] = m.group(2).strip()
+            elif not line.startswith("答案") and not current_q['answer']:
+                if not current_q['options']:
+                    current_q['content'] += "\n" + line
+                else:
+                    last_key = sorted(current_q['options'].keys())[-1]
+                    current_q['options'][last_key] += " " + line
+    if current_q:
+        save(current_q)
+    return single, multi
+
+
+def legacy_web_parse(text):
+    """原网页 load_and_parse_questions 的逐行解析，返回 (单选, 多选, 判断)"""
+    raw_text = text.replace('．', '.')
+    single, multi, judge = [], [], []
+
+    def save(q):
+        if not q:
+            return
+        if q['type'] == 'judge':
+            q['options'] = {'A': '对', 'B': '错'}
+            if '对' in q['answer']:
+                q['answer'] = 'A'
+            elif '错' in q['answer']:
+                q['answer'] = 'B'
+        if q['type'] == 'single':
+            single.append(q)
+        elif q['type'] == 'multi':
+            multi.append(q)
+        elif q['type'] == 'judge':
+            judge.append(q)
+
+    current_section = None
+    current_q = None
+    section_pat = re.compile(r'^[一二三四]、\s*(.*)')
+    q_start_pat = re.compile(r'^(\d+)\s*[.](.*)')
+    ans_pat = re.compile(r'^\s*答案\s*[：:]\s*(.*)', re.IGNORECASE)
+    expl_pat = re.compile(r'^\s*答案解析\s*[：:]\s*(.*)')
+    opt_start_pat = re.compile(r'^\s*([A-E])\s*[.](.*)')
+    for line in raw_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        sec_match = section_pat.match(line)
+        if sec_match:
+            save(current_q)
+            current_q = None
+            title = sec_match.group(1)
+            if "单项" in title:
+                current_section = 'single'
+            elif "多项" in title:
+                current_section = 'multi'
+            elif "判断" in title:
+                current_section = 'judge'
+            else:
+                current_section = 'ignore'
+            continue
+        if current_section == 'ignore':
+            continue
+        q_match = q_start_pat.match(line)
+        if q_match:
+            save(current_q)
+            content_raw = q_match.group(2).strip()
+            current_q = {'type': current_section, 'id': q_match.group(1), 'content': content_raw,
+                         'options': {}, 'answer': '', 'explanation': ''}
+            inline_opt_match = re.search(r'(\s+[A-E]\s*[.].*)', content_raw)
+            if inline_opt_match:
+                opt_part = inline_opt_match.group(1)
+                current_q['content'] = content_raw.replace(opt_part, "")
+                line = opt_part.strip()
+            else:
+                continue
+        if current_q:
+            ans_match = ans_pat.match(line)
+            if ans_match:
+                current_q['answer'] = ans_match.group(1).strip().upper()
+                continue
+            expl_match = expl_pat.match(line)
+            if expl_match:
+                current_q['explanation'] = expl_match.group(1)
+                continue
+            if current_q['type'] in ['single', 'multi']:
+                inline_opts = list(re.finditer(r'([A-E])\s*[.]\s*(.*?)(?=\s+[A-E]\s*[.]|$)', line))
+                if inline_opts:
+                    for m in inline_opts:
+                        current_q['options'][m.group(1)] = m.group(2).strip()
+                else:
+                    opt_start = opt_start_pat.match(line)
+                    if opt_start:
+                        current_q['options'][opt_start.group(1)] = opt_start.group(2).strip()
+                    elif not current_q['options']:
+                        current_q['content'] += line
+                    else:
+                        last_key = sorted(current_q['options'].keys())[-1]
+                        current_q['options'][last_key] += " " + line
+            elif current_q['type'] == 'judge':
+                if not line.startswith("答案") and not line.startswith("解析"):
+                    current_q['content'] += line
+    save(current_q)
+    return single, multi, judge
+
+
+def _check_weights(weights, bank, answered):
+    if len(weights) != len(bank) or int((weights != quiz_weighted.NEW_WEIGHT).sum()) > answered:
+        raise AssertionError("error_weights: 权重数组与题库或作答记录对不上")
+
+
+def _check_draw(ids, bank):
+    if len(ids) != min(WEIGHTED_DRAW, len(bank)) or len(set(ids)) != len(ids) or max(ids) >= len(bank):
+        raise AssertionError(f"weighted_sample: 抽出的题号不对（{len(ids)} 题）")
+
+
+def _check_count(parts, expected, phase):
+    """旧解析器的折行处理与现在不同，只核对各题型题数（命令行版不解析判断题）"""
+    want = [len(bucket) for bucket in quiz_parser.split_by_type(expected)][:len(parts)]
+    got = [len(part) for part in parts]
+    if got != want:
+        raise AssertionError(f"{phase}: 各题型题数 {got}，应为 {want}")
+
+
+def speedups(results):
+    """整段解析 (parse_text) 比两个旧解析器快多少倍"""
+    new = results.get('parse_text', {}).get('seconds')
+    return {name: round(results[name]['seconds'] / new, 2) for name in ('legacy_cli', 'legacy_web')
+            if new and name in results}
+
+
+def _web_module():
+    """在 streamlit run 之外导入网页脚本（裸模式）；每次访问 session_state 都会打一条警告，基准进程里全部关掉"""
+    logging.disable(logging.WARNING)
+    import quiz_web
+    return quiz_web
+
+
+def _by_type(expected):
+    return [q for bucket in quiz_parser.split_by_type(expected) for q in bucket]
+
+
+def _close(result):
+    if hasattr(result, 'close'):
+        result.close()
+
+
+def run_size(count, workdir, seed=0, repeat=3, memory=True, tricky=0.15):
+    """测一个规模的全部阶段，返回 {阶段: {'seconds', 'qps', 'mbps', 'peak_mb'}}"""
+    text, phases = _phases(count, workdir, seed, tricky)
+    megabytes = len(text.encode('utf-8')) / 2 ** 20
+    results = {}
+    for name, prepare in phases:
+        best = None
+        for _ in range(repeat):
+            run, check = prepare()
+            start = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - start
+            check(result)
+            _close(result)
+            best = elapsed if best is None else min(best, elapsed)
+        peak = None
+        if memory:
+            # 单独再跑一遍量峰值内存：tracemalloc 会拖慢解析，不和计时混在一起
+            run, _ = prepare()
+            tracemalloc.start()
+            result = run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            _close(result)
+            del result
+        results[name] = {'seconds': round(best, 6), 'qps': round(count / best, 1), 'mbps': round(megabytes / best, 2),
+                         'peak_mb': None if peak is None else round(peak / 2 ** 20, 2)}
+    return results
+
+
+def machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """与基线比较，返回退化项的说明列表（空列表表示通过）"""
+    failures = []
+    for size, phases in results.items():
+        for name, r in phases.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base is None:
+                continue
+            if base['seconds'] >= MIN_SECONDS and r['qps'] < base['qps'] * (1 - tolerance):
+                failures.append(f"{size} 题 {name}: 吞吐 {r['qps']:.0f} 题/秒，基线 {base['qps']:.0f}")
+            if (r['peak_mb'] is not None and base.get('peak_mb') is not None
+                    and r['peak_mb'] * 2 ** 20 > base['peak_mb'] * 2 ** 20 * (1 + tolerance) + MEMORY_SLACK):
+                failures.append(f"{size} 题 {name}: 峰值内存 {r['peak_mb']:.1f} MB，基线 {base['peak_mb']:.1f} MB")
+    return failures
+
+
+def print_table(size, results):
+    print(f"\n{size} 题")
+    print(f"  {'阶段':<18}{'耗时(秒)':>10}{'题/秒':>12}{'MB/秒':>9}{'峰值MB':>9}")
+    for name, r in results.items():
+        peak = '-' if r['peak_mb'] is None else f"{r['peak_mb']:.1f}"
+        print(f"  {name:<18}{r['seconds']:>10.3f}{r['qps']:>12.0f}{r['mbps']:>9.1f}{peak:>9}")
+    ratios = speedups(results)
+    if ratios:
+        print("  旧解析器耗时 / parse_text 耗时：" + "，".join(f"{name} {x:.2f} 倍" for name, x in ratios.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="题库解析性能基准：合成题库，计时、测峰值内存并与基线比对")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="题库规模（题数），默认 1000 10000 100000；可到 1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段计时的次数（取最快），默认 3")
+    parser.add_argument("--seed", type=int, default=0, help="生成题库的随机种子")
+    parser.add_argument("--tricky", type=float, default=0.15,
+                        help="每种不规范写法的比例，默认 0.15；0 为全部标准格式（只走整题快速通道）")
+    parser.add_argument("--no-memory", action="store_true", help="不测峰值内存（tracemalloc 会再跑一遍）")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help=f"基线文件，默认 {BASELINE_PATH}")
+    parser.add_argument("--update", "--save", dest="save", action="store_true",
+                        help="把本次结果写为新的基线（没有基线文件时必须加）")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="容许的退化比例，默认 0.3")
+    parser.add_argument("--generate", metavar="OUT", default=None,
+                        help="只生成一个合成题库文件（题数取 --sizes 的第一个）后退出")
+    parser.add_argument("--encoding", default="utf-8", help="--generate 时的文件编码，如 gbk")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        write_bank(args.generate, args.sizes[0], args.seed, args.encoding, args.tricky)
+        print(f"已生成 {args.sizes[0]} 题 -> {args.generate}（{args.encoding}）")
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            # 非默认的不规范比例单独记一项，不和默认题库的基线混在一起比
+            key = str(size) if args.tricky == 0.15 else f"{size}/tricky={args.tricky:g}"
+            try:
+                results[key] = run_size(size, workdir, args.seed, max(1, args.repeat), not args.no_memory,
+                                       args.tricky)
+            except AssertionError as e:
+                print(f"解析结果错误：{e}", file=sys.stderr)
+                return 2
+            print_table(key, results[key])
+
+    if args.save:
+        old = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                old = json.load(f).get('results', {})
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'machine': machine_info(), 'results': dict(old, **results)}, f, ensure_ascii=False, indent=1)
+        print(f"\n基线已写入 {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"\n没有基线文件 {args.baseline}，无法判断是否退化；加 --update 记录本次结果作为基线", file=sys.stderr)
+        return 1
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != machine_info():
+        print(f"\n注意：基线记录于 {baseline.get('machine')}，与本机不同，比较结果仅供参考")
+    failures = compare(results, baseline, args.tolerance)
+    if failures:
+        print(f"\n性能退化（容差 {args.tolerance:.0%}）：", file=sys.stderr)
+        for line in failures:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    print(f"\n与基线相比没有超过 {args.tolerance:.0%} 的退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
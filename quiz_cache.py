@@ -0,0 +1,773 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows：没有跨进程文件锁，多进程部署时各进程可能各自编译一次
+    fcntl = None
+
+import quiz_metrics
+import quiz_parser
+import quiz_search
+
+# ===========================
+# 编译题库缓存 (tiku.txt -> tiku.txt.qbank)
+# ===========================
+# 文件布局（小端，各段按 4 字节对齐）：
+#   文件头  MAGIC | 格式版本 | 头部 JSON 长度 | 头部 JSON（来源路径、mtime、大小、内容哈希、各段位置）
+#   flags   每题 1 字节：低 2 位为题型，高位为 A-E 选项是否存在
+#   types   单选 / 多选 / 判断 三组题目下标 (uint32)
+#   offsets 每题 FIELDS 个字段在字符串区中的结束位置 (uint32)
+#   索引段  编译时一并建好的索引，每段一个定长数组，按 8 字节对齐；
+#           文件头 sections 里记着 {段名: [位置, 元素类型码, 元素个数]}：
+#             search.*  搜索倒排表（见 quiz_search）
+#             source.*  每题的章号、起止页码，引用文件 -> 题号（CSR，文件名列表在文件头 documents 里）
+#   blob    所有字段的 UTF-8 文本首尾相接
+# 加载时只做 mmap 和切片视图，不创建任何题目对象，题目按下标取用时才解码。
+
+MAGIC = b'QBNK'
+FORMAT_VERSION = 2
+CACHE_SUFFIX = '.qbank'
+SPOOL_SIZE = 64 << 20  # 编译时字符串区超过这个大小就落到临时文件
+
+FIELDS = ('id', 'content', 'A', 'B', 'C', 'D', 'E', 'answer', 'explanation')
+OPTION_KEYS = 'ABCDE'
+TYPES = ('single', 'multi', 'judge')
+
+_PREAMBLE = struct.Struct('<4sHHI')
+_NFIELDS = len(FIELDS)
+
+
+_RESERVED = 10 ** 12  # 估算文件头长度时各位置字段先按这么多位数占位
+
+
+def _align(n, to=4):
+    return (n + to - 1) & ~(to - 1)
+
+
+class CompiledBank:
+    """
+    只读的编译题库：题目按文件顺序编号 0..n-1，通过下标取题。
+    底层缓冲区可以是 mmap（磁盘缓存）也可以是 bytes（内存中编译）。
+    """
+
+    def __init__(self, buf, header, owner=None):
+        self.header = header
+        self._buf = buf
+        self._owner = owner
+        view = memoryview(buf)
+        n = header['count']
+        self._flags = view[header['flags_at']:header['flags_at'] + n]
+        at = header['types_at']
+        self._types = {}
+        for q_type, count in zip(TYPES, header['type_counts']):
+            self._types[q_type] = view[at:at + 4 * count].cast('I')
+            at += 4 * count
+        at = header['offsets_at']
+        self._offsets = view[at:at + 4 * (n * _NFIELDS + 1)].cast('I')
+        self._blob = view[header['blob_at']:]
+        self._view = view
+        self._sections = []
+
+    @classmethod
+    def from_questions(cls, questions, **key):
+        """把解析结果（可迭代的题目字典）编译成内存中的题库"""
+        data = compile_questions(questions, **key)
+        return cls(data, _read_header(data))
+
+    def __len__(self):
+        return self.header['count']
+
+    @property
+    def version(self):
+        """题库版本号：源文件内容哈希的前 12 位，会话只需记住它"""
+        return self.header.get('sha256', '')[:12]
+
+    def indices(self, q_type):
+        """某一题型的全部题目下标（只读 uint32 视图）"""
+        return self._types[q_type]
+
+    def sample(self, q_types, k, rng=random):
+        """
+        从若干题型中不放回随机抽 k 道题，返回题目下标数组 (uint32)。
+        """
+        return _sample_pools([(0, self._types[t]) for t in q_types], k, rng)
+
+    def counts(self):
+        """(单选数, 多选数, 判断数)"""
+        return tuple(self.header['type_counts'])
+
+    def type_of(self, i):
+        return TYPES[self._flags[i] & 3]
+
+    def key(self, i):
+        """第 i 题的稳定标识，直接对字符串区的原始字节取哈希，不解码"""
+        k = i * _NFIELDS
+        return question_key(self.type_of(i), self._blob[self._offsets[k + 1]:self._offsets[k + 2]])
+
+    def question(self, i):
+        """解码第 i 题，返回与 quiz_parser 相同结构的题目字典"""
+        flags = self._flags[i]
+        k = i * _NFIELDS
+        off = self._offsets[k:k + _NFIELDS + 1].tolist()
+        blob = self._blob
+        values = [str(blob[off[f]:off[f + 1]], 'utf-8') for f in range(_NFIELDS)]
+        options = {}
+        for bit, key in enumerate(OPTION_KEYS):
+            if flags >> (2 + bit) & 1:
+                options[key] = values[2 + bit]
+        return {
+            'type': TYPES[flags & 3],
+            'id': values[0],
+            'content': values[1],
+            'options': options,
+            'answer': values[7],
+            'explanation': values[8]
+        }
+
+    def split(self):
+        """完整展开为 (单选, 多选, 判断) 三个题目字典列表（兼容旧接口，O(n)）"""
+        return tuple([self.question(i) for i in self._types[t]] for t in TYPES)
+
+    def section(self, name):
+        """编译时写入的索引段（只读数组视图），没有这一段时返回 None"""
+        spec = self.header.get('sections', {}).get(name)
+        if spec is None:
+            return None
+        at, code, count = spec
+        view = self._view[at:at + count * struct.calcsize(code)].cast(code)
+        self._sections.append(view)
+        return view
+
+    def close(self):
+        for view in (self._flags, self._offsets, self._blob, *self._types.values(), *self._sections, self._view):
+            try:
+                view.release()
+            except BufferError:
+                pass  # 索引（numpy 数组）还引用着这一段，交给垃圾回收
+        self._types = {}
+        self._sections = []
+        if self._owner is not None:
+            try:
+                self._owner.close()
+            except BufferError:
+                pass
+            self._owner = None
+
+
+def question_key(q_type, content):
+    """
+    题目的稳定标识：题型 + 题干 (UTF-8 字节) 的哈希。
+    与题号、文件顺序无关，题库改版或拆分后做题记录仍能对上。
+    """
+    return hashlib.blake2b(q_type.encode('ascii') + b'\n' + content, digest_size=8).hexdigest()
+
+
+class ParsedBank:
+    """
+    直接包装一组题目字典的内存题库，接口与 CompiledBank 相同。
+    用于侧边栏编辑出的临时题库：改动后不必重新编码，只重建题型下标。
+    """
+
+    def __init__(self, questions):
+        self._questions = questions
+        self._types = {t: array('I') for t in TYPES}
+        for i, q in enumerate(questions):
+            self._types[q['type']].append(i)
+
+    def __len__(self):
+        return len(self._questions)
+
+    @property
+    def version(self):
+        return ''
+
+    def indices(self, q_type):
+        return self._types[q_type]
+
+    def sample(self, q_types, k, rng=random):
+        return _sample_pools([(0, self._types[t]) for t in q_types], k, rng)
+
+    def counts(self):
+        return tuple(len(self._types[t]) for t in TYPES)
+
+    def type_of(self, i):
+        return self._questions[i]['type']
+
+    def key(self, i):
+        q = self._questions[i]
+        return question_key(q['type'], q['content'].encode('utf-8'))
+
+    def question(self, i):
+        # 题目字典由增量解析器跨版本复用，交出去的是浅拷贝
+        return dict(self._questions[i])
+
+    def split(self):
+        return tuple([self._questions[i] for i in self._types[t]] for t in TYPES)
+
+    def section(self, name):
+        return None
+
+    def close(self):
+        self._questions = []
+
+
+def _sample_pools(pools, k, rng):
+    """
+    从若干 (起始号, 下标数组) 中不放回随机抽 k 个，返回起始号 + 下标 (uint32 数组)。
+    各下标数组不拼接，抽到的位置按数组长度换算回下标。
+    """
+    total = sum(len(pool) for _, pool in pools)
+    picks = array('I')
+    for pos in rng.sample(range(total), min(k, total)):
+        for start, pool in pools:
+            if pos < len(pool):
+                picks.append(start + pool[pos])
+                break
+            pos -= len(pool)
+    return picks
+
+
+class BankWriter:
+    """
+    逐题写入编译题库。字符串区写进 blob 文件对象（可以是磁盘上的临时文件），
+    内存里只留每题几十字节的下标数组，题库再大也不必整份放在内存里。
+    indexes 为真时顺带建搜索索引和出处列写进索引段（要留着每题的规范文本，内存随题库增长）。
+    """
+
+    def __init__(self, blob=None, indexes=False):
+        self.blob = io.BytesIO() if blob is None else blob
+        self.flags = bytearray()
+        self.type_lists = {t: array('I') for t in TYPES}
+        self.offsets = array('I', [0])
+        self.sections = {}      # 段名 -> (类型码, 小端字节串)
+        self.documents = []     # 出处里引用的文件名，与 source.doc_offsets 对应
+        self._indexes = indexes
+        self._search_texts = []
+        self._source = (array('h'), array('i'), array('i'))
+        self._doc_ids = {}
+        self._size = 0
+
+    def add(self, q):
+        options = q['options'] or {}
+        code = TYPES.index(q['type'])
+        for bit, k in enumerate(OPTION_KEYS):
+            if k in options:
+                code |= 1 << (2 + bit)
+        self.type_lists[q['type']].append(len(self.flags))
+        self.flags.append(code)
+        for value in (q['id'], q['content'], *(options.get(k, '') for k in OPTION_KEYS),
+                      q['answer'], q['explanation']):
+            data = value.encode('utf-8')
+            self.blob.write(data)
+            self._size += len(data)
+            self.offsets.append(self._size)
+        if self._indexes:
+            i = len(self.flags) - 1
+            self._search_texts.append(quiz_search.question_text(q))
+            *columns, documents = quiz_parser.source_columns(q['explanation'])
+            for column, value in zip(self._source, columns):
+                column.append(value)
+            for doc in documents:
+                self._doc_ids.setdefault(doc, array('I')).append(i)
+
+    def add_all(self, questions):
+        with quiz_parser.gc_paused():
+            for q in questions:
+                self.add(q)
+
+    def _build_indexes(self):
+        """题目都写完后建索引段（只建一次）"""
+        if not self._indexes:
+            return
+        self._indexes = False
+        index = quiz_search.SearchIndex(self._search_texts)
+        for name, values in index.arrays().items():
+            self.sections['search.' + name] = (values.dtype.char, values.tobytes())
+        self._search_texts = []
+        self.documents = sorted(self._doc_ids)
+        doc_offsets, doc_ids = array('I', [0]), array('I')
+        for doc in self.documents:
+            doc_ids.extend(self._doc_ids[doc])
+            doc_offsets.append(len(doc_ids))
+        for name, arr in zip(('chapter', 'first', 'last', 'doc_offsets', 'doc_ids'), (*self._source, doc_offsets, doc_ids)):
+            if sys.byteorder != 'little':
+                arr = array(arr.typecode, arr)
+                arr.byteswap()
+            self.sections['source.' + name] = (arr.typecode, arr.tobytes())
+        self._doc_ids = {}
+
+    def head(self, **key):
+        """blob 之前的全部内容：前导、头部 JSON、flags、各题型下标、字段偏移、索引段"""
+        self._build_indexes()
+        n = len(self.flags)
+        header = dict(key, count=n, type_counts=[len(self.type_lists[t]) for t in TYPES])
+        # 各段位置依赖头部长度，头部长度又依赖位置数值，预留足够位数后一次算定
+        header.update(flags_at=_RESERVED, types_at=_RESERVED, offsets_at=_RESERVED, blob_at=_RESERVED)
+        if self.sections:
+            header['sections'] = {name: [_RESERVED, code, _RESERVED] for name, (code, _) in self.sections.items()}
+        if self.documents:
+            header['documents'] = self.documents
+        head_len = _align(_PREAMBLE.size + len(json.dumps(header).encode('utf-8')) + 64)
+        header['flags_at'] = head_len
+        header['types_at'] = _align(head_len + n)
+        header['offsets_at'] = header['types_at'] + 4 * n
+        at = header['offsets_at'] + 4 * len(self.offsets)
+        for name, (code, data) in self.sections.items():
+            at = _align(at, 8)
+            header['sections'][name] = [at, code, len(data) // struct.calcsize(code)]
+            at += len(data)
+        header['blob_at'] = _align(at)
+        head = json.dumps(header).encode('utf-8')
+        head = head.ljust(head_len - _PREAMBLE.size)
+
+        out = bytearray(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(head)))
+        out += head
+        out += self.flags
+        out += bytes(header['types_at'] - len(out))
+        for arr in (*(self.type_lists[t] for t in TYPES), self.offsets):
+            if sys.byteorder != 'little':
+                arr = array('I', arr)
+                arr.byteswap()
+            out += arr.tobytes()
+        for name, (_, data) in self.sections.items():
+            out += bytes(header['sections'][name][0] - len(out))
+            out += data
+        out += bytes(header['blob_at'] - len(out))
+        return bytes(out)
+
+    def write_to(self, f, **key):
+        f.write(self.head(**key))
+        self.blob.seek(0)
+        shutil.copyfileobj(self.blob, f)
+
+    def getvalue(self, **key):
+        self.blob.seek(0)
+        return self.head(**key) + self.blob.read()
+
+
+def compile_questions(questions, **key):
+    """把题目字典序列编码为编译题库的字节串；key 为写入文件头的来源信息"""
+    writer = BankWriter()
+    writer.add_all(questions)
+    return writer.getvalue(**key)
+
+
+def _read_header(buf):
+    """解析文件头；格式不符或版本不同返回 None"""
+    if len(buf) < _PREAMBLE.size:
+        return None
+    magic, version, _, head_len = _PREAMBLE.unpack_from(buf, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    try:
+        return json.loads(bytes(buf[_PREAMBLE.size:_PREAMBLE.size + head_len]))
+    except ValueError:
+        return None
+
+
+def cache_path(filename):
+    """缓存文件与题库放在一起：tiku.txt -> tiku.txt.qbank"""
+    return filename + CACHE_SUFFIX
+
+
+def _open_cache(path):
+    """mmap 打开缓存文件，返回 (CompiledBank, 文件头)，不可用时返回 (None, None)"""
+    try:
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None, None
+    header = _read_header(mm)
+    if header is None:
+        mm.close()
+        return None, None
+    return CompiledBank(mm, header, owner=mm), header
+
+
+def _write_atomic(path, write):
+    """write(f) 写到同目录临时文件，再整体替换，读者不会看到写了一半的缓存"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        # 目录只读等情况：放弃写缓存，不影响本次使用
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+
+
+def _file_sha256(filename):
+    hasher = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _source_key(filename, st, sha256):
+    return {
+        'source': os.path.abspath(filename),
+        'mtime_ns': st.st_mtime_ns,
+        'size': st.st_size,
+        'sha256': sha256
+    }
+
+
+@quiz_metrics.instrument('cache_build')
+def build_cache(filename):
+    """
+    流式解析题库源文件并写出编译缓存，返回映射缓存文件的 CompiledBank。
+    读文件、算哈希、解析、编码都是边读边做；搜索索引和出处列同时建好写进缓存
+    （只有搜索索引的内存随题库增长），之后每次加载直接映射，不必再建。
+    """
+    quiz_metrics.count('cache_lookups', result='miss')
+    # 先 stat 再读：读的过程中文件被改，记录的 mtime 偏旧，下次启动会重新解析
+    st = os.stat(filename)
+    hasher = hashlib.sha256()
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as blob:
+        writer = BankWriter(blob, indexes=True)
+        writer.add_all(quiz_parser.iter_file_questions(filename, hasher=hasher))
+        key = _source_key(filename, st, hasher.hexdigest())
+        path = cache_path(filename)
+        if _write_atomic(path, lambda f: writer.write_to(f, **key)):
+            bank, _ = _open_cache(path)
+            if bank is not None:
+                return bank
+        data = writer.getvalue(**key)
+    return CompiledBank(data, _read_header(data))
+
+
+@contextmanager
+def _compile_lock(filename):
+    """
+    跨进程编译锁（tiku.txt.qbank.lock）：多个进程同时发现缓存过期时只有一个去解析，
+    其余等它写完直接 mmap 同一个缓存文件。平台不支持或目录只读时不加锁。
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        f = open(cache_path(filename) + '.lock', 'a')
+    except OSError:
+        yield
+        return
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_cached(filename):
+    """
+    缓存可用时返回 mmap 的题库，需要重新解析时返回 None：
+    缓存的来源路径、mtime、大小都对得上就直接用；否则按内容哈希判断（只是 touch 过的文件不必重新解析）。
+    """
+    st = os.stat(filename)
+    bank, header = _open_cache(cache_path(filename))
+    if bank is None:
+        return None
+    if _key_matches(header, filename, st):
+        quiz_metrics.count('cache_lookups', result='hit')
+        return bank
+
+    with quiz_metrics.timed('cache_hash'):
+        key = _source_key(filename, st, _file_sha256(filename))
+    if header.get('sha256') == key['sha256']:
+        # 内容没变（复制、touch、换目录）：只更新文件头里的键，下次直接命中
+        _refresh_key(cache_path(filename), bank, dict(header, **key))
+        quiz_metrics.count('cache_lookups', result='content_hit')
+        return bank
+    bank.close()
+    return None
+
+
+def load_bank(filename):
+    """加载题库：缓存可用就直接 mmap，否则在编译锁内重新解析并写缓存"""
+    bank = _load_cached(filename)
+    if bank is None:
+        with _compile_lock(filename):
+            # 等锁期间别的进程可能已经编译好了
+            bank = _load_cached(filename)
+            if bank is None:
+                bank = build_cache(filename)
+    return bank
+
+
+def _key_matches(header, filename, st):
+    return (header.get('source') == os.path.abspath(filename) and header.get('mtime_ns') == st.st_mtime_ns
+            and header.get('size') == st.st_size)
+
+
+def _refresh_key(path, bank, header):
+    """原地改写文件头（头部预留了空白，长度不变）"""
+    head_len = header['flags_at'] - _PREAMBLE.size
+    head = json.dumps(header).encode('utf-8')
+    if len(head) > head_len:
+        return False
+    try:
+        with open(path, 'r+b') as f:
+            f.seek(_PREAMBLE.size)
+            f.write(head.ljust(head_len))
+    except OSError:
+        return False
+    bank.header = header
+    return True
+
+
+# ===========================
+# 多题库目录（每门课 / 每章一个文件）
+# ===========================
+BANK_SUFFIXES = ('.txt', '.docx')
+
+
+def bank_files(path):
+    """path 是目录时返回其中的题库文件（按文件名排序），是文件时就是它自己"""
+    if not os.path.isdir(path):
+        return [path]
+    names = sorted(name for name in os.listdir(path)
+                   if name.lower().endswith(BANK_SUFFIXES) and not name.startswith(('.', '~$')))
+    return [os.path.join(path, name) for name in names]
+
+
+def bank_tag(filename):
+    """分库标签：去掉扩展名的文件名，如 第一章.txt -> 第一章"""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def _cache_fresh(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return True  # 让后面的 load_bank 去报错
+    bank, header = _open_cache(cache_path(filename))
+    if bank is None:
+        return False
+    bank.close()
+    return _key_matches(header, filename, st)
+
+
+def _compile_in_worker(filename, force=False):
+    """子进程里解析并写缓存；缓存写不了（只读目录）时把编译结果带回主进程"""
+    with _compile_lock(filename):
+        bank = None if force else _load_cached(filename)
+        if bank is None:
+            bank = build_cache(filename)
+    data = None if bank._owner is not None else bytes(bank._buf)
+    bank.close()
+    return data
+
+
+def load_banks(path, workers=None, force=False):
+    """
+    加载一个题库文件或整个目录，合并为一个 MultiBank。
+    缓存过期的文件分给进程池并行解析（各自写 .qbank），主进程最后统一 mmap 打开。
+    force 为真时忽略已有缓存，全部重新解析。
+    """
+    files = bank_files(path)
+    stale = [f for f in files if force or not _cache_fresh(f)]
+    workers = min(len(stale), workers or os.cpu_count() or 1)
+    compiled = {}
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for filename, data in zip(stale, pool.map(_compile_in_worker, stale, [force] * len(stale))):
+                if data is not None:
+                    compiled[filename] = CompiledBank(data, _read_header(data))
+    banks = []
+    for f in files:
+        if f in compiled:
+            banks.append(compiled[f])
+        elif force and workers <= 1:
+            banks.append(build_cache(f))
+        else:
+            banks.append(load_bank(f))  # 子进程已写好缓存，这里直接命中
+    return MultiBank(banks, [bank_tag(f) for f in files])
+
+
+class MultiBank:
+    """
+    多个 CompiledBank 拼成的一个题库，接口与 CompiledBank 相同。
+    全局题号 = 分库起始号 + 分库内题号；每个分库有一个标签，抽题时可以只选其中一部分。
+    """
+
+    def __init__(self, banks, tags):
+        self.banks = list(banks)
+        self.tags = list(tags)
+        self._starts = [0]
+        for bank in self.banks:
+            self._starts.append(self._starts[-1] + len(bank))
+        self._key_index = None
+
+    def __len__(self):
+        return self._starts[-1]
+
+    @property
+    def version(self):
+        if len(self.banks) == 1:
+            return self.banks[0].version
+        joined = ','.join(f"{tag}:{bank.version}" for tag, bank in zip(self.tags, self.banks))
+        return hashlib.sha256(joined.encode('utf-8')).hexdigest()[:12]
+
+    def _selected(self, tags):
+        for b, (tag, bank) in enumerate(zip(self.tags, self.banks)):
+            if tags is None or tag in tags:
+                yield self._starts[b], bank
+
+    def indices(self, q_type, tags=None):
+        """某一题型的全局题号（新建数组，O(n)）"""
+        out = array('I')
+        for start, bank in self._selected(tags):
+            out.extend(start + i for i in bank.indices(q_type))
+        return out
+
+    def sample(self, q_types, k, rng=random, tags=None):
+        """与 CompiledBank.sample 相同，tags 不为空时只从这些分库里抽"""
+        pools = [(start, bank.indices(t)) for start, bank in self._selected(tags) for t in q_types]
+        return _sample_pools(pools, k, rng)
+
+    def counts(self, tags=None):
+        totals = [0] * len(TYPES)
+        for _, bank in self._selected(tags):
+            for t, c in enumerate(bank.counts()):
+                totals[t] += c
+        return tuple(totals)
+
+    def _locate(self, i):
+        b = bisect_right(self._starts, i) - 1
+        return b, i - self._starts[b]
+
+    def type_of(self, i):
+        b, j = self._locate(i)
+        return self.banks[b].type_of(j)
+
+    def tag_of(self, i):
+        return self.tags[self._locate(i)[0]]
+
+    def key(self, i):
+        b, j = self._locate(i)
+        return self.banks[b].key(j)
+
+    def key_index(self):
+        """稳定标识 -> 全局题号；每个题库对象只建一次（O(n)，不解码题目）"""
+        if self._key_index is None:
+            self._key_index = {self.key(i): i for i in range(len(self))}
+        return self._key_index
+
+    def question(self, i):
+        """解码第 i 题，另带 'tag' 字段标明来自哪个分库"""
+        b, j = self._locate(i)
+        q = self.banks[b].question(j)
+        q['tag'] = self.tags[b]
+        return q
+
+    def parts(self):
+        """[(起始全局题号, 分库)]"""
+        return list(zip(self._starts, self.banks))
+
+    def split(self):
+        parts = tuple([] for _ in TYPES)
+        for bank in self.banks:
+            for part, more in zip(parts, bank.split()):
+                part.extend(more)
+        return parts
+
+    def close(self):
+        for bank in self.banks:
+            bank.close()
+
+
+class BankStore:
+    """
+    进程级共享题库：所有会话共用同一个只读题库 (MultiBank)，会话里只存版本号。
+    path 可以是单个题库文件，也可以是题库目录。源文件变化时在锁内加载新版本，整体替换引用（原子切换）；
+    最近几个旧版本继续保留，正在答题的会话还能按版本号取到原来的题目。
+    """
+
+    def __init__(self, path, check_interval=2.0, keep=4):
+        self.path = path
+        self.check_interval = check_interval
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._bank = None
+        self._signature = None
+        self._checked = 0.0
+        self._versions = OrderedDict()
+        self._text = (None, None)
+        self._parser = (None, None)
+
+    def current(self):
+        """当前版本的题库；最多每 check_interval 秒 stat 一次源文件"""
+        bank = self._bank
+        if bank is not None and time.monotonic() - self._checked < self.check_interval:
+            return bank
+        with self._lock:
+            now = time.monotonic()
+            if self._bank is not None and now - self._checked < self.check_interval:
+                return self._bank
+            try:
+                signature = self._stat()
+            except OSError:
+                if self._bank is None:
+                    raise
+                return self._bank  # 文件暂时不可用（正在替换），继续用旧版本
+            if self._bank is None or signature != self._signature:
+                bank = load_banks(self.path)
+                self._versions[bank.version] = bank
+                self._versions.move_to_end(bank.version)
+                while len(self._versions) > self.keep:
+                    self._versions.popitem(last=False)
+                self._bank = bank
+                self._signature = signature
+            self._checked = now
+            return self._bank
+
+    def _stat(self):
+        signature = []
+        for filename in bank_files(self.path):
+            st = os.stat(filename)
+            signature.append((filename, st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def get(self, version):
+        """按版本号取题库，版本已淘汰时返回 None"""
+        return self._versions.get(version)
+
+    def source_text(self):
+        """当前版本的源文本（供编辑框显示），整个进程只保留一份"""
+        bank = self.current()
+        version, text = self._text
+        if version != bank.version:
+            text = '\n'.join(quiz_parser.read_bank_text(f) for f in bank_files(self.path))
+            self._text = (bank.version, text)
+        return text
+
+    def source_parser(self):
+        """当前源文本的增量解析器，首次编辑题库时才建；各会话拿去 copy() 后再改"""
+        bank = self.current()
+        version, parser = self._parser
+        if version != bank.version:
+            parser = quiz_parser.IncrementalParser(self.source_text())
+            self._parser = (bank.version, parser)
+        return parser
@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import zlib
+
+import quiz_cache
+
+# ===========================
+# 多进程部署（N 个 Streamlit 进程 + 本地粘性负载均衡）
+# ===========================
+# 单个 Streamlit 进程只能用一个核。这里起 N 个 quiz_web.py 子进程，各自监听 127.0.0.1 的
+# --worker-port 起的 N 个端口，对外端口由本进程里的 asyncio TCP 转发接收：
+#   - 题库：启动前先编译好 .qbank，各进程都 mmap 同一个只读文件，页缓存由操作系统共享，
+#     N 个进程不会各存一份题库。题库更新时由本进程重新编译（quiz_cache 的编译锁保证只解析一次），
+#     新缓存原子替换旧文件，各进程的 BankStore 发现源文件变化后切到新版本，旧会话仍用旧映射。
+#   - 粘性会话：Streamlit 的会话状态在进程内存里，同一浏览器必须始终落到同一进程。
+#     第一个请求按客户端 IP 哈希选进程，并在响应头里种下 quiz_worker Cookie，之后按 Cookie 转发
+#     （包括 WebSocket）；Cookie 指向的进程挂了就换一个活着的，并改写 Cookie。
+#   - 子进程异常退出时自动重启；收到 SIGTERM / Ctrl+C 时一并结束所有子进程。
+# 转发只看每个连接的第一个请求头，之后双向原样透传，不解析 WebSocket 数据。
+
+COOKIE = 'quiz_worker'
+RESTART_DELAY = 2.0     # 秒：子进程退出后隔多久重启
+CHECK_INTERVAL = 2.0    # 秒：检查子进程和题库源文件的间隔
+MAX_HEAD = 64 << 10
+
+
+class Worker:
+    """一个 Streamlit 子进程"""
+
+    def __init__(self, index, port, bank_path):
+        self.index = index
+        self.port = port
+        # 子进程的工作目录是脚本所在目录，相对路径要先按当前目录展开
+        self.bank_path = os.path.abspath(bank_path)
+        self.proc = None
+        self.exited_at = None
+        self.connections = 0
+
+    def start(self):
+        env = dict(os.environ, QUIZ_BANK=self.bank_path)
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', 'quiz_web.py',
+             '--server.address', '127.0.0.1', '--server.port', str(self.port),
+             '--server.headless', 'true', '--browser.gatherUsageStats', 'false'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+        self.exited_at = None
+
+    @property
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def check(self):
+        """进程退出了就记下时间，过 RESTART_DELAY 秒后重启"""
+        if self.alive:
+            return
+        now = time.monotonic()
+        if self.exited_at is None:
+            self.exited_at = now
+            code = self.proc.returncode if self.proc is not None else None
+            print(f"worker {self.index}（端口 {self.port}）已退出，返回码 {code}，稍后重启", file=sys.stderr)
+        elif now - self.exited_at >= RESTART_DELAY:
+            self.start()
+
+    def stop(self, timeout=10):
+        if self.alive:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def _cookie_worker(headers, count):
+    """请求头里 quiz_worker Cookie 指向的进程序号，没有或无效时返回 None"""
+    for name, value in headers:
+        if name != 'cookie':
+            continue
+        for item in value.split(';'):
+            key, _, val = item.strip().partition('=')
+            if key == COOKIE and val.isdigit() and int(val) < count:
+                return int(val)
+    return None
+
+
+def _parse_head(head):
+    """请求头 -> [(小写字段名, 值)]"""
+    headers = []
+    for line in head.decode('latin-1').split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        if name:
+            headers.append((name.strip().lower(), value.strip()))
+    return headers
+
+
+class Balancer:
+    """对外端口上的粘性 TCP 转发"""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def choose(self, headers, client_ip):
+        """返回 (worker, 是否需要种 Cookie)：优先 Cookie，其次按客户端 IP 哈希，跳过挂掉的进程"""
+        n = len(self.workers)
+        wanted = _cookie_worker(headers, n)
+        start = wanted if wanted is not None else zlib.crc32(client_ip.encode()) % n
+        for k in range(n):
+            worker = self.workers[(start + k) % n]
+            if worker.alive:
+                return worker, worker.index != wanted
+        return None, False
+
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info('peername') or ('',)
+        backend = None
+        try:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            worker, set_cookie = self.choose(_parse_head(head), str(peer[0]))
+            if worker is None:
+                writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return
+            try:
+                up_reader, backend = await asyncio.open_connection('127.0.0.1', worker.port)
+            except OSError:
+                # 进程还在启动或刚挂掉：这个连接直接失败，浏览器重试时会换到别的进程
+                writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                await writer.drain()
+                return
+            worker.connections += 1
+            try:
+                backend.write(head)
+                upstream = asyncio.ensure_future(self._pipe(reader, backend))
+                first = await up_reader.readuntil(b'\r\n\r\n')
+                if set_cookie:
+                    # 在第一个响应头末尾加上 Set-Cookie，之后同一浏览器的请求都转给这个进程
+                    first = (first[:-2] + f"Set-Cookie: {COOKIE}={worker.index}; Path=/; HttpOnly; "
+                             f"SameSite=Lax\r\n\r\n".encode('latin-1'))
+                writer.write(first)
+                await self._pipe(up_reader, writer)
+                upstream.cancel()
+            finally:
+                worker.connections -= 1
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            if backend is not None:
+                backend.close()
+            writer.close()
+
+    @staticmethod
+    async def _pipe(reader, writer):
+        try:
+            while True:
+                data = await reader.read(MAX_HEAD)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if writer.can_write_eof():
+                try:
+                    writer.write_eof()
+                except OSError:
+                    pass
+
+
+async def _supervise(workers, store):
+    """定期检查子进程，并在题库源文件变化时重新编译缓存（各进程随后切到新版本）"""
+    while True:
+        await asyncio.sleep(CHECK_INTERVAL)
+        for worker in workers:
+            worker.check()
+        try:
+            await asyncio.to_thread(store.current)
+        except (OSError, ValueError) as e:
+            print(f"题库重新编译失败，继续使用旧版本：{e}", file=sys.stderr)
+
+
+async def serve(workers, store, host='0.0.0.0', port=8501):
+    balancer = Balancer(workers)
+    server = await asyncio.start_server(balancer.handle, host, port, limit=MAX_HEAD)
+    supervisor = asyncio.ensure_future(_supervise(workers, store))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        supervisor.cancel()
+
+
+def _terminate(signum, frame):
+    """SIGTERM 与 Ctrl+C 同样处理：退出事件循环并结束所有子进程"""
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程部署：N 个网页进程共享同一份题库缓存，对外一个端口")
+    parser.add_argument("--bank", default=os.environ.get("QUIZ_BANK", "tiku.txt"),
+                        help="题库文件或题库目录，默认取环境变量 QUIZ_BANK 或 tiku.txt")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="网页进程数，默认为 CPU 核数")
+    parser.add_argument("--host", default="0.0.0.0", help="对外监听地址，默认 0.0.0.0")
+    parser.add_argument("--port", type=int, default=8501, help="对外端口，默认 8501")
+    parser.add_argument("--worker-port", type=int, default=8511,
+                        help="子进程在本机使用的起始端口，默认 8511（依次占用 N 个）")
+    args = parser.parse_args(argv)
+
+    # 先在本进程编译好缓存，子进程启动时直接 mmap
+    store = quiz_cache.BankStore(args.bank, check_interval=0)
+    bank = store.current()
+    print(f"题库已就绪：{len(bank)} 题（版本 {bank.version}）")
+
+    workers = [Worker(i, args.worker_port + i, args.bank) for i in range(max(1, args.workers))]
+    for worker in workers:
+        worker.start()
+    signal.signal(signal.SIGTERM, _terminate)
+    print(f"已启动 {len(workers)} 个网页进程，访问 http://{args.host}:{args.port}/")
+    try:
+        asyncio.run(serve(workers, store, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    main()
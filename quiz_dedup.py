@@ -0,0 +1,128 @@
+import re
+
+import numpy as np
+
+# ===========================
+# 近似重复题检测（MinHash + LSH）
+# ===========================
+# 1. 每题取题干 + 选项文字，去掉空白和标点，按字符切 3-gram（中文不分词也适用）
+# 2. 每个 3-gram 编成一个整数，用 NUM_PERM 个乘法-移位哈希求最小值，得到 MinHash 签名
+# 3. 签名切成 BANDS 段，每段相同的题落进同一个桶，桶内才是候选对（近线性，不做两两比较）
+# 4. 候选对按签名一致比例（≈ Jaccard 相似度）复核，再用并查集合并成重复簇
+# 全部按 numpy 数组批量计算，10 万题量级几秒内完成。
+
+SHINGLE = 3
+NUM_PERM = 64
+BANDS = 16              # 16 段 × 4 行：相似度约 0.5 以上的题大概率成为候选
+THRESHOLD = 0.8         # 签名一致比例达到这个值才算重复
+_CHUNK = 1 << 16        # 每批处理的 3-gram 个数，控制中间数组大小
+
+_NOISE = re.compile(r'[\W_]+')
+_rng = np.random.default_rng(0x5EED)  # 固定种子：同一份题库每次的签名相同
+# x -> A*x + B (mod 2^32)，A 为奇数时是 32 位整数上的一个置换，正好是 MinHash 需要的
+_A = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint32) | np.uint32(1)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint32)
+
+
+def question_text(q):
+    """用于比较的文本：题干 + 按选项键排序的选项，去掉空白和标点"""
+    text = q['content']
+    if q['type'] != 'judge':
+        text += ''.join(v for _, v in sorted(q['options'].items()))
+    return _NOISE.sub('', text)
+
+
+def minhash_signatures(texts):
+    """每段文本的 MinHash 签名，返回 (len(texts), NUM_PERM) 的 uint32 数组"""
+    n = len(texts)
+    sig = np.full((n, NUM_PERM), np.iinfo(np.uint32).max, np.uint32)
+    if not n:
+        return sig
+    # 不足 3 个字的文本补齐，保证每题至少有一个 3-gram
+    texts = [t.ljust(SHINGLE, '\0') for t in texts]
+    lengths = np.fromiter((len(t) for t in texts), np.int64, n)
+    codes = np.frombuffer(''.join(texts).encode('utf-32-le'), np.uint32).astype(np.uint64)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    # 第 i 题的 3-gram 起点为 starts[i] .. ends[i]-3，在拼接后的数组里是连续的一段
+    counts = lengths - SHINGLE + 1
+    gram_starts = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    positions = np.arange(counts.sum()) + gram_starts
+    # Unicode 码点不超过 21 位，三个拼成一个 63 位整数，再乘法取高 32 位压成 uint32
+    grams = (codes[positions] << np.uint64(42)) | (codes[positions + 1] << np.uint64(21)) | codes[positions + 2]
+    grams = ((grams * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)).astype(np.uint32)
+    owner = np.repeat(np.arange(n), counts)
+
+    first = 0
+    while first < len(grams):
+        last = min(first + _CHUNK, len(grams))
+        # 一批里的题号（这批可能从某题中间开始、到某题中间结束，min 合并不受影响）
+        seg_owner = owner[first:last]
+        seg_starts = np.flatnonzero(np.concatenate(([True], seg_owner[1:] != seg_owner[:-1])))
+        hashed = grams[first:last, None] * _A + _B
+        mins = np.minimum.reduceat(hashed, seg_starts, axis=0)
+        rows = seg_owner[seg_starts]
+        sig[rows] = np.minimum(sig[rows], mins)
+        first = last
+    return sig
+
+
+def candidate_pairs(sig, bands=BANDS):
+    """LSH：签名分段分桶，返回桶内候选对 (a, b) 两个数组，a < b"""
+    n, perm = sig.shape
+    rows = perm // bands
+    pairs = []
+    for band in range(bands):
+        block = sig[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = np.zeros(n, np.uint64)
+        for col in range(rows):
+            key = (key ^ block[:, col]) * np.uint64(0x9E3779B97F4A7C15)
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        new_group = np.concatenate(([True], sorted_key[1:] != sorted_key[:-1]))
+        # 桶内每题都和桶里第一题配对（星形），避免大桶里两两配对
+        leader = order[np.flatnonzero(new_group)[np.cumsum(new_group) - 1]]
+        member = leader != order
+        pairs.append(np.stack((leader[member], order[member]), axis=1))
+    if not pairs:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    pairs = np.concatenate(pairs)
+    # 编成一个整数去重（比按行去重快得多），小号在前
+    code = np.unique(np.minimum(pairs[:, 0], pairs[:, 1]) * n + np.maximum(pairs[:, 0], pairs[:, 1]))
+    return code // n, code % n
+
+
+def find_duplicates(questions, threshold=THRESHOLD):
+    """
+    在题目列表中找近似重复簇，返回 [[下标, ...], ...]（每簇按下标升序，簇按首题下标排序）。
+    题型不同的题不会归为一簇。
+    """
+    questions = list(questions)
+    sig = minhash_signatures([question_text(q) for q in questions])
+    a, b = candidate_pairs(sig)
+    similarity = (sig[a] == sig[b]).mean(axis=1)
+    keep = similarity >= threshold
+    parent = list(range(len(questions)))
+
+    def root(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for x, y in zip(a[keep].tolist(), b[keep].tolist()):
+        if questions[x]['type'] != questions[y]['type']:
+            continue
+        rx, ry = root(x), root(y)
+        if rx != ry:
+            parent[max(rx, ry)] = min(rx, ry)
+    clusters = {}
+    for x in range(len(questions)):
+        clusters.setdefault(root(x), []).append(x)
+    return sorted((c for c in clusters.values() if len(c) > 1), key=lambda c: c[0])
+
+
+def collapse(count, clusters):
+    """每个重复簇只保留第一题，返回保留下来的下标列表"""
+    dropped = {i for cluster in clusters for i in cluster[1:]}
+    return [i for i in range(count) if i not in dropped]
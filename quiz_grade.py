@@ -0,0 +1,158 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+import quiz_cache
+import quiz_metrics
+
+# ===========================
+# 批量阅卷（答题卡 CSV / JSONL）
+# ===========================
+# 试卷定义用组卷时导出的 papers.json（每套每题的题型和标准答案，见 quiz_paper.export_papers）。
+# 答题卡每行一个学生：学生、试卷名、按卷面顺序（单选、多选、判断）排列的各题作答。
+# 作答先按与交互刷题相同的规则规范化（去掉非字母、转大写、字母排序），再把每种不同的作答串
+# 编成一个整数，所有学生的作答成为 学生 × 题目 的整数矩阵，与答案向量一次比较完成判分。
+
+JUDGE_WORDS = {'对': 'A', '错': 'B', '√': 'A', '×': 'B', 'T': 'A', 'F': 'B', '正确': 'A', '错误': 'B'}
+POINTS = {'single': 1.0, 'multi': 1.0, 'judge': 1.0}
+TYPE_LABELS = dict(zip(quiz_cache.TYPES, ('单选', '多选', '判断')))
+
+
+def normalize_answer(text):
+    """作答规范化：去掉空格标点等非字母，转大写，多选字母排序（BA -> AB）"""
+    return "".join(sorted(filter(str.isalpha, text.strip().upper())))
+
+
+def normalize_judge(text):
+    """判断题作答：对/错、√/×、T/F 统一成 A/B，其余按选择题规则处理"""
+    text = text.strip()
+    return JUDGE_WORDS.get(text.upper()) or normalize_answer(text)
+
+
+def load_papers(path):
+    """读 papers.json，返回 {试卷名: [{'no', 'type', 'key', 'answer'}, ...]}"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {p['paper']: p['questions'] for p in data['papers']}
+
+
+def read_sheets(path, paper=None):
+    """
+    读答题卡，逐个产出 (学生, 试卷名, 作答列表)。
+    CSV：表头含 student 列，可选 paper 列，其余列按出现顺序依次为第 1、2、3... 题；
+    JSONL：每行 {"student": ..., "paper": ..., "answers": [...]}。
+    行里没写试卷名时用参数 paper。
+    """
+    if path.lower().endswith(('.jsonl', '.json')):
+        with open(path, encoding='utf-8-sig') as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    yield str(row['student']), row.get('paper') or paper, [str(a or '') for a in row['answers']]
+        return
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = [h.strip().lower() for h in next(reader, [])]
+        if 'student' not in header:
+            raise ValueError(f"{path}: 表头缺少 student 列")
+        s = header.index('student')
+        p = header.index('paper') if 'paper' in header else None
+        answer_cols = [c for c in range(len(header)) if c not in (s, p)]
+        for row in reader:
+            if not row:
+                continue
+            row += [''] * (len(header) - len(row))
+            yield row[s], (row[p] if p is not None else '') or paper, [row[c] for c in answer_cols]
+
+
+class Codebook:
+    """规范化后的作答串 <-> 整数编号；同一种原始写法只规范化一次"""
+
+    def __init__(self):
+        self.codes = {'': 0}
+        self.texts = ['']
+        self._raw = {}
+
+    def code(self, normalized):
+        code = self.codes.get(normalized)
+        if code is None:
+            code = self.codes[normalized] = len(self.texts)
+            self.texts.append(normalized)
+        return code
+
+    def encode(self, raw, judge):
+        cache_key = (raw, judge)
+        code = self._raw.get(cache_key)
+        if code is None:
+            code = self._raw[cache_key] = self.code(normalize_judge(raw) if judge else normalize_answer(raw))
+        return code
+
+
+@quiz_metrics.instrument('grade_batch')
+def grade(papers, sheets, points=None):
+    """
+    批量判分。papers 为 load_papers 的结果，sheets 为 (学生, 试卷名, 作答列表) 的序列。
+    返回 (学生成绩, 各题统计)：
+      学生成绩  [{'student', 'paper', 'score', 'total', 'correct', 'answered'}]，与答题卡顺序一致
+      各题统计  [{'paper', 'no', 'label', 'type', 'key', 'answer', 'count', 'correct', 'blank', 'top_wrong'}]
+                no 为答题卡上的列序（从 1 起），label 为卷面题号（如 多选3），top_wrong 为最多人选的错误答案
+    答题卡引用了不存在的试卷时抛出 ValueError。
+    """
+    points = dict(POINTS, **(points or {}))
+    book = Codebook()
+    groups = {}
+    order = []
+    for student, name, answers in sheets:
+        if not name:
+            raise ValueError(f"学生 {student} 的答题卡没有写试卷名，请指定试卷")
+        if name not in papers:
+            raise ValueError(f"学生 {student} 的试卷 {name!r} 不在试卷定义里")
+        questions = papers[name]
+        judge = [q['type'] == 'judge' for q in questions]
+        answers = answers[:len(questions)] + [''] * (len(questions) - len(answers))
+        row = [book.encode(a, j) for a, j in zip(answers, judge)]
+        group = groups.setdefault(name, ([], []))
+        order.append((name, len(group[0])))
+        group[0].append(student)
+        group[1].append(row)
+
+    students, summary = {}, []
+    for name, (names, rows) in groups.items():
+        questions = papers[name]
+        # 学生 × 题目 的作答编号矩阵，与标准答案编号一次比较
+        chosen = np.array(rows, np.int32).reshape(len(rows), len(questions))
+        key = np.array([book.code(normalize_answer(q['answer'])) for q in questions], np.int32)
+        weight = np.array([points[q['type']] for q in questions])
+        correct = chosen == key
+        scores = correct @ weight
+        n_correct = correct.sum(axis=1)
+        answered = (chosen != 0).sum(axis=1)
+        for r, student in enumerate(names):
+            students[name, r] = {'student': student, 'paper': name, 'score': float(scores[r]),
+                                 'total': float(weight.sum()), 'correct': int(n_correct[r]),
+                                 'answered': int(answered[r])}
+        per_question = correct.sum(axis=0)
+        blanks = (chosen == 0).sum(axis=0)
+        for c, q in enumerate(questions):
+            wrong = chosen[:, c][(chosen[:, c] != key[c]) & (chosen[:, c] != 0)]
+            top_wrong = ''
+            if len(wrong):
+                values, counts = np.unique(wrong, return_counts=True)
+                top_wrong = f"{book.texts[values[counts.argmax()]]}({counts.max()})"
+            summary.append({'paper': name, 'no': c + 1, 'label': f"{TYPE_LABELS[q['type']]}{q['no']}",
+                            'type': q['type'], 'key': q['key'], 'answer': q['answer'],
+                            'count': len(names), 'correct': int(per_question[c]), 'blank': int(blanks[c]),
+                            'top_wrong': top_wrong})
+    return [students[k] for k in order], summary
+
+
+def write_csv(path, rows, fields):
+    """写成带 BOM 的 UTF-8 CSV，Excel 直接打开不乱码"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
@@ -0,0 +1,266 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import random
+import resource
+import sys
+import tempfile
+import time
+
+# ===========================
+# 网页端并发压测（Streamlit AppTest 无头驱动）
+# ===========================
+# 每个模拟用户是一个 AppTest 会话，完整走一遍 设置 → 答题（选答案、提交、下一题）→ 成绩单，
+# 每次点击都是一次真实的脚本重跑。AppTest 不是线程安全的（运行时和脚本上下文是进程级的），
+# 所以并发数为 N 时起 N 个工作进程（spawn），每个进程先预热一次（加载题库、建缓存），
+# 全部就绪后才开始计时，各自从任务队列里领会话顺序跑完。同一进程里的会话共用 st.cache_resource，
+# 进程之间争用 CPU，并发升高时的排队延迟照样能测出来。
+# 逐级提高并发数，每级记录：
+#   各类操作（首屏、开始、作答、提交、下一题）重跑耗时的 p50 / p90 / p99 / 最大值
+#   吞吐（每秒重跑次数、每秒完成的会话数）
+#   每个会话的常驻内存（会话跑完、AppTest 还在内存里时工作进程的 RSS 增量，取平均）
+# 结果写成 JSON 报告，--compare 与旧报告逐项对比，用来比较不同版本。
+# 作答记录和会话检查点默认写到临时目录，不污染正式的 review.db。
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quiz_web.py")
+DEFAULT_LEVELS = (1, 4, 16)
+TIMEOUT = 60        # 秒：单次重跑的超时
+PERCENTILES = (50, 90, 99)
+
+
+def rss_bytes():
+    """当前进程的常驻内存；没有 /proc 时退回历史峰值"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def percentile(values, p):
+    """最近秩百分位数，values 需已排序"""
+    if not values:
+        return None
+    k = max(0, min(len(values) - 1, round(p / 100 * len(values) + 0.5) - 1))
+    return values[k]
+
+
+class SessionDriver:
+    """一个模拟用户：按真实点击顺序驱动 AppTest，并记录每次重跑的耗时"""
+
+    def __init__(self, questions, rng):
+        from streamlit.testing.v1 import AppTest
+        self.app = AppTest.from_file(APP, default_timeout=TIMEOUT)
+        self.questions = questions
+        self.rng = rng
+        self.timings = []       # [(操作, 秒)]
+
+    def _run(self, action, element=None):
+        start = time.perf_counter()
+        (element or self.app).run()
+        self.timings.append((action, time.perf_counter() - start))
+        if self.app.exception:
+            raise RuntimeError(f"{action}: {self.app.exception[0].message}")
+
+    def play(self):
+        app = self.app
+        self._run('load')
+        app.sidebar.slider[0].set_value(self.questions)
+        app.sidebar.selectbox[0].set_value("混合全练")
+        self._run('setup')
+        app.sidebar.button[0].click()
+        self._run('start')
+        while app.session_state.quiz_state == 'playing':
+            if app.radio:
+                radio = app.radio[0]
+                self._run('select', radio.set_value(self.rng.choice(radio.options)))
+            else:
+                for box in app.checkbox:
+                    if self.rng.random() < 0.5:
+                        box.check()
+                app.checkbox[0].check()
+                self._run('select')
+            app.button[0].click()
+            self._run('submit')
+            app.button[0].click()
+            self._run('next')
+        if app.session_state.quiz_state != 'finished':
+            raise RuntimeError(f"会话停在 {app.session_state.quiz_state}，没有走到成绩单")
+        return self.timings
+
+
+def play_session(questions, seed):
+    """跑一个完整会话，返回 (各次重跑耗时, RSS 增量, 错误信息)；出错时耗时照样保留"""
+    before = rss_bytes()
+    driver = SessionDriver(questions, random.Random(seed))
+    try:
+        driver.play()
+        error = None
+    except Exception as e:  # 单个会话失败不影响其余会话，计入错误数
+        error = f"{type(e).__name__}: {e}"
+    return driver.timings, rss_bytes() - before, error
+
+
+def _worker(questions, seed, ready, tasks, results):
+    """工作进程：预热后在 ready 上等齐，再逐个领会话跑，None 表示收工"""
+    try:
+        play_session(questions, seed)
+    finally:
+        ready.wait()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        results.put(play_session(questions, task))
+
+
+def run_level(concurrency, sessions, questions, seed=0):
+    """以 concurrency 个工作进程（每个一个并发用户）跑 sessions 个完整会话，返回这一级的统计"""
+    rng = random.Random(seed)
+    ctx = mp.get_context('spawn')
+    ready = ctx.Barrier(concurrency + 1)
+    tasks, results = ctx.Queue(), ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(questions, rng.random(), ready, tasks, results), daemon=True)
+               for _ in range(concurrency)]
+    for w in workers:
+        w.start()
+    ready.wait()        # 全部预热完才开始计时
+
+    start = time.perf_counter()
+    for _ in range(sessions):
+        tasks.put(rng.random())
+    for _ in workers:
+        tasks.put(None)
+    outcomes = []
+    while len(outcomes) < sessions:
+        try:
+            outcomes.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(w.is_alive() for w in workers):
+                break   # 工作进程异常退出，剩下的会话算失败
+    wall = time.perf_counter() - start
+    for w in workers:
+        w.join(timeout=TIMEOUT)
+        if w.is_alive():
+            w.terminate()
+
+    errors = [error for _, _, error in outcomes if error]
+    errors += ["工作进程异常退出"] * (sessions - len(outcomes))
+    by_action = {}
+    for timings, _, _ in outcomes:
+        for action, seconds in timings:
+            by_action.setdefault(action, []).append(seconds)
+    everything = sorted(s for values in by_action.values() for s in values)
+    latency = {'all': _summary(everything)}
+    for action, values in by_action.items():
+        latency[action] = _summary(sorted(values))
+    per_session = sum(rss for _, rss, _ in outcomes) / max(1, len(outcomes))
+    return {'concurrency': concurrency, 'sessions': sessions, 'completed': sessions - len(errors),
+            'errors': errors[:5], 'error_count': len(errors), 'wall_s': round(wall, 3),
+            'reruns': len(everything), 'reruns_per_s': round(len(everything) / wall, 2),
+            'sessions_per_s': round((sessions - len(errors)) / wall, 3),
+            'rss_per_session_mb': round(per_session / 2 ** 20, 3), 'latency_ms': latency}
+
+
+def _summary(values):
+    if not values:
+        return None
+    out = {f"p{p}": round(percentile(values, p) * 1000, 2) for p in PERCENTILES}
+    out['max'] = round(values[-1] * 1000, 2)
+    out['count'] = len(values)
+    return out
+
+
+def print_level(level, old=None):
+    line = (f"并发 {level['concurrency']:>3}：{level['completed']}/{level['sessions']} 会话完成，"
+            f"{level['reruns_per_s']:.1f} 次重跑/秒，每会话 {level['rss_per_session_mb']:.2f} MB")
+    if level['error_count']:
+        line += f"，{level['error_count']} 个会话出错（如 {level['errors'][0]}）"
+    print(line)
+    for action, s in level['latency_ms'].items():
+        if s is None:
+            continue
+        text = f"    {action:<7} p50 {s['p50']:>8.1f}  p90 {s['p90']:>8.1f}  p99 {s['p99']:>8.1f}  max {s['max']:>8.1f} ms"
+        base = (old or {}).get('latency_ms', {}).get(action)
+        if base:
+            text += f"   （p90 {_change(s['p90'], base['p90'])}）"
+        print(text)
+    if old:
+        print(f"    吞吐 {_change(level['reruns_per_s'], old['reruns_per_s'])}，"
+              f"每会话内存 {_change(level['rss_per_session_mb'], old['rss_per_session_mb'])}")
+
+
+def _change(new, old):
+    if not old:
+        return "-"
+    return f"{(new - old) / old:+.0%}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="网页端并发压测：无头驱动多个会话完整答题，报告重跑延迟、吞吐和每会话内存")
+    parser.add_argument("--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS),
+                        help="逐级测试的并发数，默认 1 4 16")
+    parser.add_argument("--sessions", type=int, default=None, help="每级会话数，默认为并发数的 2 倍")
+    parser.add_argument("--questions", type=int, default=5, help="每个会话的题数，默认 5（滑块最小值）")
+    parser.add_argument("--bank", default=None, help="题库文件或目录，默认取 QUIZ_BANK 或 tiku.txt")
+    parser.add_argument("--synthetic", type=int, default=None, metavar="N",
+                        help="改用 N 道题的合成题库（见 quiz_bench）")
+    parser.add_argument("--out", default="load_report.json", help="报告输出文件，默认 load_report.json")
+    parser.add_argument("--compare", default=None, help="与旧报告逐级对比")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    # 下面会切到网页脚本所在目录，命令行里的相对路径先按调用时的目录展开
+    args.out = os.path.abspath(args.out)
+    args.compare = args.compare and os.path.abspath(args.compare)
+    args.bank = args.bank and os.path.abspath(args.bank)
+
+    workdir = tempfile.mkdtemp(prefix="quiz_load_")
+    # 作答记录和检查点写到临时目录；必须在网页脚本第一次导入这些模块之前设置（工作进程继承环境变量）
+    os.environ.setdefault("QUIZ_REVIEW_DB", os.path.join(workdir, "review.db"))
+    os.environ.setdefault("QUIZ_SESSION_DIR", os.path.join(workdir, "sessions"))
+    # 每个工作进程都会打一遍“请用 streamlit run 启动”的提示，压测时关掉
+    os.environ.setdefault("STREAMLIT_GLOBAL_SHOW_WARNING_ON_DIRECT_EXECUTION", "false")
+    if args.synthetic:
+        import quiz_bench
+        bank = os.path.join(workdir, "synthetic.txt")
+        quiz_bench.write_bank(bank, args.synthetic, args.seed)
+        os.environ["QUIZ_BANK"] = bank
+    elif args.bank:
+        os.environ["QUIZ_BANK"] = args.bank
+    os.chdir(os.path.dirname(APP))
+
+    import streamlit
+    old = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old = {level['concurrency']: level for level in json.load(f)['levels']}
+    report = {'app': 'quiz_web.py', 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'python': platform.python_version(), 'streamlit': streamlit.__version__, 'cpus': os.cpu_count(),
+              'bank': os.environ.get("QUIZ_BANK", "tiku.txt"), 'questions_per_session': args.questions,
+              'levels': []}
+
+    # 先在主进程里建好题库缓存，各工作进程预热时直接命中
+    _, _, error = play_session(args.questions, args.seed)
+    if error:
+        print(f"预热会话失败：{error}", file=sys.stderr)
+        return 1
+    for concurrency in args.levels:
+        sessions = args.sessions or concurrency * 2
+        level = run_level(concurrency, sessions, args.questions, args.seed + concurrency)
+        report['levels'].append(level)
+        print_level(level, (old or {}).get(concurrency))
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"\n报告已写入 {args.out}")
+    return 1 if any(level['error_count'] for level in report['levels']) else 0
+
+
+if __name__ == "__main__":
+    # AppTest 运行网页脚本时会顶替 sys.modules['__main__']，工作进程的入口要按模块名 quiz_load 找
+    import quiz_load
+    sys.exit(quiz_load.main())
@@ -0,0 +1,210 @@
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+
+# ===========================
+# 热点计时与指标导出（Prometheus 文本格式）
+# ===========================
+# 设置环境变量 QUIZ_METRICS=<文件路径> 后启用（路径里的 {pid} 换成进程号，多进程部署时各写各的）：
+#   timed(名称, 标签...)      计时，记入直方图 quiz_<名称>_seconds
+#   count(名称, n, 标签...)   计数器 quiz_<名称>_total
+#   gauge(名称, 值或函数)     仪表，函数在导出时才调用
+# 指标最多每 FLUSH_INTERVAL 秒原子写一次文件（node_exporter 的 textfile 收集器可直接读），退出时再写一次；
+# quiz_api 另提供 GET /metrics。QUIZ_METRICS_LOG=1 时每次计时结束再往 stderr 打一行耗时。
+# 未启用时 timed 返回同一个空上下文、instrument 直接返回原函数，热点路径上只多一次布尔判断。
+
+PATH = os.environ.get("QUIZ_METRICS", "").replace("{pid}", str(os.getpid()))
+ENABLED = bool(PATH)
+LOG = os.environ.get("QUIZ_METRICS_LOG", "") not in ("", "0")
+FLUSH_INTERVAL = 5.0
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms = {}    # (名称, 标签) -> [各桶计数..., 总次数, 总秒数]
+_counters = {}      # (名称, 标签) -> 次数
+_gauges = {}        # (名称, 标签) -> 值或无参函数
+_flushed = time.monotonic()
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _Noop()
+
+
+class _Timer:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.key, time.perf_counter() - self.start)
+        return False
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def timed(name, **labels):
+    """计时上下文：with timed('parse', source='web'): ...；异常（包括 st.rerun）也照样记一次"""
+    if not ENABLED:
+        return _NOOP
+    return _Timer(_key(name, labels))
+
+
+def instrument(name, **labels):
+    """函数计时装饰器；未启用时原样返回函数，没有任何额外开销"""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        key = _key(name, labels)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(key, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def observe(key, seconds):
+    """记一次耗时；key 为 (名称, 标签元组)"""
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        h[-2] += 1
+        h[-1] += seconds
+    if LOG:
+        labels = ''.join(f" {k}={v}" for k, v in key[1])
+        print(f"[metrics] {key[0]} {seconds * 1000:.1f}ms{labels}", file=sys.stderr, flush=True)
+    _maybe_flush()
+
+
+def count(name, n=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+    _maybe_flush()
+
+
+def gauge(name, value, **labels):
+    """设置仪表值；value 可以是无参函数，导出时才求值（如进程内存、活跃会话数）"""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ''
+    escape = lambda v: (str(v).lower() if isinstance(v, bool) else str(v)).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in pairs) + '}'
+
+
+def render():
+    """全部指标的 Prometheus 文本格式"""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    lines = []
+    typed = set()
+
+    def header(metric, kind):
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} {kind}")
+
+    for (name, labels), h in sorted(histograms.items()):
+        metric = f"quiz_{name}_seconds"
+        header(metric, 'histogram')
+        cumulative = 0
+        for bound, n in zip(BUCKETS, h):
+            cumulative += n
+            lines.append(f"{metric}_bucket{_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{metric}_bucket{_labels(labels, [('le', '+Inf')])} {h[-2]}")
+        lines.append(f"{metric}_sum{_labels(labels)} {h[-1]:.6f}")
+        lines.append(f"{metric}_count{_labels(labels)} {h[-2]}")
+    for (name, labels), n in sorted(counters.items()):
+        metric = f"quiz_{name}_total"
+        header(metric, 'counter')
+        lines.append(f"{metric}{_labels(labels)} {n}")
+    for (name, labels), value in sorted(gauges.items(), key=lambda item: item[0]):
+        try:
+            value = value() if callable(value) else value
+        except Exception:  # 取值失败的仪表这次不导出，不影响其余指标
+            continue
+        metric = f"quiz_{name}"
+        header(metric, 'gauge')
+        lines.append(f"{metric}{_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def flush(path=None):
+    """把指标原子写到文件（先写临时文件再改名，收集器不会读到半个文件）"""
+    path = path or PATH
+    if not path:
+        return
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(render())
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _maybe_flush():
+    """到时间了就写文件；同一时刻只有一个线程去写"""
+    global _flushed
+    now = time.monotonic()
+    if now - _flushed < FLUSH_INTERVAL:
+        return
+    with _lock:
+        if now - _flushed < FLUSH_INTERVAL:
+            return
+        _flushed = now
+    flush()
+
+
+def rss_bytes():
+    """进程常驻内存（Linux 读 /proc，其余平台返回 0）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+if ENABLED:
+    gauge('process_resident_bytes', rss_bytes)
+    atexit.register(flush)
@@ -0,0 +1,174 @@
+import json
+import os
+from array import array
+
+import numpy as np
+
+import quiz_cache
+import quiz_parser
+import quiz_source
+import quiz_weighted
+
+# ===========================
+# 批量组卷（题型配额 + 章节覆盖 + 限制试卷间重复）
+# ===========================
+# 全部基于与题号对齐的数组：题型 / 分库掩码（quiz_weighted.pool_mask）、章节掩码（quiz_source），
+# 以及每题已被用过的次数 usage。每张卷子：
+#   1. 每个要求覆盖的章节先各取 per_chapter 道（从还有配额的题型里选）
+#   2. 各题型剩余配额从题型池里补足
+# 逐题选取“用得最少 + 随机扰动”得分最低的题，题量够时各卷完全不重复，不够时重复也被均匀摊开。
+# 同时累计本卷与之前每套卷子的重复题数（试卷 × 题目 的 0/1 矩阵），某套旧卷的重复达到上限后，
+# 它的其余题就不再选。实在避不开时换一组随机扰动重组，几次都不行则报错（约束无法满足）。
+
+DEFAULT_QUOTAS = {'single': 20, 'multi': 10, 'judge': 10}
+MAX_OVERLAP = 0.3       # 任意两张卷子的重复题数不超过卷面题数的 30%
+RETRIES = 20
+TYPE_NAMES = {'single': '单项选择题', 'multi': '多项选择题', 'judge': '判断题'}
+
+_rng = np.random.default_rng()
+
+
+def _compose(quotas, chapters, per_chapter, type_pools, chapter_masks, usage, used, limit, rng):
+    """
+    按配额和章节覆盖组一张卷子，返回 {题型: 题号数组}。
+    used 为之前各卷的 0/1 矩阵：某套旧卷与本卷的重复已达 limit 时，它的其余题不再选（实在没得选才破例）。
+    """
+    score = usage + rng.random(len(usage))
+    taken = np.zeros(len(usage), bool)
+    free = np.ones(len(usage), bool)  # 没选过、也没被屏蔽的题
+    shared = np.zeros(len(used), np.int64)
+    left = dict(quotas)
+    picked = {t: [] for t in quotas}
+
+    def best(pool):
+        """pool 中得分最低的一道题，优先不被屏蔽的"""
+        for candidates in (pool & free, pool & ~taken):
+            ids = np.flatnonzero(candidates)
+            if len(ids):
+                return ids[np.argmin(score[ids])]
+        return None
+
+    def take(t, i):
+        picked[t].append(i)
+        taken[i] = True
+        free[i] = False
+        left[t] -= 1
+        hit = np.flatnonzero(used[:, i])
+        shared[hit] += 1
+        full = hit[shared[hit] >= limit]
+        if len(full):
+            free[used[full].any(axis=0)] = False
+
+    for c in chapters:
+        for _ in range(per_chapter):
+            # 从还有配额的题型里挑这一章得分最低的一道
+            options = [(t, best(chapter_masks[c] & type_pools[t])) for t in quotas if left[t]]
+            options = [(score[i], t, i) for t, i in options if i is not None]
+            if not options:
+                raise ValueError(f"{quiz_parser.chapter_label(c)}的题不够，无法满足每章 {per_chapter} 题的覆盖要求")
+            _, t, i = min(options)
+            take(t, i)
+    for t in quotas:
+        while left[t]:
+            i = best(type_pools[t])
+            if i is None:
+                raise ValueError(f"出题范围内的{TYPE_NAMES[t]}不够每卷 {quotas[t]} 道")
+            take(t, i)
+    return {t: np.sort(np.array(ids, np.int64)) for t, ids in picked.items()}
+
+
+def generate_papers(bank, count, quotas=None, chapters=None, per_chapter=1, max_overlap=MAX_OVERLAP,
+                    tags=None, rng=_rng):
+    """
+    生成 count 张试卷，返回 [{题型: 题号数组}]（卷内按题型分组，题号升序）。
+    quotas      每卷各题型题数，默认 DEFAULT_QUOTAS；为 0 的题型不出
+    chapters    章号集合：只从这些章出题，且每卷每章至少 per_chapter 道；None 为不限章节、不要求覆盖
+    max_overlap 任意两卷重复题数占卷面题数的上限 (0-1)
+    约束无法满足时抛出 ValueError。
+    """
+    quotas = {t: k for t, k in (quotas or DEFAULT_QUOTAS).items() if k > 0}
+    size = sum(quotas.values())
+    if not size:
+        raise ValueError("每卷至少要有一道题")
+    chapters = sorted(chapters) if chapters is not None else []
+    index = quiz_source.index_for(bank)
+    scope = index.mask(chapters or None)
+    type_pools = {t: quiz_weighted.pool_mask(bank, (t,), tags)[0] & scope for t in quotas}
+    chapter_masks = {c: index.mask({c}) for c in chapters}
+    if len(chapters) * per_chapter > size:
+        raise ValueError(f"每卷只有 {size} 题，覆盖不了 {len(chapters)} 章 × {per_chapter} 题")
+
+    limit = int(max_overlap * size)
+    usage = np.zeros(len(bank))
+    used = np.zeros((count, len(bank)), bool)  # 试卷 × 题目的 0/1 矩阵
+    papers = []
+    for p in range(count):
+        best = None
+        for _ in range(RETRIES):
+            paper = _compose(quotas, chapters, per_chapter, type_pools, chapter_masks, usage, used[:p], limit, rng)
+            ids = np.concatenate(list(paper.values()))
+            worst = int(used[:p, ids].sum(axis=1).max()) if p else 0
+            if best is None or worst < best[0]:
+                best = (worst, paper, ids)
+            if worst <= limit:
+                break
+        worst, paper, ids = best
+        if worst > limit:
+            raise ValueError(f"第 {p + 1} 张卷子与之前的卷子最少也重复 {worst} 题，超过上限 {limit} 题；"
+                             f"请减少卷数、放宽重复率或扩大出题范围")
+        used[p, ids] = True
+        usage[ids] += 1
+        papers.append(paper)
+    return papers
+
+
+def paper_ids(paper):
+    """一张卷子的全部题号（按 单选、多选、判断 顺序），与 bank.sample 的返回类型相同"""
+    return array('I', [i for t in quiz_cache.TYPES for i in paper.get(t, ())])
+
+
+def format_paper(questions, title):
+    """试卷正文：标准题库格式去掉答案和解析"""
+    return f"{title}\n" + quiz_parser.format_questions(questions, answers=False)
+
+
+def format_answer_key(questions, title):
+    """答案卷：按题型分节，每行 题号.答案（判断题写 对/错）"""
+    lines = [f"{title} 参考答案"]
+    for q_type, bucket in zip(quiz_cache.TYPES, quiz_parser.split_by_type(questions)):
+        if not bucket:
+            continue
+        lines.append(quiz_parser.SECTION_TITLES[q_type])
+        for n, q in enumerate(bucket, 1):
+            answer = {'A': '对', 'B': '错'}.get(q['answer'], q['answer']) if q_type == 'judge' else q['answer']
+            lines.append(f"{n}.{answer}")
+    return '\n'.join(lines) + '\n'
+
+
+def export_papers(bank, papers, out_dir, title="试卷"):
+    """
+    把试卷写到 out_dir：每卷 试卷_001.txt（题目）和 试卷_001_答案.txt（答案卷），
+    另写 papers.json 记录每卷每题的题目标识、题型和答案（供批量阅卷使用）。返回写出的卷数。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+    width = max(3, len(str(len(papers))))
+    for p, paper in enumerate(papers, 1):
+        ids = paper_ids(paper)
+        questions = [bank.question(i) for i in ids]
+        name = f"{title}_{p:0{width}d}"
+        with open(os.path.join(out_dir, f"{name}.txt"), 'w', encoding='utf-8') as f:
+            f.write(format_paper(questions, name))
+        with open(os.path.join(out_dir, f"{name}_答案.txt"), 'w', encoding='utf-8') as f:
+            f.write(format_answer_key(questions, name))
+        # 卷面题号按题型分节从 1 开始，与 format_paper 一致
+        numbers = dict.fromkeys(quiz_cache.TYPES, 0)
+        entries = []
+        for i, q in zip(ids, questions):
+            numbers[q['type']] += 1
+            entries.append({'no': numbers[q['type']], 'type': q['type'], 'key': bank.key(i), 'answer': q['answer']})
+        manifest.append({'paper': name, 'questions': entries})
+    with open(os.path.join(out_dir, 'papers.json'), 'w', encoding='utf-8') as f:
+        json.dump({'bank': bank.version, 'papers': manifest}, f, ensure_ascii=False, indent=1)
+    return len(papers)
+
@@ -0,0 +1,711 @@
+import codecs
+import functools
+import gc
+import io
+import re
+import zipfile
+from bisect import bisect_right
+from contextlib import contextmanager
+from xml.etree import ElementTree
+
+# ===========================
+# 题库解析引擎（quiz.py 与 quiz_web.py 共用）
+# ===========================
+# 整段文本先走“整题正则”快速通道（C 层一次匹配一整题），不规范的片段回退到逐行状态机；
+# 正则全部预编译，续行直接拼接到“最后一个选项”，不再每行排序选项键。
+
+# 匹配大标题 (一、单项... 二、多项... 三、判断...)
+SECTION_PAT = re.compile(r'^[一二三四]、\s*(.*)')
+# 匹配题目开头: "1.题目" 或 "10. 题目"（全角点已预先统一为半角）
+Q_START_PAT = re.compile(r'^(\d+)\s*[.](.*)')
+# 匹配答案行: "答案：A" 或 "答案: 对"
+ANS_PAT = re.compile(r'^答案\s*[：:]\s*(.*)')
+# 匹配解析行
+EXPL_PAT = re.compile(r'^答案解析\s*[：:]\s*(.*)')
+# 一行中的所有选项 (A.xxx B.xxx)：找 A-E 开头，后面跟点，直到下一个 A-E+点 或 行尾
+INLINE_OPT_PAT = re.compile(r'([A-E])\s*[.]\s*(.*?)(?=\s+[A-E]\s*[.]|$)')
+# 题目行粘连选项 (例如: "1.题目内容 A.选项")，要求 A 前面有空格
+GLUED_OPT_PAT = re.compile(r'\s+[A-E]\s*[.]')
+# 以选项开头的行 (例如: "A.xxx"、"B . xxx")
+OPT_LINE_PAT = re.compile(r'[A-E]\s*[.]')
+
+# --- 整题快速通道（对整段文本匹配，无需逐行处理）---
+# 分组一律用 '.*' 贪婪匹配到行尾，首尾空白交给 str.strip()：'.*' 有专门的快速循环，
+# 而字符集（如 [^\n.]*）逐字符查表要慢一个数量级，也避免了惰性匹配的逐字符回溯。
+# 快速通道只会比逐行状态机“更严格”，匹配不上的片段都回退到状态机，结果一致。
+# 大标题行（以换行符开头，文本开头会补一个换行）
+SECTION_LINE_PAT = re.compile(r'\n[^\S\n]*[一二三四]、(.*)')
+# 题目结束位置：后面紧跟下一题、下一个大标题或文本结尾（不吞掉下一题前的换行）
+_Q_END = r'(?=\s*\n[ \t]*(?:\d+[ \t]*[.]|[一二三四]、)|\s*\Z)'
+_ANS_EXPL = r'\n\s*答案[ \t]*[：:](.*)(?:\n\s*答案解析[ \t]*[：:](.*))?' + _Q_END
+
+
+def _std_option(key):
+    return r'\n\s*%s[ \t]*[.](.*)' % key
+
+
+# 标准选择题：题干一行，A-E 每行一个选项，答案，可选解析
+# 以换行符开头，让正则引擎用字面量前缀快速跳到行首，而不是逐字符尝试 '^'
+STD_CHOICE_PAT = re.compile(
+    r'\n[ \t]*(\d+)[ \t]*[.](.*)'
+    + _std_option('A') + _std_option('B')
+    + ''.join('(?:%s)?' % _std_option(k) for k in 'CDE')
+    + _ANS_EXPL)
+# 标准判断题：题干一行，答案，可选解析
+STD_JUDGE_PAT = re.compile(r'\n[ \t]*(\d+)[ \t]*[.](.*)' + _ANS_EXPL)
+
+SECTION_CHARS = frozenset('一二三四')
+OPTION_CHARS = frozenset('ABCDE')
+CHOICE_TYPES = ('single', 'multi')
+
+
+def section_type(title):
+    """根据大标题文字判断题型，简答题等返回 'ignore'"""
+    if "单项" in title:
+        return 'single'
+    if "多项" in title:
+        return 'multi'
+    if "判断" in title:
+        return 'judge'
+    return 'ignore'
+
+
+def _finish(q):
+    """题目收尾：判断题强行生成选项，并把 对/错 转为 A/B 以便统一判分"""
+    if q['type'] == 'judge':
+        q['options'] = {'A': '对', 'B': '错'}
+        if '对' in q['answer']:
+            q['answer'] = 'A'
+        elif '错' in q['answer']:
+            q['answer'] = 'B'
+    return q
+
+
+def iter_questions(lines, section=None):
+    """
+    逐行驱动的状态机，按出现顺序逐题产出题目字典。
+    lines 可以是任意可迭代的文本行（列表、文件对象、生成器）；
+    section 为起始题型，用于从某个大标题中间接着解析。
+    """
+    current_section = section
+    q = None
+    options = None
+    last_key = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if '．' in line:
+            # 统一标点，替换全角点为半角点，方便正则
+            line = line.replace('．', '.')
+        c = line[0]
+
+        # --- 1. 识别大类 ---
+        if c in SECTION_CHARS and line[1:2] == '、':
+            if q is not None and q['type'] is not None:
+                yield _finish(q)
+            q = None
+            current_section = section_type(SECTION_PAT.match(line).group(1))
+            continue
+
+        if current_section == 'ignore':
+            continue
+
+        # --- 2. 识别题目开始 ---
+        if c.isdigit():
+            q_match = Q_START_PAT.match(line)
+            if q_match:
+                if q is not None and q['type'] is not None:
+                    yield _finish(q)
+                content = q_match.group(2).strip()
+                options = {}
+                last_key = None
+                q = {
+                    'type': current_section,
+                    'id': q_match.group(1),
+                    'content': content,
+                    'options': options,
+                    'answer': '',
+                    'explanation': ''
+                }
+                if current_section not in CHOICE_TYPES:
+                    continue
+                # 【关键修复】检测题目行是否粘连了选项，截断题目，剩余部分作为选项行处理
+                glued = GLUED_OPT_PAT.search(content)
+                if not glued:
+                    continue
+                q['content'] = content[:glued.start()]
+                line = content[glued.start():].lstrip()
+                c = line[0]
+
+        if q is None:
+            continue
+
+        # --- 3. 识别内容 (答案、解析、选项) ---
+        if c == '答':
+            if line.startswith('答案解析'):
+                m = EXPL_PAT.match(line)
+                if m:
+                    q['explanation'] = m.group(1)
+                    continue
+            else:
+                m = ANS_PAT.match(line)
+                if m:
+                    q['answer'] = m.group(1).strip().upper()
+                    continue
+
+        if q['answer']:
+            # 答案之后：有解析时，折行属于解析；选项行（答案写在选项前面的不规范题库）仍按选项处理，
+            # 没有解析时其余行与答案之前一样拼到题干或上一个选项（与原网页版解析器一致）
+            if line.startswith(('答案', '解析')):
+                continue
+            if q['explanation'] and (q['type'] == 'judge' or not (c in OPTION_CHARS and OPT_LINE_PAT.match(line))):
+                q['explanation'] += line
+                continue
+
+        if q['type'] == 'judge':
+            # 判断题没有选项行，所有非关键词行都属于题目
+            if not line.startswith(('答案', '解析')):
+                q['content'] += line
+            continue
+
+        # 3.3 选项 (仅单选/多选)
+        dot = line.find('.')
+        if dot < 0:
+            # 既不是选项也不是标签，拼接到题目内容或上一个选项
+            if last_key is None:
+                q['content'] += line
+            else:
+                options[last_key] += " " + line
+        elif c in OPTION_CHARS and dot == 1 and line.find('.', 2) < 0:
+            # 最常见的情况：一行一个标准选项 "A.xxx"
+            options[c] = line[2:].strip()
+            if last_key is None or c > last_key:
+                last_key = c
+        else:
+            found = False
+            for m in INLINE_OPT_PAT.finditer(line):
+                found = True
+                k = m.group(1)
+                options[k] = m.group(2).strip()
+                if last_key is None or k > last_key:
+                    last_key = k
+            if not found:
+                if last_key is None:
+                    q['content'] += line
+                else:
+                    options[last_key] += " " + line
+
+    if q is not None and q['type'] is not None:
+        yield _finish(q)
+
+
+def iter_text_questions(text, section=None):
+    """
+    整段文本解析：标准格式的题目由整题正则一次匹配（C 层完成），
+    不规范的片段（粘连、续行、一行多个选项等）回退到逐行状态机，题目顺序不变。
+    """
+    # 统一换行与全角点：行尾不再带 '\r'，多数分组 strip() 时无需复制字符串
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    yield from _iter_block('\n' + text, section)
+
+
+def _iter_block(text, section):
+    """
+    解析一段以换行开头的文本，section 为段首所处的题型。
+    返回段末所处的题型，流式解析时交给下一段接着用。
+    """
+    if '．' in text:
+        text = text.replace('．', '.')
+    spans = []
+    start = 0
+    for header in SECTION_LINE_PAT.finditer(text):
+        spans.append((section, start, header.start()))
+        section = section_type(header.group(1))
+        start = header.end()
+    spans.append((section, start, len(text)))
+    for q_type, start, end in spans:
+        if q_type == 'judge':
+            yield from _iter_judge(text, start, end)
+        elif q_type in CHOICE_TYPES:
+            yield from _iter_choice(text, start, end, q_type)
+    return section
+
+
+def _iter_judge(text, start, end):
+    pos = start
+    for m in STD_JUDGE_PAT.finditer(text, start, end):
+        m_start, m_end = m.span()
+        if m_start > pos:
+            yield from iter_questions(text[pos:m_start].split('\n'), 'judge')
+        pos = m_end
+        q_id, content, answer, explanation = m.groups()
+        yield _finish({
+            'type': 'judge',
+            'id': q_id,
+            'content': content.strip(),
+            'options': None,
+            'answer': answer.strip().upper(),
+            'explanation': explanation.strip() if explanation else ''
+        })
+    if pos < end:
+        yield from iter_questions(text[pos:end].split('\n'), 'judge')
+
+
+def _iter_choice(text, start, end, q_type):
+    pos = start
+    for m in STD_CHOICE_PAT.finditer(text, start, end):
+        q_id, content, a, b, c, d, e, answer, explanation = m.groups()
+        if '.' in content and GLUED_OPT_PAT.search(content):
+            continue  # 题目行粘连选项，留给逐行状态机
+        if '.' in a or '.' in b or (c and '.' in c) or (d and '.' in d) or (e and '.' in e):
+            continue  # 选项里还有点，可能一行多个选项，留给逐行状态机
+        m_start, m_end = m.span()
+        if m_start > pos:
+            yield from iter_questions(text[pos:m_start].split('\n'), q_type)
+        pos = m_end
+        options = {'A': a.strip(), 'B': b.strip()}
+        if c is not None:
+            options['C'] = c.strip()
+        if d is not None:
+            options['D'] = d.strip()
+        if e is not None:
+            options['E'] = e.strip()
+        yield {
+            'type': q_type,
+            'id': q_id,
+            'content': content.strip(),
+            'options': options,
+            'answer': answer.strip().upper(),
+            'explanation': explanation.strip() if explanation else ''
+        }
+    if pos < end:
+        yield from iter_questions(text[pos:end].split('\n'), q_type)
+
+
+# ===========================
+# 流式解析（超大 / 多门课程合并的题库）
+# ===========================
+STREAM_CHUNK = 1 << 20  # 每次读取的字符数
+
+# 可以安全切块的位置：下一行是题目开头或大标题
+BOUNDARY_PAT = re.compile(r'\n[ \t]*(?:\d+[ \t]*[.．]|[一二三四]、)')
+
+
+def detect_encoding(head):
+    """根据文件开头一块字节判断编码：UTF-8（含 BOM）能解码就用 UTF-8，否则回退 GBK"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        # 增量解码器不会因为块尾被截断的多字节字符报错
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'gbk'
+
+
+def _last_boundary(buf):
+    """buf 中最后一个题目/大标题开头的位置（不含开头的换行），找不到返回 -1"""
+    last = -1
+    for start in (max(1, len(buf) - 65536), 1):
+        for m in BOUNDARY_PAT.finditer(buf, start):
+            last = m.start()
+        if last > 0 or start == 1:
+            return last
+    return last
+
+
+def iter_stream_questions(stream, section=None, chunk_size=STREAM_CHUNK):
+    """
+    从文本流逐块读取、在题目边界切块并逐题产出，大标题状态跨块延续。
+    峰值内存约为一块文本加上一道题，与题库总大小无关。
+    """
+    return _iter_chunks(iter(lambda: stream.read(chunk_size), ''), section)
+
+
+def _iter_chunks(chunks, section=None):
+    tail = '\n'
+    for chunk in chunks:
+        buf = tail + chunk
+        cut = _last_boundary(buf)
+        if cut <= 0:
+            tail = buf  # 一整块里都没有题目开头（超长的题），继续攒
+            continue
+        section = yield from _iter_block(buf[:cut], section)
+        tail = buf[cut:]
+    if tail.strip():
+        yield from _iter_block(tail, section)
+
+
+def iter_file_questions(filename, chunk_size=STREAM_CHUNK, hasher=None):
+    """
+    流式解析题库文件（.txt 或 .docx）：文本用第一块字节判断 UTF-8 / GBK，之后增量解码。
+    hasher 不为空时，读入的原始字节会顺便喂给它（编译缓存用来算内容哈希）。
+    """
+    if is_docx(filename):
+        if hasher is not None:
+            # zip 要跳着读（目录在文件尾），哈希只能单独顺序过一遍
+            with open(filename, 'rb') as raw:
+                for block in iter(lambda: raw.read(chunk_size), b''):
+                    hasher.update(block)
+        yield from _iter_chunks(_join_paragraphs(iter_docx_paragraphs(filename), chunk_size))
+        return
+
+    with open(filename, 'rb') as raw:
+        encoding = detect_encoding(raw.read(chunk_size))
+        raw.seek(0)
+        binary = raw if hasher is None else io.BufferedReader(_HashingReader(raw, hasher))
+        # 默认的通用换行模式会把 \r\n 统一成 \n，跨块的 \r\n 也能正确处理
+        stream = io.TextIOWrapper(binary, encoding=encoding)
+        yield from iter_stream_questions(stream, chunk_size=chunk_size)
+
+
+class _HashingReader(io.RawIOBase):
+    """读取原始字节的同时计算哈希，省掉单独再读一遍文件"""
+
+    def __init__(self, raw, hasher):
+        self.raw = raw
+        self.hasher = hasher
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.raw.readinto(b)
+        if n:
+            self.hasher.update(memoryview(b)[:n])
+        return n
+
+
+# ===========================
+# 增量解析（侧边栏编辑题库）
+# ===========================
+# 全文按题目 / 大标题边界切成片段，每段记下起点、段首题型和解析出的题目。
+# 改动后先找出新旧文本的公共前缀和后缀，只重新解析改动所在的片段（前后各多带一段，
+# 以防改动恰好删掉或造出一个边界）；大标题被改时，后续片段一直重解析到题型状态重新一致为止。
+
+_SCAN_BLOCK = 4096
+
+
+def _common_prefix(a, b, limit):
+    """a、b 公共前缀长度（不超过 limit）：先按块比较，再在块内逐字符"""
+    i = 0
+    while i + _SCAN_BLOCK <= limit and a[i:i + _SCAN_BLOCK] == b[i:i + _SCAN_BLOCK]:
+        i += _SCAN_BLOCK
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _common_suffix(a, b, limit):
+    la, lb = len(a), len(b)
+    i = 0
+    while i + _SCAN_BLOCK <= limit and a[la - i - _SCAN_BLOCK:la - i] == b[lb - i - _SCAN_BLOCK:lb - i]:
+        i += _SCAN_BLOCK
+    while i < limit and a[la - i - 1] == b[lb - i - 1]:
+        i += 1
+    return i
+
+
+def _parse_segment(text, section):
+    """解析一个片段，返回 (题目列表, 段末题型)"""
+    questions = []
+    block = _iter_block(text, section)
+    while True:
+        try:
+            questions.append(next(block))
+        except StopIteration as stop:
+            return questions, stop.value
+
+
+class IncrementalParser:
+    """
+    可增量更新的解析结果。update() 传入编辑后的全文，返回重新解析的片段数；
+    没改动的题目对象原样复用，questions() 的结果与 parse 整段文本相同。
+    """
+
+    def __init__(self, text=''):
+        self.text = '\n'
+        self._starts = [0]      # 各片段在 self.text 中的起点
+        self._sections = [None]  # 各片段段首所处的题型
+        self._parsed = [[]]     # 各片段解析出的题目
+        self.update(text)
+
+    def update(self, text):
+        if '\r' in text:
+            text = text.replace('\r\n', '\n')
+        new = '\n' + text
+        old = self.text
+        if new == old:
+            return 0
+        starts, sections, parsed = self._starts, self._sections, self._parsed
+        limit = min(len(old), len(new))
+        p = _common_prefix(old, new, limit)
+        old_end = len(old) - _common_suffix(old, new, limit - p)
+        delta = len(new) - len(old)
+
+        first = max(bisect_right(starts, p) - 2, 0)
+        last = bisect_right(starts, old_end)  # 第一个完全落在公共后缀里的片段
+        region_end = starts[last] + delta if last < len(starts) else len(new)
+
+        seg_starts = [starts[first]]
+        seg_starts.extend(m.start() for m in BOUNDARY_PAT.finditer(new, starts[first] + 1, region_end))
+        seg_ends = seg_starts[1:] + [region_end]
+        section = sections[first]
+        seg_sections = []
+        seg_parsed = []
+        for a, b in zip(seg_starts, seg_ends):
+            seg_sections.append(section)
+            questions, section = _parse_segment(new[a:b], section)
+            seg_parsed.append(questions)
+        # 改动影响了大标题：后面的片段按新的题型重解析，直到与原来的状态一致
+        while last < len(starts) and sections[last] != section:
+            a = starts[last] + delta
+            b = starts[last + 1] + delta if last + 1 < len(starts) else len(new)
+            seg_starts.append(a)
+            seg_sections.append(section)
+            questions, section = _parse_segment(new[a:b], section)
+            seg_parsed.append(questions)
+            last += 1
+
+        self._starts = starts[:first] + seg_starts + [x + delta for x in starts[last:]]
+        self._sections = sections[:first] + seg_sections + sections[last:]
+        self._parsed = parsed[:first] + seg_parsed + parsed[last:]
+        self.text = new
+        return len(seg_starts)
+
+    def copy(self):
+        """浅拷贝：片段列表各自独立，题目对象共享（update 只替换、不修改题目对象）"""
+        other = IncrementalParser.__new__(IncrementalParser)
+        other.text = self.text
+        other._starts = list(self._starts)
+        other._sections = list(self._sections)
+        other._parsed = list(self._parsed)
+        return other
+
+    def questions(self):
+        """全部题目（按文本顺序）"""
+        return [q for part in self._parsed for q in part]
+
+
+# ===========================
+# 解析中的出处（教材章节、页码、引用文件）
+# ===========================
+# 答案解析一般以“参见《…概论》2023版教材第九章第191页”开头，抽成结构化字段：
+#   chapter    0 为导论，1.. 为第几章；认不出时为 None
+#   pages      (起始页, 结束页)，如 “第96-97页”、“第96页至97页”；单页时两者相同
+#   edition    教材版本年份（字符串），如 '2023'
+#   documents  教材以外引用的文件，如 《中共中央关于党的百年奋斗重大成就和历史经验的决议》
+BOOK_PAT = re.compile(r'《([^《》]+)》')
+TEXTBOOK_PAT = re.compile(
+    r'(?:(\d{4})\s*版)?\s*教材\s*(?:(导论)|第\s*([〇零一二三四五六七八九十\d]+)\s*章)?'
+    r'\s*(?:第\s*(\d+)\s*(?:页)?\s*(?:[-－—–~～至到]\s*第?\s*(\d+))?\s*页)?')
+_CN_DIGITS = {c: i for i, c in enumerate('零一二三四五六七八九')}
+_CN_DIGITS['〇'] = 0
+
+
+def chinese_number(text):
+    """章号转整数：'九' -> 9，'十五' -> 15，'二十' -> 20，阿拉伯数字原样；认不出返回 None"""
+    if not text:
+        return None
+    if text.isdigit():
+        return int(text)
+    total, digit = 0, None
+    for c in text:
+        if c in _CN_DIGITS:
+            digit = _CN_DIGITS[c]
+        elif c == '十':
+            total += (1 if digit is None else digit) * 10
+            digit = None
+        else:
+            return None
+    return total + (digit or 0)
+
+
+def chapter_label(chapter):
+    """chapter_label(0) -> '导论'，chapter_label(9) -> '第九章'"""
+    if chapter == 0:
+        return '导论'
+    if chapter >= 100:
+        return f"第{chapter}章"
+    tens, ones = divmod(chapter, 10)
+    text = ('' if tens == 1 else '零一二三四五六七八九'[tens]) + '十' if tens else ''
+    return f"第{text}{'零一二三四五六七八九'[ones] if ones else ''}章"
+
+
+def parse_source(explanation):
+    """从答案解析中抽出出处，返回 {'chapter', 'pages', 'edition', 'documents'}（认不出的字段为 None / 空）"""
+    source = {'chapter': None, 'pages': None, 'edition': None, 'documents': []}
+    m = TEXTBOOK_PAT.search(explanation)
+    if m and (m.group(2) or m.group(3) or m.group(4)):
+        edition, intro, chapter, first, last = m.groups()
+        source['edition'] = edition
+        if intro:
+            source['chapter'] = 0
+        elif chapter:
+            source['chapter'] = chinese_number(chapter)
+        if first:
+            first = int(first)
+            last = int(last) if last else first
+            source['pages'] = (first, max(first, last))
+    textbook_at = m.start() if m and m.group(0).strip() else -1
+    for book in BOOK_PAT.finditer(explanation):
+        # 紧挨着“教材”前面的书名是教材本身，不算引用文件
+        if textbook_at >= 0 and 0 <= textbook_at - book.end() <= 8:
+            continue
+        source['documents'].append(book.group(1))
+    return source
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def source_columns(explanation):
+    """
+    出处索引用的定长字段 (章号, 起始页, 结束页, 引用文件元组)：认不出的章为 -1，没有页码为 0。
+    按解析文本缓存，编辑题库后没改动的题不必重新抽取。
+    """
+    source = parse_source(explanation)
+    first, last = source['pages'] or (0, 0)
+    return -1 if source['chapter'] is None else source['chapter'], first, last, tuple(source['documents'])
+
+
+# ===========================
+# Word 题库 (.docx)
+# ===========================
+# .docx 是 zip 包，正文在 word/document.xml。用增量 XML 解析边解压边读，
+# 每读完一个段落 (w:p) 就产出一行文本并丢掉该节点，不构建整份文档对象。
+
+DOCX_BODY = 'word/document.xml'
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_P = _W + 'p'
+_W_T = _W + 't'
+_W_BREAKS = {_W + 'tab': '\t', _W + 'br': '\n', _W + 'cr': '\n'}
+
+
+def is_docx(filename):
+    return str(filename).lower().endswith('.docx')
+
+
+def iter_docx_paragraphs(source, chunk_size=1 << 16):
+    """逐段产出 .docx 正文的纯文本；source 为文件名或二进制文件对象"""
+    try:
+        with zipfile.ZipFile(source) as z, z.open(DOCX_BODY) as xml:
+            parser = ElementTree.XMLPullParser(events=('start', 'end'))
+            stack = []
+            for block in iter(lambda: xml.read(chunk_size), b''):
+                parser.feed(block)
+                for event, el in parser.read_events():
+                    if event == 'start':
+                        stack.append(el)
+                        continue
+                    stack.pop()
+                    if el.tag != _W_P:
+                        continue
+                    yield ''.join(_paragraph_text(el))
+                    # 段落用完即从父节点摘掉，内存里只留正在读的那一段
+                    if stack:
+                        stack[-1].remove(el)
+            parser.close()
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise ValueError(f"不是有效的 .docx 题库：{e}") from e
+
+
+def _paragraph_text(p):
+    for el in p.iter():
+        if el.tag == _W_T:
+            if el.text:
+                yield el.text
+        elif el.tag in _W_BREAKS:
+            yield _W_BREAKS[el.tag]
+
+
+def _join_paragraphs(paragraphs, chunk_size):
+    """把段落攒成约 chunk_size 字符的文本块，交给分块解析"""
+    batch = []
+    size = 0
+    for line in paragraphs:
+        batch.append(line)
+        size += len(line) + 1
+        if size >= chunk_size:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+            size = 0
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+
+@contextmanager
+def gc_paused():
+    """
+    解析期间暂停分代 GC：解析只创建大量互不成环的小字典，
+    GC 反复遍历这些新对象纯属浪费（大题库下约占一半耗时）。
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def split_by_type(questions):
+    """把题目按题型分到 (单选, 多选, 判断) 三个列表"""
+    single_choice = []
+    multi_choice = []
+    judge_choice = []
+    buckets = {'single': single_choice.append, 'multi': multi_choice.append, 'judge': judge_choice.append}
+    for q in questions:
+        buckets[q['type']](q)
+    return single_choice, multi_choice, judge_choice
+
+
+def parse_text(text):
+    """解析整段题库文本，返回 (单选, 多选, 判断) 三个列表"""
+    with gc_paused():
+        return split_by_type(iter_text_questions(text))
+
+
+SECTION_TITLES = {'single': '一、单项选择题', 'multi': '二、多项选择题', 'judge': '三、判断题'}
+
+
+def format_questions(questions, answers=True):
+    """
+    把题目写回标准题库文本（按题型分节，题号重排，判断题答案写回 对/错），可被 parse_text 原样解析。
+    answers 为假时不写答案和解析（用于试卷）。
+    """
+    lines = []
+    for q_type, bucket in zip(('single', 'multi', 'judge'), split_by_type(questions)):
+        if not bucket:
+            continue
+        lines.append(SECTION_TITLES[q_type])
+        for n, q in enumerate(bucket, 1):
+            lines.append(f"{n}.{q['content']}")
+            if q_type == 'judge':
+                answer = {'A': '对', 'B': '错'}.get(q['answer'], q['answer'])
+            else:
+                lines.extend(f"{k}.{v}" for k, v in sorted(q['options'].items()))
+                answer = q['answer']
+            if not answers:
+                continue
+            lines.append(f"答案：{answer}")
+            if q['explanation']:
+                lines.append(f"答案解析：{q['explanation']}")
+    return '\n'.join(lines) + '\n'
+
+
+def decode_bank(data):
+    """题库字节解码：优先 UTF-8（兼容 BOM），失败回退 GBK (Windows 记事本)"""
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('gbk')
+
+
+def read_bank_text(filename):
+    """只读一次文件，在内存中完成编码探测；.docx 取出正文纯文本"""
+    if is_docx(filename):
+        return '\n'.join(iter_docx_paragraphs(filename))
+    with open(filename, 'rb') as f:
+        return decode_bank(f.read())
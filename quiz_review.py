@@ -0,0 +1,326 @@
+import atexit
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from array import array
+
+# ===========================
+# 间隔重复复习（SM-2）
+# ===========================
+# 每个用户、每道题一行复习状态，存在本地 SQLite 里。题目用 quiz_cache.question_key
+# 标识（题型 + 题干哈希），题库改版、换序后记录仍然有效。
+# (user, due) 上建了索引，它就是按到期时间排好的优先队列：取最早到期的 N 道题
+# 只需在索引上走 O(log n + N)，不必每次把全部记录取出来排序。
+
+REVIEW_DB = os.environ.get("QUIZ_REVIEW_DB", "review.db")
+DAY = 86400.0
+
+# 答对 / 答错对应 SM-2 的回答质量 (0-5)
+GRADE_CORRECT = 4
+GRADE_WRONG = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS review (
+    user     TEXT NOT NULL,
+    qkey     TEXT NOT NULL,
+    reps     INTEGER NOT NULL,  -- 连续答对次数
+    ease     REAL NOT NULL,     -- 难度系数 (EF)
+    interval REAL NOT NULL,     -- 当前间隔（天）
+    due      REAL NOT NULL,     -- 下次复习时间 (unix 秒)
+    lapses   INTEGER NOT NULL,  -- 累计答错次数
+    last     REAL NOT NULL,     -- 最近一次作答时间
+    PRIMARY KEY (user, qkey)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS review_due ON review (user, due);
+
+CREATE TABLE IF NOT EXISTS answers (
+    ts       REAL NOT NULL,     -- 提交时间 (unix 秒)
+    user     TEXT NOT NULL,     -- 用户名，未填写时为空串
+    session  TEXT NOT NULL,     -- 会话 / 进程标识，匿名作答也能按会话归组
+    qkey     TEXT NOT NULL,
+    q_id     INTEGER,           -- 在当时题库中的题号
+    bank     TEXT NOT NULL,     -- 题库版本号
+    chosen   TEXT NOT NULL,     -- 所选选项，如 "AC"
+    correct  INTEGER NOT NULL,
+    latency  REAL               -- 从看到题目到提交的秒数
+);
+CREATE INDEX IF NOT EXISTS answers_user_ts ON answers (user, ts);
+
+-- 每题的累计统计，随每次作答增量更新；difficulty / discrimination 由批处理 (quiz_stats) 回填
+CREATE TABLE IF NOT EXISTS question_stats (
+    qkey     TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    correct  INTEGER NOT NULL,
+    pick_a   INTEGER NOT NULL,  -- 选了 A 的次数，以下同
+    pick_b   INTEGER NOT NULL,
+    pick_c   INTEGER NOT NULL,
+    pick_d   INTEGER NOT NULL,
+    pick_e   INTEGER NOT NULL,
+    difficulty     REAL,
+    discrimination REAL
+) WITHOUT ROWID;
+"""
+
+STATS_FIELDS = ('attempts', 'correct', 'pick_a', 'pick_b', 'pick_c', 'pick_d', 'pick_e',
+                'difficulty', 'discrimination')
+
+_STATS_UPSERT = """
+INSERT INTO question_stats VALUES (?, 1, ?, ?, ?, ?, ?, ?, NULL, NULL)
+ON CONFLICT (qkey) DO UPDATE SET
+    attempts = attempts + 1, correct = correct + excluded.correct,
+    pick_a = pick_a + excluded.pick_a, pick_b = pick_b + excluded.pick_b, pick_c = pick_c + excluded.pick_c,
+    pick_d = pick_d + excluded.pick_d, pick_e = pick_e + excluded.pick_e
+"""
+
+
+def _stats_row(key, chosen, correct):
+    return (key, correct, *(k in chosen for k in "ABCDE"))
+
+
+def sm2(reps, ease, interval, grade):
+    """
+    SM-2 调度：给定当前状态和本次回答质量，返回新的 (reps, ease, interval)。
+    质量低于 3 视为遗忘，从头开始；否则间隔依次为 1 天、6 天、之后乘以 EF。
+    """
+    if grade < 3:
+        reps = 0
+        interval = 1.0
+    else:
+        reps += 1
+        if reps == 1:
+            interval = 1.0
+        elif reps == 2:
+            interval = 6.0
+        else:
+            interval = round(interval * ease, 2)
+    ease = max(1.3, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    return reps, ease, interval
+
+
+class ReviewStore:
+    """
+    复习状态库。一个连接供整个进程共用（web 端各会话在不同线程），读写都在锁内完成。
+    """
+
+    def __init__(self, path=REVIEW_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL：后台线程写入时读者不被阻塞；每批一次提交，NORMAL 同步级别足够
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def record(self, user, key, correct, now=None):
+        """记一次作答并按 SM-2 更新该题的复习时间，返回新的到期时间"""
+        now = time.time() if now is None else now
+        with self._lock, self._conn:
+            return self._schedule(user, key, correct, now)
+
+    def _schedule(self, user, key, correct, now):
+        grade = GRADE_CORRECT if correct else GRADE_WRONG
+        row = self._conn.execute(
+            "SELECT reps, ease, interval, lapses FROM review WHERE user = ? AND qkey = ?",
+            (user, key)).fetchone()
+        reps, ease, interval, lapses = row if row else (0, 2.5, 0.0, 0)
+        reps, ease, interval = sm2(reps, ease, interval, grade)
+        due = now + interval * DAY
+        self._conn.execute(
+            "INSERT OR REPLACE INTO review VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (user, key, reps, ease, interval, due, lapses + (not correct), now))
+        return due
+
+    def write_answers(self, events):
+        """
+        一个事务写入一批作答事件 (ANSWER_FIELDS 顺序的元组)：追加原始日志、累加每题统计，
+        填了用户名的顺带更新复习状态。
+        """
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", events)
+            self._conn.executemany(_STATS_UPSERT, [_stats_row(e[3], e[6], e[7]) for e in events])
+            for ts, user, _, key, _, _, _, correct, _ in events:
+                if user:
+                    self._schedule(user, key, correct, ts)
+
+    def due(self, user, limit, now=None, after=None):
+        """
+        按到期先后返回至多 limit 个已到期的 (到期时间, 题目标识)。
+        after 传上一页的最后一行，沿索引接着往后读（键集分页，不用 OFFSET）。
+        """
+        now = time.time() if now is None else now
+        after = after or (float('-inf'), '')
+        with self._lock:
+            return self._conn.execute(
+                "SELECT due, qkey FROM review WHERE user = ? AND due <= ? AND (due, qkey) > (?, ?)"
+                " ORDER BY due, qkey LIMIT ?", (user, now, *after, limit)).fetchall()
+
+    def known(self, user, keys):
+        """keys 中已有复习记录（做过）的那些"""
+        keys = list(keys)
+        found = set()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(key for (key,) in self._conn.execute(
+                    f"SELECT qkey FROM review WHERE user = ? AND qkey IN ({marks})", (user, *chunk)))
+        return found
+
+    def answer_stats(self, user):
+        """该用户做过的每道题的 (题目标识, 作答次数, 答错次数, 最近作答时间)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT qkey, COUNT(*), COUNT(*) - SUM(correct), MAX(ts) FROM answers"
+                " WHERE user = ? GROUP BY qkey", (user,)).fetchall()
+
+    def question_stats(self, key):
+        """某题的累计统计 (STATS_FIELDS 为键的字典)，按主键直接查；没人做过时为 None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(STATS_FIELDS)} FROM question_stats WHERE qkey = ?", (key,)).fetchone()
+        return None if row is None else dict(zip(STATS_FIELDS, row))
+
+    def all_question_stats(self):
+        """全部题目的 (题目标识, *STATS_FIELDS)，批处理和报表用"""
+        with self._lock:
+            return self._conn.execute(f"SELECT qkey, {', '.join(STATS_FIELDS)} FROM question_stats").fetchall()
+
+    def user_item_scores(self):
+        """每个 (用户, 题目) 的作答次数和答对次数，匿名作答按会话算一个用户"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT CASE user WHEN '' THEN '#' || session ELSE user END AS who, qkey, COUNT(*), SUM(correct)"
+                " FROM answers GROUP BY who, qkey").fetchall()
+
+    def set_irt(self, rows):
+        """回填批处理算出的 (difficulty, discrimination, 题目标识)"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE question_stats SET difficulty = ?, discrimination = ? WHERE qkey = ?", rows)
+
+    def rebuild_question_stats(self):
+        """按原始作答日志重算全部累计统计（统计表是后加的，或怀疑数据不一致时用）"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM question_stats")
+            rows = self._conn.execute("SELECT qkey, chosen, correct FROM answers")
+            self._conn.executemany(_STATS_UPSERT, (_stats_row(*row) for row in rows))
+
+    def due_count(self, user, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM review WHERE user = ? AND due <= ?", (user, now)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def pick_review(store, bank, user, q_types, k, tags=None, now=None, rng=random):
+    """
+    复习模式选题：先按到期先后取已到期的题，不够 k 道再从没做过的新题里随机补足。
+    返回题目下标数组，与 bank.sample 相同。
+    """
+    index = bank.key_index()
+    picks = []
+    rows = store.due(user, max(k, 64), now)
+    while rows and len(picks) < k:
+        for _, key in rows:
+            i = index.get(key)
+            # 记录可能来自已删掉的题、别的题型或没选中的分库
+            if i is None or bank.type_of(i) not in q_types or (tags and bank.tag_of(i) not in tags):
+                continue
+            picks.append(i)
+            if len(picks) >= k:
+                break
+        else:
+            rows = store.due(user, max(k, 64), now, after=rows[-1])
+
+    # 新题：随机抽一批，去掉做过的；抽不满就再抽一批，最多几轮
+    need = k - len(picks)
+    chosen = set(picks)
+    for _ in range(4):
+        if need <= 0:
+            break
+        batch = [i for i in bank.sample(q_types, need * 2, rng=rng, tags=tags) if i not in chosen]
+        known = store.known(user, (bank.key(i) for i in batch))
+        for i in batch:
+            if need and bank.key(i) not in known:
+                picks.append(i)
+                chosen.add(i)
+                need -= 1
+    return array('I', picks)
+
+
+# ===========================
+# 作答日志（写后缓冲）
+# ===========================
+ANSWER_FIELDS = ('ts', 'user', 'session', 'qkey', 'q_id', 'bank', 'chosen', 'correct', 'latency')
+
+
+class AnswerLog:
+    """
+    作答事件先进有界内存队列，由后台线程攒批写入 SQLite（同时更新复习状态）。
+    提交答案只做一次入队，不等磁盘 I/O；队列满时丢弃该事件并计数，绝不阻塞页面。
+    """
+
+    def __init__(self, store, maxsize=10000, batch=256):
+        self.store = store
+        self.batch = batch
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name="answer-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, user, key, chosen, correct, latency=None, session='', q_id=None, bank='', ts=None):
+        """记一次作答，立即返回；返回 False 表示队列已满、事件被丢弃"""
+        event = (time.time() if ts is None else ts, user, session, key, q_id, bank,
+                 chosen, int(bool(correct)), latency)
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self):
+        """等已入队的事件全部落盘（测试、退出前用）"""
+        self._queue.join()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            events = []
+            done = item is None
+            if item is not None:
+                events.append(item)
+            # 攒一批：写上一批期间积压的事件一次取走（最多 batch 条），负载越高批越大
+            while not done and len(events) < self.batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                else:
+                    events.append(item)
+            try:
+                if events:
+                    self.store.write_answers(events)
+            except sqlite3.Error:
+                self.dropped += len(events)  # 磁盘满、库被锁等：丢掉这一批，线程继续
+            finally:
+                for _ in range(len(events) + done):
+                    self._queue.task_done()
+            if done:
+                return
@@ -0,0 +1,177 @@
+import re
+import weakref
+
+import numpy as np
+
+# ===========================
+# 题库全文搜索（汉字二元组倒排索引）
+# ===========================
+# 中文不分词：题干、选项、解析去掉空白标点后按相邻两个字切成二元组，每个二元组编成一个整数
+# (前一字码点 << 21 | 后一字码点)。建索引时用 numpy 一次排序得到按二元组分组的倒排表：
+#   terms    排好序的不同二元组
+#   offsets  terms[i] 的倒排表在 docs / tfs 中的区间 offsets[i]:offsets[i+1]
+#   docs     包含该二元组的题号，tfs 为出现次数
+# 查询时只取查询里各二元组的倒排表，用 bincount 累加得分，不扫描题目文本。
+# 编译缓存 (.qbank) 里带着建好的索引段（quiz_cache.build_cache 写入），加载时直接映射，不必重建；
+# 没有索引段的题库（侧边栏编辑出的、内存中编译的）第一次搜索时才建。
+# 索引按题库对象缓存（见 index_for），题库换版本后随旧对象一起释放。
+
+_NOISE = re.compile(r'[\W_]+')
+_SHIFT = np.uint64(21)     # Unicode 码点不超过 21 位
+MIN_COVERAGE = 0.5         # 命中不到一半查询二元组的题不算结果
+ARRAYS = {'terms': np.uint64, 'offsets': np.uint32, 'docs': np.uint32, 'tfs': np.uint32, 'lengths': np.uint32}
+_indexes = weakref.WeakKeyDictionary()
+
+
+def normalize(text):
+    """搜索用的规范文本：去掉空白和标点，英文字母转小写"""
+    return _NOISE.sub('', text).lower()
+
+
+def question_text(q):
+    """一道题参与搜索的全部文字：题干 + 选项 + 解析"""
+    return normalize(q['content'] + ''.join(q['options'].values()) + q['explanation'])
+
+
+def _bigrams(text):
+    """文本的二元组整数数组；末尾补一个 '\\0'，单字查询和最后一个字也能命中"""
+    codes = np.frombuffer((text + '\0').encode('utf-32-le'), np.uint32).astype(np.uint64)
+    return (codes[:-1] << _SHIFT) | codes[1:]
+
+
+class SearchIndex:
+    """题库的二元组倒排索引，题号与题库下标一致"""
+
+    def __init__(self, texts):
+        texts = [t + '\0' for t in texts]
+        n = len(texts)
+        self.count = n
+        lengths = np.fromiter((len(t) for t in texts), np.int64, n)
+        codes = np.frombuffer(''.join(texts).encode('utf-32-le'), np.uint32).astype(np.uint64)
+        grams = (codes[:-1] << _SHIFT) | codes[1:]
+        owner = np.repeat(np.arange(n, dtype=np.uint64), lengths)[:-1]
+        # 每题末尾的 '\0' 与下一题首字组成的二元组跨题，去掉
+        keep = np.ones(len(grams), bool)
+        keep[np.cumsum(lengths)[:-1] - 1] = False
+        # (二元组, 题号) 编成一个整数一次排序去重，出现次数就是词频
+        pairs, tfs = np.unique(grams[keep] * np.uint64(max(n, 1)) + owner[keep], return_counts=True)
+        terms = pairs // np.uint64(max(n, 1))
+        self.docs = (pairs % np.uint64(max(n, 1))).astype(np.int64)
+        self.tfs = tfs.astype(np.float64)
+        self.terms, starts = np.unique(terms, return_index=True)
+        self.offsets = np.append(starts, len(pairs))
+        self.lengths = lengths
+        self._weigh()
+
+    def _weigh(self):
+        # 逆文档频率：越少见的二元组越能区分题目
+        df = np.diff(self.offsets)
+        self.idf = np.log((self.count + 1) / (df + 0.5))
+
+    def arrays(self):
+        """写进编译缓存的各数组（定宽小端），idf 加载时再算"""
+        return {name: np.ascontiguousarray(getattr(self, name), np.dtype(dtype).newbyteorder('<'))
+                for name, dtype in ARRAYS.items()}
+
+    @classmethod
+    def from_arrays(cls, count, arrays):
+        """由 arrays() 的结果（可以是 mmap 上的只读视图）还原索引，不复制数据"""
+        index = cls.__new__(cls)
+        index.count = count
+        for name, values in arrays.items():
+            setattr(index, name, values)
+        index._weigh()
+        return index
+
+    def _postings(self, lo, hi):
+        """terms 中 [lo, hi) 这一段二元组的倒排表，多个二元组时按题号合并词频"""
+        a, b = self.offsets[lo], self.offsets[hi]
+        return self.docs[a:b], self.tfs[a:b], np.repeat(self.idf[lo:hi], np.diff(self.offsets[lo:hi + 1]))
+
+    def search(self, query, limit=20, verify=None):
+        """
+        返回 [(题号, 得分)]，按得分从高到低。
+        得分 = 命中的查询二元组个数 + 归一化到 [0, 1) 的 TF-IDF（只在命中个数相同的题之间起作用）；
+        verify(题号) 返回题目规范文本时，完整包含查询串的题再加 1 分，保证原文出现的题排在最前。
+        """
+        query = normalize(query)
+        if not query or not self.count:
+            return []
+        if len(query) == 1:
+            # 单字：所有以这个字开头的二元组是 terms 中连续的一段
+            code = np.uint64(ord(query))
+            lo, hi = np.searchsorted(self.terms, [code << _SHIFT, (code + np.uint64(1)) << _SHIFT])
+            wanted = [(lo, hi)] if hi > lo else []
+        else:
+            grams = np.unique(_bigrams(query)[:-1])
+            pos = np.searchsorted(self.terms, grams)
+            pos = pos[(pos < len(self.terms)) & (self.terms[np.minimum(pos, len(self.terms) - 1)] == grams)]
+            wanted = [(p, p + 1) for p in pos.tolist()]
+            total = len(grams)
+        if not wanted:
+            return []
+        parts = [self._postings(lo, hi) for lo, hi in wanted]
+        docs = np.concatenate([p[0] for p in parts])
+        tfs = np.concatenate([p[1] for p in parts])
+        idf = np.concatenate([p[2] for p in parts])
+        if len(query) == 1:
+            matched = (np.bincount(docs, minlength=self.count) > 0).astype(np.float64)
+            total = 1
+        else:
+            matched = np.bincount(docs, minlength=self.count).astype(np.float64)
+        tfidf = np.bincount(docs, weights=idf * (1 + np.log(tfs)), minlength=self.count)
+        # 长题里碰巧出现的词不如短题里的重要
+        tfidf /= np.sqrt(self.lengths / self.lengths.mean())
+        score = matched + tfidf / (tfidf.max() * 1.01 + 1e-9)
+        found = np.flatnonzero(matched >= max(1, MIN_COVERAGE * total))
+        if len(found) > limit * 4:
+            # 只对得分最高的一批排序和核对原文
+            found = found[np.argpartition(-score[found], limit * 4 - 1)[:limit * 4]]
+        found = found[np.argsort(-score[found], kind='stable')]
+        if verify is not None and len(query) > 1:
+            exact = np.fromiter((matched[i] == total and query in verify(i) for i in found.tolist()), bool, len(found))
+            score[found[exact]] += 1
+            found = found[np.argsort(-score[found], kind='stable')]
+        return [(int(i), float(score[i])) for i in found[:limit]]
+
+
+class MultiIndex:
+    """多个分库各自的索引，查询时分别查再按得分合并；题号为全局题号"""
+
+    def __init__(self, parts):
+        self.parts = parts      # [(起始全局题号, SearchIndex)]
+
+    def search(self, query, limit=20, verify=None):
+        results = []
+        for start, index in self.parts:
+            check = None if verify is None else (lambda i, start=start: verify(start + i))
+            results.extend((start + i, score) for i, score in index.search(query, limit, check))
+        results.sort(key=lambda item: -item[1])
+        return results[:limit]
+
+
+def _load_or_build(bank):
+    """单个题库的索引：编译缓存里有索引段就直接映射，否则现建（10 万题约数秒）"""
+    views = {name: bank.section('search.' + name) for name in ARRAYS}
+    if all(view is not None for view in views.values()):
+        return SearchIndex.from_arrays(len(bank), {name: np.frombuffer(view, ARRAYS[name])
+                                                   for name, view in views.items()})
+    return SearchIndex(question_text(bank.question(i)) for i in range(len(bank)))
+
+
+def index_for(bank):
+    """题库的搜索索引，每个题库对象只取一次；多题库（MultiBank）按分库分别取"""
+    index = _indexes.get(bank)
+    if index is None:
+        if hasattr(bank, 'parts'):
+            parts = [(start, _load_or_build(part)) for start, part in bank.parts()]
+            index = parts[0][1] if len(parts) == 1 else MultiIndex(parts)
+        else:
+            index = _load_or_build(bank)
+        _indexes[bank] = index
+    return index
+
+
+def search(bank, query, limit=20):
+    """在题库中搜索，返回 [(题号, 得分)]；完整包含查询串的题排在最前"""
+    return index_for(bank).search(query, limit, verify=lambda i: question_text(bank.question(i)))
@@ -0,0 +1,231 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+
+# ===========================
+# 会话内存预算、空闲回收与断点续答
+# ===========================
+# Streamlit 的 session_state 在标签页开着时一直留在进程内存里。占内存的只有编辑过题库的会话：
+#   custom_parser  增量解析器（可由文本重建）
+#   custom_bank    自己的题库（可由文本重建）
+#   custom_text    题库文本（写进检查点后可以放下）
+# 其余答题进度（题号数组、当前题号、得分……）只有几百字节。SessionRegistry 在每次页面运行时登记会话：
+#   - 单个会话超过预算时先放下增量解析器；编辑出的题库本身超预算时由调用方拒绝这次编辑
+#   - 空闲超过 IDLE_TTL 的会话写检查点（gzip JSON，文本单独一份），放下全部重状态，并从登记表里移除
+#   - 每答完一题写一次进度检查点；页面地址带 ?s=<会话号>，关掉标签页再打开也能从同一题、同样得分继续
+# 占用按题库文本的大小折算（O(1)），登记和编辑都不遍历题目对象。
+
+SESSION_BUDGET = int(os.environ.get("QUIZ_SESSION_BUDGET_MB", "32")) << 20
+IDLE_TTL = 20 * 60              # 秒：没有任何操作超过这么久就回收重状态
+CHECKPOINT_TTL = 7 * 86400      # 秒：检查点保留时间
+SWEEP_INTERVAL = 60.0           # 秒：两次空闲扫描的最短间隔
+CHECKPOINT_DIR = os.environ.get("QUIZ_SESSION_DIR", ".sessions")
+HEAVY_KEYS = ('custom_parser', 'custom_bank', 'custom_text')
+PROGRESS_KEYS = ('quiz_state', 'current_idx', 'score', 'bank_version')
+_SESSION_ID = re.compile(r'^[0-9a-f]{12}$')
+_WIDGET_KEY = re.compile(r'^q_(\d+)(?:_[A-Z])?$')
+# 重状态相对题库文本（sys.getsizeof）的倍数，在 500~5000 题的合成题库上量得，题量不同时基本不变：
+#   题库    题目字典，约 5.5 倍
+#   解析器  自己那份文本和片段表，约 1.6 倍（题目字典与题库共用，不重复计）
+BANK_FACTOR = 5.5
+PARSER_FACTOR = 1.6
+
+
+def estimate_sizes(state):
+    """各重状态的估算字节数；只看文本长度，不遍历对象（编辑一次题库不该付出整份题库的代价）"""
+    text = state['custom_text'] if 'custom_text' in state else None
+    bank = state['custom_bank'] if 'custom_bank' in state else None
+    parser = state['custom_parser'] if 'custom_parser' in state else None
+    text_size = 0 if text is None else sys.getsizeof(text)
+    return {'custom_parser': 0 if parser is None else int(sys.getsizeof(parser.text) * PARSER_FACTOR),
+            'custom_bank': 0 if bank is None else int(text_size * BANK_FACTOR),
+            'custom_text': text_size}
+
+
+def checkpoint_path(session_id, directory=CHECKPOINT_DIR, kind='json'):
+    """进度检查点 <会话号>.json.gz，题库文本 <会话号>.txt.gz"""
+    return os.path.join(directory, f"{session_id}.{kind}.gz")
+
+
+def _write_gzip(path, payload):
+    """先写临时文件再改名，进程中途退出也不会留下半个检查点"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class _Entry:
+    __slots__ = ('state', 'last_seen', 'sizes')
+
+    def __init__(self, state):
+        self.state = state
+        self.last_seen = time.monotonic()
+        self.sizes = None           # {键: 估算字节数}，最近一次登记时的
+
+
+class SessionRegistry:
+    """
+    进程级会话登记表。state 是会话状态的映射对象（Streamlit 下为 SafeSessionState，
+    允许在别的会话的线程里读写）；键名与 quiz_web 的 session_state 一致。
+    """
+
+    def __init__(self, budget=SESSION_BUDGET, idle_ttl=IDLE_TTL, directory=CHECKPOINT_DIR):
+        self.budget = budget
+        self.idle_ttl = idle_ttl
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._swept = time.monotonic()
+        self._texts = {}            # 会话号 -> (文本, 哈希, 已写入磁盘的哈希)
+        self.evicted = 0
+
+    def touch(self, session_id, state):
+        """
+        页面每次运行时调用：刷新活跃时间，清掉已翻过去的题的控件状态，超预算时先放下增量解析器，
+        顺便（最多每 SWEEP_INTERVAL 秒一次）回收空闲会话。返回本会话重状态估算的字节数，
+        仍超过 budget 说明编辑出的题库本身就太大。
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry.state is not state:
+                entry = self._sessions[session_id] = _Entry(state)
+            entry.last_seen = time.monotonic()
+        current = state['current_idx'] if 'current_idx' in state else 0
+        for key in list(state.filtered_state if hasattr(state, 'filtered_state') else state):
+            m = _WIDGET_KEY.match(str(key))
+            if m and int(m.group(1)) < current:
+                del state[key]
+        sizes = entry.sizes = estimate_sizes(state)
+        if sum(sizes.values()) > self.budget and sizes['custom_parser']:
+            # 增量解析器只在编辑时用，下次编辑再从共享题库拷一份
+            state['custom_parser'] = None
+            sizes = entry.sizes = estimate_sizes(state)
+        if time.monotonic() - self._swept >= SWEEP_INTERVAL:
+            self.sweep()
+        return sum(sizes.values())
+
+    def sweep(self, now=None):
+        """回收空闲会话：写检查点后放下重状态并移出登记表；顺带删除过期的检查点文件"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._swept = now
+            idle = [(sid, e) for sid, e in self._sessions.items() if now - e.last_seen >= self.idle_ttl]
+            for sid, _ in idle:
+                del self._sessions[sid]
+        for sid, entry in idle:
+            state = entry.state
+            for key in HEAVY_KEYS[:-1]:
+                if key in state:
+                    state[key] = None
+            # 文本只有写进检查点后才能放下
+            if 'custom_text' in state and state['custom_text'] is not None and self.checkpoint(sid, state):
+                state['custom_text'] = None
+                state['spilled'] = True
+            self._texts.pop(sid, None)
+            self.evicted += 1
+        self._expire_checkpoints()
+        return len(idle)
+
+    def _expire_checkpoints(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        cutoff = time.time() - CHECKPOINT_TTL
+        for e in entries:
+            try:
+                if e.name.endswith('.gz') and e.stat().st_mtime < cutoff:
+                    os.remove(e.path)
+            except OSError:
+                pass
+
+    def _text_sha(self, session_id, text):
+        """题库文本的哈希，同一个字符串对象只算一次；返回 (哈希, 已写入磁盘的哈希)"""
+        memo = self._texts.get(session_id)
+        if memo is None or memo[0] is not text:
+            sha = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+            memo = self._texts[session_id] = (text, sha, memo[2] if memo else None)
+        return memo[1], memo[2]
+
+    def checkpoint(self, session_id, state):
+        """
+        把答题进度写到检查点（每次几百字节）；编辑过的题库文本单独存一份，内容变了才重写。
+        写不了时返回 False。
+        """
+        payload = {key: state[key] for key in PROGRESS_KEYS if key in state}
+        if 'quiz_ids' in state:
+            payload['quiz_ids'] = list(state['quiz_ids'])
+        text = state['custom_text'] if 'custom_text' in state else None
+        try:
+            if text is not None:
+                sha, written = self._text_sha(session_id, text)
+                if written != sha:
+                    _write_gzip(checkpoint_path(session_id, self.directory, 'txt'), text)
+                    self._texts[session_id] = (text, sha, sha)
+                payload['text_sha'] = sha
+            elif 'spilled' in state and state['spilled']:
+                # 文本早已放下，沿用磁盘上的那份
+                old = self.load(session_id)
+                if old is None or not old.get('text_sha'):
+                    return False
+                payload['text_sha'] = old['text_sha']
+            _write_gzip(checkpoint_path(session_id, self.directory), payload)
+        except OSError:
+            return False
+        return True
+
+    def load(self, session_id):
+        """读进度检查点，没有或已损坏时返回 None"""
+        if not _SESSION_ID.match(session_id or ''):
+            return None
+        try:
+            with gzip.open(checkpoint_path(session_id, self.directory), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def restore(self, session_id, state):
+        """
+        从检查点恢复答题进度到新会话：题号、当前题号、得分；题库文本留在磁盘，用到时再读。
+        当前这道题回到未提交状态，重新作答。没有检查点时返回 False。
+        """
+        data = self.load(session_id)
+        if data is None:
+            return False
+        for key in PROGRESS_KEYS:
+            if key in data:
+                state[key] = data[key]
+        if 'quiz_ids' in data:
+            state['quiz_ids'] = array('I', data['quiz_ids'])
+        elif state['quiz_state'] == 'playing':
+            state['quiz_state'] = 'setup'
+        state['user_submitted'] = False
+        state['spilled'] = bool(data.get('text_sha'))
+        state['session_id'] = session_id
+        return True
+
+    def load_text(self, session_id):
+        """检查点里的题库文本（被放下的 custom_text），没有时返回 None"""
+        if not _SESSION_ID.match(session_id or ''):
+            return None
+        try:
+            with gzip.open(checkpoint_path(session_id, self.directory, 'txt'), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError, EOFError):
+            return None
+
+    def stats(self):
+        """{'sessions': 登记的会话数, 'bytes': 估算的重状态总字节数, 'evicted': 累计回收数}"""
+        with self._lock:
+            entries = list(self._sessions.values())
+        return {'sessions': len(entries),
+                'bytes': sum(sum(e.sizes.values()) for e in entries if e.sizes is not None),
+                'evicted': self.evicted}
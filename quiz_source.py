@@ -0,0 +1,155 @@
+import random
+import weakref
+from array import array
+
+import numpy as np
+
+import quiz_parser
+import quiz_weighted
+
+# ===========================
+# 章节 / 页码索引（按出处出题）
+# ===========================
+# 每道题的出处由 quiz_parser.parse_source 从答案解析里抽出，整理成与题号对齐的数组：
+#   chapter          章号（0 为导论），认不出为 -1
+#   first / last     页码区间，没有页码为 0
+# 另建 章号 -> 题号数组、引用文件 -> 题号数组 的字典。按章出题是字典查找，
+# 按页码出题是两次数组比较，都不再扫描解析文本。
+# 编译缓存 (.qbank) 里带着这几列（quiz_cache.build_cache 写入），加载时直接映射；侧边栏编辑出的题库
+# 现抽，每道解析的抽取结果按文本缓存（quiz_parser.source_columns），改一道题只多抽这一道。
+# 索引按题库对象缓存（见 index_for）。
+
+_indexes = weakref.WeakKeyDictionary()
+
+
+class SourceIndex:
+    """题库的出处索引，题号与题库下标一致"""
+
+    def __init__(self, chapter, first, last, documents):
+        self.chapter = chapter
+        self.first = first
+        self.last = last
+        self.documents = documents      # 引用文件 -> 题号数组
+        order = np.argsort(self.chapter, kind='stable')
+        values, starts = np.unique(self.chapter[order], return_index=True)
+        groups = np.split(order, starts[1:])
+        self.chapters = {int(c): ids for c, ids in zip(values, groups) if c >= 0}
+
+    @classmethod
+    def from_explanations(cls, explanations):
+        """逐题从答案解析里抽出处"""
+        chapters, firsts, lasts = array('h'), array('i'), array('i')
+        documents = {}
+        for i, explanation in enumerate(explanations):
+            chapter, first, last, docs = quiz_parser.source_columns(explanation)
+            chapters.append(chapter)
+            firsts.append(first)
+            lasts.append(last)
+            for doc in docs:
+                documents.setdefault(doc, []).append(i)
+        return cls(np.frombuffer(chapters, np.int16), np.frombuffer(firsts, np.int32),
+                   np.frombuffer(lasts, np.int32), {doc: np.array(ids) for doc, ids in documents.items()})
+
+    @classmethod
+    def concat(cls, parts):
+        """[(起始题号, SourceIndex)] 拼成一个，题号换成全局题号"""
+        documents = {}
+        for start, index in parts:
+            for doc, ids in index.documents.items():
+                documents.setdefault(doc, []).append(ids.astype(np.int64) + start)
+        return cls(np.concatenate([index.chapter for _, index in parts]),
+                   np.concatenate([index.first for _, index in parts]),
+                   np.concatenate([index.last for _, index in parts]),
+                   {doc: np.concatenate(ids) for doc, ids in documents.items()})
+
+    def __len__(self):
+        return len(self.chapter)
+
+    def chapter_counts(self):
+        """[(章号, 题数)]，按章号排序"""
+        return sorted((c, len(ids)) for c, ids in self.chapters.items())
+
+    def page_range(self):
+        """全部题目的页码范围 (最小页, 最大页)，没有页码时为 None"""
+        has_pages = self.first > 0
+        if not has_pages.any():
+            return None
+        return int(self.first[has_pages].min()), int(self.last[has_pages].max())
+
+    def unresolved(self):
+        """解析里认不出教材章节的题号"""
+        return np.flatnonzero(self.chapter < 0)
+
+    def mask(self, chapters=None, pages=None):
+        """
+        限定章节（章号集合）和 / 或页码区间 (起始页, 结束页) 后的题目掩码；
+        题目页码与区间有重叠即算。两者都不给时为全部题目。
+        """
+        mask = np.ones(len(self), bool)
+        if chapters is not None:
+            mask[:] = False
+            for c in chapters:
+                ids = self.chapters.get(c)
+                if ids is not None:
+                    mask[ids] = True
+        if pages is not None:
+            lo, hi = pages
+            mask &= (self.first > 0) & (self.first <= hi) & (self.last >= lo)
+        return mask
+
+
+def _load_or_build(bank):
+    """单个题库的出处索引：编译缓存里有出处列就直接映射，否则逐题抽"""
+    views = [bank.section('source.' + name) for name in ('chapter', 'first', 'last', 'doc_offsets', 'doc_ids')]
+    if any(view is None for view in views):
+        return SourceIndex.from_explanations(bank.question(i)['explanation'] for i in range(len(bank)))
+    chapter, first, last, offsets, ids = views
+    offsets, ids = np.frombuffer(offsets, np.uint32), np.frombuffer(ids, np.uint32)
+    documents = {doc: ids[offsets[k]:offsets[k + 1]] for k, doc in enumerate(bank.header.get('documents', []))}
+    return SourceIndex(np.frombuffer(chapter, np.int16), np.frombuffer(first, np.int32),
+                       np.frombuffer(last, np.int32), documents)
+
+
+def index_for(bank):
+    """题库的出处索引，每个题库对象只取一次；多题库（MultiBank）按分库取出后拼接"""
+    index = _indexes.get(bank)
+    if index is None:
+        if hasattr(bank, 'parts'):
+            parts = [(start, _load_or_build(part)) for start, part in bank.parts()]
+            index = parts[0][1] if len(parts) == 1 else SourceIndex.concat(parts)
+        else:
+            index = _load_or_build(bank)
+        _indexes[bank] = index
+    return index
+
+
+def sample(bank, q_types, k, chapters=None, pages=None, tags=None, rng=random):
+    """
+    只从指定章节 / 页码区间里不放回随机抽 k 道题（同时限定题型、分库），
+    返回题目下标数组，与 bank.sample 相同。
+    """
+    pool, _ = quiz_weighted.pool_mask(bank, q_types, tags)
+    ids = np.flatnonzero(pool & index_for(bank).mask(chapters, pages)).tolist()
+    return array('I', rng.sample(ids, min(k, len(ids))))
+
+
+def parse_chapters(text):
+    """命令行 / 输入框里的章节列表：'导论 1 第九章 十五' -> {0, 1, 9, 15}；认不出的忽略"""
+    chapters = set()
+    for part in text.replace('，', ' ').replace(',', ' ').split():
+        if part == '导论':
+            chapters.add(0)
+            continue
+        number = quiz_parser.chinese_number(part.removeprefix('第').removesuffix('章'))
+        if number is not None:
+            chapters.add(number)
+    return chapters
+
+
+def parse_pages(text):
+    """页码区间 '120-150' -> (120, 150)，单页 '120' -> (120, 120)；格式不对返回 None"""
+    parts = text.replace('～', '-').replace('~', '-').split('-')
+    if not 1 <= len(parts) <= 2 or not all(p.strip().isdigit() for p in parts):
+        return None
+    lo, hi = int(parts[0]), int(parts[-1])
+    return min(lo, hi), max(lo, hi)
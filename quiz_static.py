@@ -0,0 +1,292 @@
+import gzip
+import hashlib
+import html
+import json
+import os
+import shutil
+
+import quiz_cache
+
+# ===========================
+# 离线静态题库包（抽题、判分都在浏览器里完成）
+# ===========================
+# 把编译好的题库导出成纯静态文件，任何静态文件服务（nginx、对象存储、python -m http.server）都能托管，
+# 服务端每道题不再有任何计算：
+#   index.html           单页答题器（原生 JS，无外部依赖）
+#   sw.js                Service Worker：首次打开后缓存全部文件，断网也能刷题
+#   index.json           题型串（每题一个字符 s/m/j）、分库区间、分块信息，抽题只需要它
+#   data/<版本>/000.json.gz ...
+#                        每块 CHUNK_SIZE 道题 [题干, 选项, 答案, 解析]，gzip 压缩，抽到哪块才下载哪块
+# 数据目录按题库版本命名，题库更新后旧缓存自动失效。判分与网页端相同：作答字母排序后与答案比较。
+
+CHUNK_SIZE = 500
+TYPE_CODES = dict(zip(quiz_cache.TYPES, 'smj'))
+
+
+def _record(q):
+    return [q['content'], dict(sorted(q['options'].items())), q['answer'], q['explanation']]
+
+
+def export_bundle(bank, out_dir, title="习概刷题", chunk_size=CHUNK_SIZE):
+    """
+    把题库导出为离线静态包，返回 (题数, 块数)。
+    重复导出到同一目录时删掉旧版本的数据目录。
+    """
+    version = hashlib.sha256(str(bank.version).encode('utf-8')).hexdigest()[:12]
+    data_dir = os.path.join(out_dir, 'data')
+    os.makedirs(os.path.join(data_dir, version), exist_ok=True)
+    for name in os.listdir(data_dir):
+        if name != version:
+            shutil.rmtree(os.path.join(data_dir, name), ignore_errors=True)
+
+    n = len(bank)
+    chunks = (n + chunk_size - 1) // chunk_size
+    for c in range(chunks):
+        records = [_record(bank.question(i)) for i in range(c * chunk_size, min(n, (c + 1) * chunk_size))]
+        raw = json.dumps(records, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(os.path.join(data_dir, version, f"{c:03d}.json.gz"), 'wb') as f:
+            f.write(gzip.compress(raw, 9, mtime=0))
+
+    # 分库区间 [标签, 起始题号, 结束题号)，与 MultiBank 的全局题号一致
+    pools, start = [], 0
+    for tag, part in zip(bank.tags, bank.banks):
+        pools.append([tag, start, start + len(part)])
+        start += len(part)
+    index = {'title': title, 'version': version, 'total': n, 'chunk': chunk_size, 'chunks': chunks,
+             'data': f"data/{version}/", 'types': ''.join(TYPE_CODES[bank.type_of(i)] for i in range(n)),
+             'pools': pools}
+    with open(os.path.join(out_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    with open(os.path.join(out_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(PLAYER_HTML.replace('__TITLE__', html.escape(title)))
+    with open(os.path.join(out_dir, 'sw.js'), 'w', encoding='utf-8') as f:
+        f.write(SERVICE_WORKER.replace('__VERSION__', version))
+    return n, chunks
+
+
+# 缓存名带题库版本：版本变了 sw.js 内容随之改变，浏览器安装新版并清掉旧缓存。
+# index.html / index.json 先走网络（拿到最新版本），断网时用缓存；数据块按版本命名，直接用缓存。
+SERVICE_WORKER = """const CACHE = 'quiz-__VERSION__';
+
+self.addEventListener('install', event => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(CACHE);
+    const index = await (await fetch('index.json', {cache: 'no-store'})).json();
+    const files = ['./', 'index.html', 'index.json'];
+    for (let c = 0; c < index.chunks; c++) files.push(index.data + String(c).padStart(3, '0') + '.json.gz');
+    await cache.addAll(files);
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) if (name !== CACHE) await caches.delete(name);
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener('fetch', event => {
+  const url = new URL(event.request.url);
+  if (event.request.method !== 'GET' || url.origin !== location.origin) return;
+  if (url.pathname.includes('/data/')) {
+    event.respondWith(caches.match(event.request).then(hit => hit || fetch(event.request)));
+    return;
+  }
+  event.respondWith(fetch(event.request).then(resp => {
+    const copy = resp.clone();
+    caches.open(CACHE).then(cache => cache.put(event.request, copy));
+    return resp;
+  }).catch(() => caches.match(event.request, {ignoreSearch: true})));
+});
+"""
+
+
+PLAYER_HTML = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>__TITLE__</title>
+<style>
+  body { font-family: -apple-system, "PingFang SC", "Microsoft YaHei", sans-serif; max-width: 720px;
+         margin: 0 auto; padding: 12px; background: #f7f7f9; color: #222; }
+  .card { background: #fff; border-radius: 10px; padding: 16px; margin: 12px 0; box-shadow: 0 1px 4px #0002; }
+  .opt { display: block; padding: 10px; margin: 6px 0; border: 1px solid #ddd; border-radius: 8px; }
+  .opt.right { border-color: #2e7d32; background: #e8f5e9; }
+  .opt.wrong { border-color: #c62828; background: #ffebee; }
+  button { font-size: 16px; padding: 10px 18px; margin: 6px 6px 0 0; border: 0; border-radius: 8px;
+           background: #1f77b4; color: #fff; }
+  select, input { font-size: 16px; padding: 6px; margin: 4px 0 10px; }
+  .muted { color: #777; font-size: 14px; }
+  .hidden { display: none; }
+</style>
+</head>
+<body>
+<h2>__TITLE__</h2>
+<div id="setup" class="card">
+  <div>题型 <select id="mode">
+    <option value="smj">混合</option><option value="s">单选</option>
+    <option value="m">多选</option><option value="j">判断</option></select></div>
+  <div>题数 <input id="num" type="number" value="20" min="1" max="500"></div>
+  <div id="pools"></div>
+  <button id="start">开始刷题</button>
+  <div id="info" class="muted"></div>
+</div>
+<div id="quiz" class="card hidden">
+  <div id="progress" class="muted"></div>
+  <h3 id="content"></h3>
+  <div id="options"></div>
+  <div id="feedback"></div>
+  <button id="submit">提交</button>
+  <button id="next" class="hidden">下一题</button>
+</div>
+<div id="result" class="card hidden"></div>
+<script>
+'use strict';
+const TYPE_NAMES = {s: '单选', m: '多选', j: '判断'};
+const $ = id => document.getElementById(id);
+let index, chunks = {}, quiz;
+
+// 与网页端相同的判分规则：只保留字母，转大写，字母排序后比较
+const normalize = text => [...text.toUpperCase()].filter(c => c >= 'A' && c <= 'Z').sort().join('');
+
+async function loadChunk(c) {
+  if (!chunks[c]) chunks[c] = (async () => {
+    const resp = await fetch(index.data + String(c).padStart(3, '0') + '.json.gz');
+    if (!resp.ok) throw new Error('题库数据下载失败');
+    const buf = new Uint8Array(await resp.arrayBuffer());
+    // 服务器可能已按 Content-Encoding 解压过，看 gzip 魔数决定是否自己解压
+    let body = buf;
+    if (buf[0] === 0x1f && buf[1] === 0x8b) {
+      body = await new Response(new Blob([buf]).stream().pipeThrough(new DecompressionStream('gzip'))).arrayBuffer();
+    }
+    return JSON.parse(new TextDecoder().decode(body));
+  })();
+  return chunks[c];
+}
+
+async function getQuestion(i) {
+  const records = await loadChunk(Math.floor(i / index.chunk));
+  const [content, options, answer, explanation] = records[i % index.chunk];
+  return {type: index.types[i], content, options, answer, explanation};
+}
+
+// 从选中的题型和分库里不放回随机抽 k 道（部分 Fisher-Yates）
+function sample(types, tags, k) {
+  const pool = [];
+  for (const [tag, start, end] of index.pools) {
+    if (!tags.includes(tag)) continue;
+    for (let i = start; i < end; i++) if (types.includes(index.types[i])) pool.push(i);
+  }
+  k = Math.min(k, pool.length);
+  for (let n = 0; n < k; n++) {
+    const r = n + Math.floor(Math.random() * (pool.length - n));
+    [pool[n], pool[r]] = [pool[r], pool[n]];
+  }
+  return pool.slice(0, k);
+}
+
+async function start() {
+  const tags = [...document.querySelectorAll('#pools input:checked')].map(box => box.value);
+  const ids = sample($('mode').value, tags, Math.max(1, parseInt($('num').value) || 20));
+  if (!ids.length) { $('info').textContent = '没有符合条件的题目'; return; }
+  // 先把用到的数据块并行下载好，答题过程中不再等网络
+  await Promise.all([...new Set(ids.map(i => Math.floor(i / index.chunk)))].map(loadChunk));
+  quiz = {ids, idx: 0, score: 0, wrong: []};
+  $('setup').classList.add('hidden');
+  $('result').classList.add('hidden');
+  $('quiz').classList.remove('hidden');
+  show();
+}
+
+async function show() {
+  const q = quiz.q = await getQuestion(quiz.ids[quiz.idx]);
+  $('progress').textContent = `第 ${quiz.idx + 1} / ${quiz.ids.length} 题 · 得分 ${quiz.score} · ${TYPE_NAMES[q.type]}`;
+  $('content').textContent = q.content;
+  const box = $('options');
+  box.innerHTML = '';
+  const options = q.type === 'j' ? {A: '对', B: '错'} : q.options;
+  for (const [key, text] of Object.entries(options)) {
+    const label = document.createElement('label');
+    label.className = 'opt';
+    label.dataset.key = key;
+    const input = document.createElement('input');
+    input.type = q.type === 'm' ? 'checkbox' : 'radio';
+    input.name = 'opt';
+    input.value = key;
+    label.append(input, q.type === 'j' ? ` ${text}` : ` ${key}. ${text}`);
+    box.append(label);
+  }
+  $('feedback').innerHTML = '';
+  $('submit').classList.remove('hidden');
+  $('next').classList.add('hidden');
+}
+
+function submit() {
+  const chosen = normalize([...document.querySelectorAll('#options input:checked')].map(b => b.value).join(''));
+  if (!chosen) { $('feedback').textContent = '请先选择答案'; return; }
+  const q = quiz.q, answer = normalize(q.answer), correct = chosen === answer;
+  quiz.score += correct;
+  if (!correct) quiz.wrong.push({q, chosen});
+  for (const label of document.querySelectorAll('#options .opt')) {
+    if (answer.includes(label.dataset.key)) label.classList.add('right');
+    else if (chosen.includes(label.dataset.key)) label.classList.add('wrong');
+    label.querySelector('input').disabled = true;
+  }
+  const shown = q.type === 'j' ? (answer === 'A' ? '对' : '错') : answer;
+  $('feedback').innerHTML = `<p><b>${correct ? '✅ 回答正确' : '❌ 回答错误，正确答案：' + shown}</b></p>`;
+  if (q.explanation) {
+    const p = document.createElement('p');
+    p.className = 'muted';
+    p.textContent = q.explanation;
+    $('feedback').append(p);
+  }
+  $('submit').classList.add('hidden');
+  $('next').classList.remove('hidden');
+}
+
+function next() {
+  if (++quiz.idx < quiz.ids.length) { show(); return; }
+  $('quiz').classList.add('hidden');
+  const result = $('result');
+  result.classList.remove('hidden');
+  result.innerHTML = `<h3>得分 ${quiz.score} / ${quiz.ids.length}</h3>`;
+  for (const {q, chosen} of quiz.wrong) {
+    const p = document.createElement('p');
+    p.textContent = `${q.content}（你的答案 ${chosen}，正确答案 ${normalize(q.answer)}）`;
+    result.append(p);
+  }
+  const again = document.createElement('button');
+  again.textContent = '再来一组';
+  again.onclick = () => { result.classList.add('hidden'); $('setup').classList.remove('hidden'); };
+  result.append(again);
+}
+
+async function init() {
+  if ('serviceWorker' in navigator && location.protocol !== 'file:') {
+    navigator.serviceWorker.register('sw.js').catch(() => {});
+  }
+  index = await (await fetch('index.json')).json();
+  const pools = $('pools');
+  if (index.pools.length > 1) pools.append('分库 ');
+  for (const [tag] of index.pools) {
+    const label = document.createElement('label');
+    const box = document.createElement('input');
+    box.type = 'checkbox';
+    box.value = tag;
+    box.checked = true;
+    label.append(box, ` ${tag} `);
+    if (index.pools.length === 1) label.classList.add('hidden');
+    pools.append(label);
+  }
+  $('info').textContent = `共 ${index.total} 题，首次打开后可离线使用`;
+  $('start').onclick = () => start().catch(e => { $('info').textContent = e.message; });
+  $('submit').onclick = submit;
+  $('next').onclick = next;
+}
+init().catch(e => { $('info').textContent = '题库加载失败：' + e.message; });
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,110 @@
+import numpy as np
+
+import quiz_cache
+
+# ===========================
+# 题目难度 / 区分度分析
+# ===========================
+# 每题的作答次数、正确数、各选项被选次数随每次作答增量累加（见 ReviewStore.write_answers），
+# 页面和命令行按题目标识直接查。难度、区分度由下面的批处理一次性向量化算出再回填：
+#   能力 θ     每个用户平滑后正确率的 logit（去掉本题，避免区分度被本题自身抬高）
+#   难度 b     答题者平均能力 - 本题正确率的 logit（Rasch 模型 P = σ(θ - b) 的 PROX 近似）
+#   区分度     本题得分与答题者能力的点二列相关，越低说明会的人和不会的人在这题上拉不开
+
+MIN_ATTEMPTS = 10  # 作答次数太少的题不下结论
+OPTION_KEYS = quiz_cache.OPTION_KEYS
+
+
+def _logit(p):
+    return np.log(p / (1 - p))
+
+
+def refresh_irt(store):
+    """批处理：用全部作答日志估计每题的难度和区分度并回填统计表，返回估计了多少题"""
+    rows = store.user_item_scores()
+    if not rows:
+        return 0
+    users, keys, n, right = zip(*rows)
+    u = np.unique(users, return_inverse=True)[1]
+    key_names, q = np.unique(keys, return_inverse=True)
+    n = np.array(n, float)
+    right = np.array(right, float)
+
+    user_n = np.bincount(u, weights=n)
+    user_right = np.bincount(u, weights=right)
+    theta = _logit((user_right[u] - right + 0.5) / (user_n[u] - n + 1))
+    x = right / n
+
+    m = np.bincount(q).astype(float)  # 每题的答题人数
+    q_n = np.bincount(q, weights=n)
+    q_right = np.bincount(q, weights=right)
+    mean_theta = np.bincount(q, weights=theta) / m
+    difficulty = mean_theta - _logit((q_right + 0.5) / (q_n + 1))
+
+    sx = np.bincount(q, weights=x) / m
+    sy = mean_theta
+    cov = np.bincount(q, weights=x * theta) / m - sx * sy
+    var = (np.bincount(q, weights=x * x) / m - sx * sx) * (np.bincount(q, weights=theta * theta) / m - sy * sy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        discrimination = np.where(var > 1e-12, cov / np.sqrt(var), np.nan)
+
+    store.set_irt([(float(b), None if np.isnan(r) else float(r), key)
+                   for b, r, key in zip(difficulty, discrimination, key_names.tolist())])
+    return len(key_names)
+
+
+def item_arrays(store, bank):
+    """
+    与题号对齐的统计数组：attempts、correct (int)，picks (n×5，A-E 被选次数)，
+    difficulty、discrimination (float，没有数据为 nan)。
+    """
+    n = len(bank)
+    arrays = {
+        'attempts': np.zeros(n, np.int64),
+        'correct': np.zeros(n, np.int64),
+        'picks': np.zeros((n, len(OPTION_KEYS)), np.int64),
+        'difficulty': np.full(n, np.nan),
+        'discrimination': np.full(n, np.nan),
+    }
+    index = bank.key_index()
+    rows = [(index[key], *rest) for key, *rest in store.all_question_stats() if key in index]
+    if rows:
+        cols = np.array(rows, dtype=float)  # NULL -> nan
+        ids = cols[:, 0].astype(np.intp)
+        arrays['attempts'][ids] = cols[:, 1]
+        arrays['correct'][ids] = cols[:, 2]
+        arrays['picks'][ids] = cols[:, 3:8]
+        arrays['difficulty'][ids] = cols[:, 8]
+        arrays['discrimination'][ids] = cols[:, 9]
+    return arrays
+
+
+def suspicious_keys(bank, arrays, min_attempts=MIN_ATTEMPTS):
+    """
+    疑似答案有误的题：某个干扰项被选的次数比标准答案里的某个选项还多。
+    返回 [(题号, 标准答案, 各选项被选次数)]，干扰项超出得越多（占作答次数的比例）越靠前。
+    """
+    ids = np.flatnonzero(arrays['attempts'] >= min_attempts)
+    if not len(ids):
+        return []
+    keyed = np.zeros((len(ids), len(OPTION_KEYS)), bool)
+    answers = []
+    for row, i in enumerate(ids.tolist()):
+        answer = bank.question(i)['answer']
+        answers.append(answer)
+        keyed[row] = [k in answer for k in OPTION_KEYS]
+    picks = arrays['picks'][ids]
+    top_distractor = np.where(keyed, -1, picks).max(axis=1)
+    weakest_key = np.where(keyed, picks, np.iinfo(np.int64).max).min(axis=1)
+    flagged = np.flatnonzero(keyed.any(axis=1) & (top_distractor > weakest_key))
+    margin = (top_distractor - weakest_key)[flagged] / arrays['attempts'][ids[flagged]]
+    flagged = flagged[np.argsort(-margin, kind='stable')]
+    return [(int(ids[r]), answers[r], picks[r].tolist()) for r in flagged]
+
+
+def ranked(arrays, field, top=10, descending=True, min_attempts=MIN_ATTEMPTS):
+    """按某一统计量排序的前 top 个题号（只算作答次数够的、有数值的题）"""
+    values = arrays[field]
+    ids = np.flatnonzero((arrays['attempts'] >= min_attempts) & ~np.isnan(values))
+    order = np.argsort(-values[ids] if descending else values[ids], kind='stable')
+    return ids[order[:top]].tolist()
@@ -1,6 +1,19 @@
+import os
+import sqlite3
+import time
+import uuid
+
 import streamlit as st
-import re
-import random
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import quiz_cache
+import quiz_metrics
+import quiz_parser
+import quiz_review
+import quiz_search
+import quiz_session
+import quiz_source
+import quiz_weighted
 
 # ===========================
 # 1. 界面配置与移动端适配 CSS
@@ -73,151 +86,117 @@ st.markdown("""
 # ===========================
 # 2. 核心逻辑：超强容错解析器
 # ===========================
-@st.cache_data
+# 可用环境变量 QUIZ_BANK 指向题库目录（每门课 / 每章一个文件，启动时并行解析）
+BANK_PATH = os.environ.get("QUIZ_BANK", "tiku.txt")
+
+
+EMPTY_BANK = quiz_cache.MultiBank([quiz_cache.ParsedBank([])], ["默认题库"])
+
+
+@st.cache_resource
+def get_bank_store():
+    """整个进程共享一个只读题库，文件变化时原子替换；会话里只记版本号"""
+    return quiz_cache.BankStore(BANK_PATH)
+
+
+@st.cache_resource
+def get_review_store():
+    """复习记录库（SQLite），整个进程共用一个连接；打不开时不记录"""
+    try:
+        return quiz_review.ReviewStore()
+    except sqlite3.Error:
+        return None
+
+
+@st.cache_resource
+def get_answer_log():
+    """作答日志：提交时只入队，后台线程攒批写库，页面不等磁盘"""
+    review = get_review_store()
+    return None if review is None else quiz_review.AnswerLog(review)
+
+
+@st.cache_resource
+def get_session_registry():
+    """会话登记表：单会话内存预算、空闲会话回收和断点续答的检查点"""
+    registry = quiz_session.SessionRegistry()
+    quiz_metrics.gauge('active_sessions', lambda: registry.stats()['sessions'])
+    quiz_metrics.gauge('session_state_bytes', lambda: registry.stats()['bytes'])
+    quiz_metrics.gauge('evicted_sessions', lambda: registry.evicted)
+    return registry
+
+
+def track_session():
+    """登记本次运行（整页或片段），返回本会话重状态估算的字节数"""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return 0
+    return get_session_registry().touch(st.session_state.session_id, ctx.session_state)
+
+
+@quiz_metrics.instrument('parse', source='web')
 def load_and_parse_questions(file_content):
     """
-    针对用户提供的 tiku.txt 进行深度适配
+    针对用户提供的 tiku.txt 进行深度适配（解析引擎见 quiz_parser，与 quiz.py 共用）
+    增量解析：只重新解析改动涉及的题目，其余题目沿用上一次的结果
     """
-    # 1. 预处理：统一标点，替换全角点为半角点，方便正则
-    raw_text = file_content.replace('．', '.')
-
-    single_choice = []
-    multi_choice = []
-    judge_choice = []
-
-    lines = raw_text.split('\n')
-    current_section = None
-    current_q = None
-
-    # --- 正则表达式 ---
-    # 匹配大标题 (一、单项... 二、多项... 三、判断...)
-    section_pat = re.compile(r'^[一二三四]、\s*(.*)')
-    # 匹配题目开头: "1.题目" 或 "10. 题目"
-    q_start_pat = re.compile(r'^(\d+)\s*[.](.*)')
-    # 匹配答案行: "答案：A" 或 "答案: 对"
-    ans_pat = re.compile(r'^\s*答案\s*[：:]\s*(.*)', re.IGNORECASE)
-    # 匹配解析行
-    expl_pat = re.compile(r'^\s*答案解析\s*[：:]\s*(.*)')
-    # 匹配选项开头: "A." 或 "A "
-    opt_start_pat = re.compile(r'^\s*([A-E])\s*[.](.*)')
-
-    def save_q(q):
-        if not q: return
-        # 修正：如果是判断题，强行生成选项
-        if q['type'] == 'judge':
-            q['options'] = {'A': '对', 'B': '错'}
-            # 修正答案：将 '对' 转为 'A', '错' 转为 'B' 以便系统统一判断
-            if '对' in q['answer']:
-                q['answer'] = 'A'
-            elif '错' in q['answer']:
-                q['answer'] = 'B'
-
-        if q['type'] == 'single':
-            single_choice.append(q)
-        elif q['type'] == 'multi':
-            multi_choice.append(q)
-        elif q['type'] == 'judge':
-            judge_choice.append(q)
-
-    for line in lines:
-        line = line.strip()
-        if not line: continue
-
-        # --- 1. 识别大类 ---
-        sec_match = section_pat.match(line)
-        if sec_match:
-            save_q(current_q)
-            current_q = None
-            title = sec_match.group(1)
-            if "单项" in title:
-                current_section = 'single'
-            elif "多项" in title:
-                current_section = 'multi'
-            elif "判断" in title:
-                current_section = 'judge'
-            else:
-                current_section = 'ignore'  # 忽略简答题
-            continue
-
-        if current_section == 'ignore': continue
-
-        # --- 2. 识别题目开始 ---
-        q_match = q_start_pat.match(line)
-        if q_match:
-            save_q(current_q)
-            q_id = q_match.group(1)
-            content_raw = q_match.group(2).strip()
-
-            current_q = {
-                'type': current_section,
-                'id': q_id,
-                'content': content_raw,
-                'options': {},
-                'answer': '',
-                'explanation': ''
-            }
-
-            # 【关键修复】检测题目行是否粘连了选项 (例如: "1.题目内容A.选项")
-            # 查找 content_raw 中第一次出现 " A." 或 " A " 的位置
-            # 为了防止误判 (如单词 "A"), 我们要求 A 前面有空格，或者 A 后面有点
-            inline_opt_match = re.search(r'(\s+[A-E]\s*[.].*)', content_raw)
-            if inline_opt_match:
-                # 发现粘连，截断题目，剩余部分作为新的一行处理
-                opt_part = inline_opt_match.group(1)
-                current_q['content'] = content_raw.replace(opt_part, "")
-                line = opt_part.strip()  # 强制让后续逻辑处理这部分作为选项
-            else:
-                continue  # 题目行处理完毕，进入下一行
-
-        # --- 3. 识别内容 (选项、答案、解析) ---
-        if current_q:
-            # 3.1 答案
-            ans_match = ans_pat.match(line)
-            if ans_match:
-                # 去除可能的空格，转大写
-                ans_text = ans_match.group(1).strip().upper()
-                current_q['answer'] = ans_text
-                continue
-
-            # 3.2 解析
-            expl_match = expl_pat.match(line)
-            if expl_match:
-                current_q['explanation'] = expl_match.group(1)
-                continue
-
-            # 3.3 选项 (仅单选/多选)
-            if current_q['type'] in ['single', 'multi']:
-                # 尝试在一行中查找所有选项 (A.xxx B.xxx)
-                # 正则解释：找 A-E 开头，后面跟点，非贪婪匹配内容，直到遇到下一个 A-E+点 或 行尾
-                inline_opts = list(re.finditer(r'([A-E])\s*[.]\s*(.*?)(?=\s+[A-E]\s*[.]|$)', line))
-
-                if inline_opts:
-                    for m in inline_opts:
-                        k, v = m.group(1), m.group(2).strip()
-                        current_q['options'][k] = v
-                else:
-                    # 如果不是选项开头，也不是答案/解析，那可能是长题目的换行
-                    # 但要小心，不要把判断题的内容当成选项
-                    opt_start = opt_start_pat.match(line)
-                    if opt_start:
-                        # 是标准选项行 A. xxx
-                        current_q['options'][opt_start.group(1)] = opt_start.group(2).strip()
-                    else:
-                        # 既不是选项也不是标签，拼接到题目内容或上一个选项
-                        if not current_q['options']:
-                            current_q['content'] += line
-                        else:
-                            last_key = sorted(current_q['options'].keys())[-1]
-                            current_q['options'][last_key] += " " + line
-
-            # 3.4 判断题内容拼接
-            elif current_q['type'] == 'judge':
-                # 判断题没有选项行，所有非关键词行都属于题目
-                if not line.startswith("答案") and not line.startswith("解析"):
-                    current_q['content'] += line
-
-    save_q(current_q)
-    return single_choice, multi_choice, judge_choice
+    parser = st.session_state.custom_parser
+    if parser is None:
+        # 首次编辑：从进程共享的原题库解析结果拷一份，不必整份重解析
+        try:
+            parser = get_bank_store().source_parser().copy()
+        except (OSError, ValueError):
+            parser = quiz_parser.IncrementalParser()
+        st.session_state.custom_parser = parser
+    parser.update(file_content)
+    return quiz_cache.MultiBank([quiz_cache.ParsedBank(parser.questions())], ["自定义题库"])
+
+
+def custom_bank():
+    """
+    编辑过题库的会话自己的题库，没编辑过时为 None。
+    空闲回收只留下检查点里的文本：回来后先读回文本，再重新解析（题号顺序不变，试卷仍有效）。
+    """
+    state = st.session_state
+    if state.custom_text is None and state.spilled:
+        state.custom_text = get_session_registry().load_text(state.session_id)
+        state.spilled = False
+    if state.custom_text is not None and state.custom_bank is None:
+        state.custom_bank = load_and_parse_questions(state.custom_text)
+    return state.custom_bank
+
+
+def get_bank():
+    """编辑过题库的会话用自己的题库，其余会话共用进程级题库"""
+    bank = custom_bank()
+    if bank is not None:
+        return bank
+    try:
+        bank = get_bank_store().current()
+    except (OSError, ValueError):
+        # 题库文件缺失或读不了：按空题库显示，仍可在侧边栏粘贴题库
+        st.session_state.bank_version = None
+        return EMPTY_BANK
+    st.session_state.bank_version = bank.version
+    return bank
+
+
+def quiz_bank():
+    """当前试卷所属的题库：自己编辑的，或按版本号从进程级题库取（已淘汰时为 None）"""
+    bank = custom_bank()
+    if bank is not None:
+        return bank
+    return get_bank_store().get(st.session_state.bank_version)
+
+
+def get_bank_text():
+    """编辑框里显示的题库文本：自己编辑过的，或进程共享的那一份"""
+    custom_bank()
+    if st.session_state.custom_text is not None:
+        return st.session_state.custom_text
+    try:
+        return get_bank_store().source_text()
+    except (OSError, ValueError):
+        return ""
 
 
 # ===========================
@@ -232,47 +211,111 @@ def init_session():
         st.session_state.current_idx = 0
     if 'user_submitted' not in st.session_state:
         st.session_state.user_submitted = False
-    if 'raw_text' not in st.session_state:
-        # 默认尝试读取本地文件
-        try:
-            with open("tiku.txt", "r", encoding="utf-8") as f:
-                st.session_state.raw_text = f.read()
-        except:
-            st.session_state.raw_text = ""
-
-
-def start_quiz(mode, num):
-    s, m, j = load_and_parse_questions(st.session_state.raw_text)
-
-    pool = []
-    if mode == "单选题":
-        pool = s
-    elif mode == "多选题":
-        pool = m
-    elif mode == "判断题":
-        pool = j
-    else:
-        pool = s + m + j
-
-    if not pool:
-        st.error(f"未解析到题目。当前检测到：单选{len(s)}题，多选{len(m)}题，判断{len(j)}题。请检查题库格式。")
+    if 'session_id' not in st.session_state:
+        # 匿名作答也按会话归组写进作答日志；地址里带着旧会话号（关掉后重新打开）时从检查点续答
+        resumed = st.query_params.get("s")
+        if not (resumed and get_session_registry().restore(resumed, st.session_state)):
+            st.session_state.session_id = uuid.uuid4().hex[:12]
+        st.session_state.shown_at = (None, 0.0)
+    if 'bank_version' not in st.session_state:
+        st.session_state.bank_version = None
+    if 'custom_text' not in st.session_state:
+        # 只有编辑过题库的会话才保存自己的文本和题库
+        st.session_state.custom_text = None
+        st.session_state.custom_bank = None
+        st.session_state.custom_parser = None
+    if 'spilled' not in st.session_state:
+        st.session_state.spilled = False    # 题库文本已放到检查点里
+
+
+QUIZ_TYPES = {
+    "单选题": ('single',),
+    "多选题": ('multi',),
+    "判断题": ('judge',),
+    "混合全练": ('single', 'multi', 'judge'),
+    "复习模式": ('single', 'multi', 'judge'),
+    "错题优先": ('single', 'multi', 'judge'),
+}
+# 这些模式按用户的作答记录出题，需要先填用户名
+USER_MODES = ("复习模式", "错题优先")
+
+
+@quiz_metrics.instrument('start_quiz', source='web')
+def start_quiz(mode, num, tags=None, user="", chapters=None, pages=None):
+    bank = get_bank()
+    s, m, j = bank.counts(tags)
+    limited = chapters is not None or pages is not None
+
+    # 试卷只是一组题号 (uint32 数组)，题目本身只在题库里存一份
+    review = get_review_store()
+    if mode in USER_MODES:
+        if not user or review is None:
+            st.error(f"{mode}需要先填写用户名（用于保存作答记录）。")
+            return
+        get_answer_log().flush()  # 刚提交的作答先落盘，记录才是最新的
+    with quiz_metrics.timed('sample', mode=mode):
+        if mode == "复习模式":
+            # 先出到期最久的题，不够再补新题
+            quiz_ids = quiz_review.pick_review(review, bank, user, QUIZ_TYPES[mode], num, tags=tags)
+        elif mode == "错题优先":
+            # 按历史错误率和距上次作答的时间加权抽题
+            weights = quiz_weighted.error_weights(bank, review.answer_stats(user))
+            if limited:
+                weights *= quiz_source.index_for(bank).mask(chapters, pages)
+            quiz_ids = quiz_weighted.weighted_sample(bank, weights, QUIZ_TYPES[mode], num, tags=tags)
+        elif limited:
+            # 按教材章节 / 页码出题：出处索引随题库缓存，筛选只是数组运算
+            quiz_ids = quiz_source.sample(bank, QUIZ_TYPES[mode], num, chapters, pages, tags=tags)
+        else:
+            quiz_ids = bank.sample(QUIZ_TYPES[mode], num, tags=tags)
+    if not quiz_ids:
+        st.error(f"未解析到题目。当前检测到：单选{s}题，多选{m}题，判断{j}题。请检查题库格式。")
         return
 
-    real_num = min(num, len(pool))
-    st.session_state.quiz_list = random.sample(pool, real_num)
+    st.session_state.quiz_ids = quiz_ids
     st.session_state.current_idx = 0
     st.session_state.score = 0
     st.session_state.quiz_state = 'playing'
     st.session_state.user_submitted = False
+    st.query_params["s"] = st.session_state.session_id
+    get_session_registry().checkpoint(st.session_state.session_id, st.session_state)
     st.rerun()
 
 
-def next_question():
+# 答题按钮都用 on_click 回调改状态：回调在重跑之前执行，点击后片段自己重跑一次就显示新状态，
+# 不必再调用 st.rerun() 整页重跑
+@quiz_metrics.instrument('grade', source='web')
+def submit_answer(q_id, user_ans, answer):
+    if not user_ans:
+        st.session_state.need_answer = True  # 回调里不宜直接显示元素，交给片段提示
+        return
+    u_str = "".join(sorted(user_ans))
+    record_answer(q_id, u_str, u_str == answer)
+    quiz_metrics.count('answers', source='web', correct=u_str == answer)
+    st.session_state.user_submitted = True
+
+
+def next_question(is_correct):
+    if is_correct:
+        st.session_state.score += 1
     st.session_state.current_idx += 1
     st.session_state.user_submitted = False
-    if st.session_state.current_idx >= len(st.session_state.quiz_list):
+    if st.session_state.current_idx >= len(st.session_state.quiz_ids):
         st.session_state.quiz_state = 'finished'
-    st.rerun()
+    # 每题一个几百字节的进度检查点，关掉页面再打开从这里继续
+    get_session_registry().checkpoint(st.session_state.session_id, st.session_state)
+
+
+def record_answer(q_id, chosen, is_correct):
+    """作答写入日志（不等落盘）；填了用户名的同时更新该题的复习时间"""
+    log = get_answer_log()
+    if log is None:
+        return
+    shown_idx, shown_at = st.session_state.shown_at
+    latency = time.time() - shown_at if shown_idx == st.session_state.current_idx else None
+    bank = quiz_bank()
+    log.submit(st.session_state.get("user", "").strip(), bank.key(q_id), chosen, is_correct, latency,
+               session=st.session_state.session_id, q_id=q_id, bank=bank.version)
 
 
 def restart():
@@ -280,36 +323,231 @@ def restart():
     st.rerun()
 
 
+def bank_editor():
+    """侧边栏的题库编辑框（打开开关后才渲染）"""
+    bank_text = get_bank_text()
+    edited_text = st.text_area("题库内容", value=bank_text, height=200)
+    if edited_text != bank_text:
+        st.session_state.custom_text = edited_text
+        st.session_state.custom_bank = load_and_parse_questions(edited_text)
+        st.session_state.spilled = False
+        if track_session() > get_session_registry().budget:
+            # 解析出的题库本身就超过单会话内存上限：不保留这次编辑
+            st.session_state.custom_text = st.session_state.custom_bank = None
+            st.session_state.custom_parser = None
+            st.error("题库过大，超出单个会话的内存上限，请部署为服务器题库文件（QUIZ_BANK）")
+            return
+        # 题号只对原来的题库有效，题库换了就回到设置页
+        st.session_state.quiz_state = 'setup'
+
+
+def source_filters():
+    """侧边栏的教材章节、页码筛选（按答案解析里的出处），返回 (章号集合, 页码区间)，不限时为 None"""
+    index = quiz_source.index_for(get_bank())
+    counts = index.chapter_counts()
+    if not counts:
+        return None, None
+    labels = {quiz_parser.chapter_label(c): c for c, _ in counts}
+    picked = st.multiselect("教材章节（不选为全部）", list(labels))
+    chapters = {labels[label] for label in picked} or None
+    pages = None
+    lo, hi = index.page_range() or (0, 0)
+    if hi > lo:
+        pages = st.slider("教材页码", lo, hi, (lo, hi))
+        if pages == (lo, hi):
+            pages = None
+    return chapters, pages
+
+
+def show_search(query):
+    """搜索结果：服务器题库的倒排索引随编译缓存加载；自己编辑的题库第一次搜索时才建"""
+    bank = get_bank()
+    results = quiz_search.search(bank, query, limit=20)
+    if not results:
+        st.info("没有找到相关题目")
+        return
+    st.caption(f"找到 {len(results)} 道相关题目")
+    labels = {'single': "单选", 'multi': "多选", 'judge': "判断"}
+    for i, _ in results:
+        q = bank.question(i)
+        with st.expander(f"【{labels[q['type']]}】{q['content']}"):
+            if q['type'] == 'judge':
+                st.write(f"**答案：** {'对' if q['answer'] == 'A' else '错'}")
+            else:
+                for k, v in sorted(q['options'].items()):
+                    st.write(f"{k}. {v}")
+                st.write(f"**答案：** {q['answer']}")
+            if q['explanation']:
+                st.caption(q['explanation'])
+
+
+@st.fragment
+@quiz_metrics.instrument('rerun', scope='fragment')
+def question_view():
+    """
+    题目卡片、选项和 提交/下一题：作为片段单独重跑，答题时不再重跑侧边栏和 CSS，
+    也不重新发送题库编辑框；只有整套题做完或题库失效时才整页重跑。
+    """
+    track_session()  # 片段重跑也算活跃，答题期间不会被当成空闲会话回收
+    if st.session_state.quiz_state != 'playing':
+        st.rerun()  # 刚做完最后一题：成绩单在片段之外，整页重跑一次
+    if quiz_bank() is None:
+        # 答题期间题库更新了好几版，原版本已淘汰：回到设置页（在片段之外，整页重跑），提示留到那边显示
+        st.session_state.bank_notice = "题库已更新，请重新开始测试"
+        st.session_state.quiz_state = 'setup'
+        st.rerun()
+
+    idx = st.session_state.current_idx
+    q_data = quiz_bank().question(st.session_state.quiz_ids[idx])
+    total = len(st.session_state.quiz_ids)
+    if st.session_state.shown_at[0] != idx:
+        # 记下这道题第一次显示的时间，提交时算作答用时
+        st.session_state.shown_at = (idx, time.time())
+
+    # 进度条
+    st.progress((idx + 1) / total)
+    st.caption(f"当前进度: {idx + 1}/{total}")
+
+    # 徽章逻辑
+    badge_type = "badge-single"
+    badge_label = "单选题"
+    if q_data['type'] == 'multi':
+        badge_type = "badge-multi";
+        badge_label = "多选题"
+    elif q_data['type'] == 'judge':
+        badge_type = "badge-judge";
+        badge_label = "判断题"
+
+    # 题目卡片
+    st.markdown(f"""
+    <div class="question-card">
+        <span class="badge {badge_type}">{badge_label}</span>
+        {q_data['content']}
+    </div>
+    """, unsafe_allow_html=True)
+
+    # 选项交互
+    user_ans = []
+
+    # --- 判断题特殊处理 ---
+    if q_data['type'] == 'judge':
+        # 判断题内部已转换为 A:对, B:错
+        choice = st.radio("请判断：", ["对", "错"], index=None, horizontal=True, key=f"q_{idx}",
+                          disabled=st.session_state.user_submitted)
+        if choice == '对': user_ans = ['A']
+        if choice == '错': user_ans = ['B']
+
+    # --- 单选题 ---
+    elif q_data['type'] == 'single':
+        opts = sorted(q_data['options'].items())
+        # 显示 A. xxx
+        display_opts = [f"{k}. {v}" for k, v in opts]
+        choice = st.radio("请选择：", display_opts, index=None, key=f"q_{idx}",
+                          disabled=st.session_state.user_submitted)
+        if choice: user_ans = [choice.split('.')[0]]
+
+    # --- 多选题 ---
+    elif q_data['type'] == 'multi':
+        st.write("请选择（多选）：")
+        opts = sorted(q_data['options'].items())
+        for k, v in opts:
+            if st.checkbox(f"{k}. {v}", key=f"q_{idx}_{k}", disabled=st.session_state.user_submitted):
+                user_ans.append(k)
+
+    # 提交按钮
+    st.markdown("---")
+    if not st.session_state.user_submitted:
+        st.button("提交答案", type="primary", use_container_width=True, on_click=submit_answer,
+                  args=(st.session_state.quiz_ids[idx], user_ans, q_data['answer']))
+        if st.session_state.pop('need_answer', False):
+            st.toast("⚠️ 请先完成作答", icon="⚠️")
+    else:
+        # 判分逻辑
+        u_str = "".join(sorted(user_ans))
+        c_str = q_data['answer']  # 此时已经是清洗过的 ABC...
+
+        is_correct = (u_str == c_str)
+
+        # 显示结果
+        if is_correct:
+            st.markdown(f'<div class="result-box success">✅ <b>回答正确！</b></div>', unsafe_allow_html=True)
+        else:
+            # 如果是判断题，显示中文对错，否则显示字母
+            display_correct = c_str
+            if q_data['type'] == 'judge':
+                display_correct = "对" if c_str == 'A' else "错"
+
+            st.markdown(f'<div class="result-box error">❌ <b>回答错误</b><br>正确答案：{display_correct}</div>',
+                        unsafe_allow_html=True)
+
+        # 全站统计：按题目标识直接查累计表，不扫作答日志
+        review = get_review_store()
+        stats = review.question_stats(quiz_bank().key(st.session_state.quiz_ids[idx])) if review else None
+        if stats and stats['attempts']:
+            note = f"📊 全站作答 {stats['attempts']} 次，正确率 {stats['correct'] / stats['attempts']:.0%}"
+            if stats['difficulty'] is not None:
+                note += f"，难度 {stats['difficulty']:+.2f}"
+            st.caption(note)
+
+        # 显示解析
+        if q_data['explanation']:
+            with st.expander("📖 查看详细解析", expanded=True):
+                st.write(q_data['explanation'])
+
+        # 翻页按钮
+        btn_txt = "下一题 ➡" if idx < total - 1 else "查看成绩单 🏁"
+        st.button(btn_txt, type="primary", use_container_width=True, on_click=next_question, args=(is_correct,))
+
+
 # ===========================
 # 4. 主界面
 # ===========================
 def main():
     init_session()
+    track_session()
 
     st.title("📝 习概刷题神器")
 
     # --- 侧边栏 ---
     with st.sidebar:
         st.header("⚙️ 题库设置")
-        if not st.session_state.raw_text:
+        has_bank = len(get_bank()) > 0
+        if not has_bank:
             st.warning("请上传 tiku.txt 或在下方粘贴")
 
-        with st.expander("📝 粘贴/编辑题库"):
-            st.session_state.raw_text = st.text_area("题库内容", value=st.session_state.raw_text, height=200)
+        # 整份题库文本只在打开编辑器时才发给浏览器（折叠的 expander 里的内容也会随页面发送）
+        if st.toggle("📝 粘贴/编辑题库", key="show_editor"):
+            bank_editor()
 
         st.divider()
         st.subheader("开始测试")
-        mode = st.selectbox("选择题型", ["单选题", "多选题", "判断题", "混合全练"])
+        mode = st.selectbox("选择题型", list(QUIZ_TYPES))
+        user = st.text_input("用户名（保存复习记录）", key="user").strip()
         num = st.slider("题目数量", 5, 200, 20)
+        tags = None
+        all_tags = get_bank().tags
+        if len(all_tags) > 1:
+            tags = st.multiselect("题库范围", all_tags, default=all_tags) or None
+        chapters, pages = source_filters()
 
         if st.button("🚀 开始生成试卷", use_container_width=True, type="primary"):
-            if st.session_state.raw_text:
-                start_quiz(mode, num)
+            if has_bank:
+                start_quiz(mode, num, tags, user, chapters, pages)
             else:
                 st.error("题库内容为空！")
 
+        usage = get_session_registry().stats()
+        st.caption(f"本进程 {usage['sessions']} 个活跃会话，自定义题库约占 {usage['bytes'] / 2 ** 20:.1f} MB")
+
     # --- 页面逻辑 ---
     if st.session_state.quiz_state == 'setup':
+        notice = st.session_state.pop('bank_notice', None)
+        if notice:
+            st.warning(notice)
+        query = st.text_input("🔍 搜索题目", placeholder="输入关键词，如：六个必须坚持", key="search").strip()
+        if query:
+            show_search(query)
+            return
         st.info("👈 请在左侧菜单栏配置并开始刷题")
         st.markdown("""
         ### 💡 2.0 版本更新说明
@@ -319,103 +557,12 @@ def main():
         """)
 
     elif st.session_state.quiz_state == 'playing':
-        idx = st.session_state.current_idx
-        q_data = st.session_state.quiz_list[idx]
-        total = len(st.session_state.quiz_list)
-
-        # 进度条
-        st.progress((idx + 1) / total)
-        st.caption(f"当前进度: {idx + 1}/{total}")
-
-        # 徽章逻辑
-        badge_type = "badge-single"
-        badge_label = "单选题"
-        if q_data['type'] == 'multi':
-            badge_type = "badge-multi";
-            badge_label = "多选题"
-        elif q_data['type'] == 'judge':
-            badge_type = "badge-judge";
-            badge_label = "判断题"
-
-        # 题目卡片
-        st.markdown(f"""
-        <div class="question-card">
-            <span class="badge {badge_type}">{badge_label}</span>
-            {q_data['content']}
-        </div>
-        """, unsafe_allow_html=True)
-
-        # 选项交互
-        user_ans = []
-
-        # --- 判断题特殊处理 ---
-        if q_data['type'] == 'judge':
-            # 判断题内部已转换为 A:对, B:错
-            choice = st.radio("请判断：", ["对", "错"], index=None, horizontal=True, key=f"q_{idx}",
-                              disabled=st.session_state.user_submitted)
-            if choice == '对': user_ans = ['A']
-            if choice == '错': user_ans = ['B']
-
-        # --- 单选题 ---
-        elif q_data['type'] == 'single':
-            opts = sorted(q_data['options'].items())
-            # 显示 A. xxx
-            display_opts = [f"{k}. {v}" for k, v in opts]
-            choice = st.radio("请选择：", display_opts, index=None, key=f"q_{idx}",
-                              disabled=st.session_state.user_submitted)
-            if choice: user_ans = [choice.split('.')[0]]
-
-        # --- 多选题 ---
-        elif q_data['type'] == 'multi':
-            st.write("请选择（多选）：")
-            opts = sorted(q_data['options'].items())
-            for k, v in opts:
-                if st.checkbox(f"{k}. {v}", key=f"q_{idx}_{k}", disabled=st.session_state.user_submitted):
-                    user_ans.append(k)
-
-        # 提交按钮
-        st.markdown("---")
-        if not st.session_state.user_submitted:
-            if st.button("提交答案", type="primary", use_container_width=True):
-                if not user_ans:
-                    st.toast("⚠️ 请先完成作答", icon="⚠️")
-                else:
-                    st.session_state.user_submitted = True
-                    st.rerun()
-        else:
-            # 判分逻辑
-            u_str = "".join(sorted(user_ans))
-            c_str = q_data['answer']  # 此时已经是清洗过的 ABC...
-
-            is_correct = (u_str == c_str)
-
-            # 显示结果
-            if is_correct:
-                st.markdown(f'<div class="result-box success">✅ <b>回答正确！</b></div>', unsafe_allow_html=True)
-            else:
-                # 如果是判断题，显示中文对错，否则显示字母
-                display_correct = c_str
-                if q_data['type'] == 'judge':
-                    display_correct = "对" if c_str == 'A' else "错"
-
-                st.markdown(f'<div class="result-box error">❌ <b>回答错误</b><br>正确答案：{display_correct}</div>',
-                            unsafe_allow_html=True)
-
-            # 显示解析
-            if q_data['explanation']:
-                with st.expander("📖 查看详细解析", expanded=True):
-                    st.write(q_data['explanation'])
-
-            # 翻页按钮
-            btn_txt = "下一题 ➡" if idx < total - 1 else "查看成绩单 🏁"
-            if st.button(btn_txt, type="primary", use_container_width=True):
-                if is_correct: st.session_state.score += 1
-                next_question()
+        question_view()
 
     elif st.session_state.quiz_state == 'finished':
         st.balloons()
         score = st.session_state.score
-        total = len(st.session_state.quiz_list)
+        total = len(st.session_state.quiz_ids)
         rate = score / total * 100
 
         st.markdown(f"""
@@ -434,4 +581,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with quiz_metrics.timed('rerun', scope='app'):
+        main()
@@ -0,0 +1,102 @@
+import time
+import weakref
+from array import array
+
+import numpy as np
+
+import quiz_cache
+
+# ===========================
+# 错题优先抽题（按错误率加权）
+# ===========================
+# 每题一个权重，放在与题号对齐的 numpy 数组里：平滑后的错误率 × 距上次作答的时间因子。
+# 抽题时对权重做一次前缀和，再用 searchsorted 一次性按权重抽一批下标，
+# 重复的去掉后不够再抽，整个过程都是向量化的，不逐题循环。
+
+DAY = 86400.0
+RECENCY_DAYS = 3.0   # 刚做过的题权重压低，约 3 天后恢复到 63%
+MIN_WEIGHT = 0.02    # 掌握得再好的题也保留一点被抽到的机会
+NEW_WEIGHT = 0.5     # 没做过的题按错误率 1/2 计
+
+_rng = np.random.default_rng()
+_layouts = weakref.WeakKeyDictionary()
+
+
+def _layout(bank):
+    """题库每题的题型码、分库码（与题号对齐的数组），每个题库对象只算一次"""
+    layout = _layouts.get(bank)
+    if layout is None:
+        types = np.zeros(len(bank), np.uint8)
+        tags = np.zeros(len(bank), np.uint16)
+        start = 0
+        for b, sub in enumerate(bank.banks):
+            for t, q_type in enumerate(quiz_cache.TYPES):
+                ids = np.frombuffer(sub.indices(q_type), np.uint32)
+                types[start + ids.astype(np.intp)] = t
+            tags[start:start + len(sub)] = b
+            start += len(sub)
+        layout = _layouts[bank] = (types, tags, {})
+    return layout
+
+
+def pool_mask(bank, q_types, tags):
+    """限定题型、分库后的 (题目掩码, 题数)，同一组条件只算一次"""
+    types, tag_codes, masks = _layout(bank)
+    cache_key = (tuple(q_types), None if tags is None else tuple(sorted(tags)))
+    mask = masks.get(cache_key)
+    if mask is None:
+        mask = np.isin(types, [quiz_cache.TYPES.index(t) for t in q_types])
+        if tags is not None:
+            mask &= np.isin(tag_codes, [b for b, tag in enumerate(bank.tags) if tag in tags])
+        mask = masks[cache_key] = (mask, int(np.count_nonzero(mask)))
+    return mask
+
+
+def error_weights(bank, stats, now=None):
+    """
+    每题的抽题权重 (float64 数组，长度为题库题数)。
+    stats 为 (题目标识, 作答次数, 答错次数, 最近作答时间) 的序列，见 ReviewStore.answer_stats。
+    """
+    now = time.time() if now is None else now
+    weights = np.full(len(bank), NEW_WEIGHT)
+    index = bank.key_index()
+    rows = [(index[key], n, wrong, last) for key, n, wrong, last in stats if key in index]
+    if rows:
+        ids, n, wrong, last = (np.array(col) for col in zip(*rows))
+        rate = (wrong + 1) / (n + 2)  # 拉普拉斯平滑，只做过一次的题不至于 0 或 1
+        recency = 1 - np.exp(-np.maximum(now - last, 0) / (RECENCY_DAYS * DAY))
+        weights[ids] = np.maximum(rate * recency, MIN_WEIGHT)
+    return weights
+
+
+def weighted_sample(bank, weights, q_types, k, tags=None, rng=_rng):
+    """
+    按权重不放回抽 k 道题（限定题型、分库），返回题目下标数组，与 bank.sample 相同。
+    权重只做一次前缀和（numpy 内一遍扫描），之后每轮抽取是 O(k log n) 的向量化 searchsorted。
+    """
+    mask, pool_size = pool_mask(bank, q_types, tags)
+    k = min(k, pool_size)
+    picks = np.empty(0, np.intp)
+    if k:
+        cdf = np.cumsum(weights * mask)
+        for _ in range(8):
+            need = k - len(picks)
+            if need <= 0 or not cdf[-1]:
+                break
+            # 多抽一些抵消重复；side='right' 保证权重为 0 的题不会被抽中
+            draws = np.searchsorted(cdf, rng.random(2 * need) * cdf[-1], side='right')
+            picks = np.concatenate((picks, np.minimum(draws, len(cdf) - 1)))
+            _, first = np.unique(picks, return_index=True)
+            picks = picks[np.sort(first)][:k]
+        need = k - len(picks)
+        if need > 0:
+            # 权重极度集中时重复太多：剩下的按去掉已选题后的权重直接抽
+            w = weights * mask
+            w[picks] = 0.0
+            rest = np.flatnonzero(w)
+            if len(rest) > need:
+                rest = rng.choice(rest, need, replace=False, p=w[rest] / w[rest].sum())
+            picks = np.concatenate((picks, rest))
+    ids = array('I')
+    ids.frombytes(picks.astype(np.uint32).tobytes())
+    return ids
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# 各模块都在仓库根目录下（没有包结构），测试从那里导入
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+TIKU = os.path.join(ROOT, 'tiku.txt')
+
+
+def read_tiku():
+    with open(TIKU, encoding='utf-8') as f:
+        return f.read()
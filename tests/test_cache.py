@@ -0,0 +1,103 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import quiz_bench
+import quiz_cache
+import quiz_parser
+import quiz_search
+import quiz_source
+
+
+@pytest.fixture
+def bank_file(tmp_path):
+    path = str(tmp_path / 'bank.txt')
+    quiz_bench.write_bank(path, 500, seed=5, tricky=0.3)
+    return path
+
+
+def _parsed(path):
+    return list(quiz_parser.iter_file_questions(path))
+
+
+def _same(bank, questions):
+    assert len(bank) == len(questions)
+    for i, q in enumerate(questions):
+        assert bank.question(i) == q
+        assert bank.type_of(i) == q['type']
+    assert bank.counts() == tuple(len(group) for group in quiz_parser.split_by_type(questions))
+
+
+def test_in_memory_round_trip(bank_file):
+    questions = _parsed(bank_file)
+    bank = quiz_cache.CompiledBank.from_questions(questions)
+    _same(bank, questions)
+    assert bank.split() == quiz_parser.split_by_type(questions)
+    assert [bank.key(i) for i in range(len(bank))] == \
+           [quiz_cache.ParsedBank(questions).key(i) for i in range(len(questions))]
+
+
+def test_build_and_reload(bank_file):
+    questions = _parsed(bank_file)
+    built = quiz_cache.load_bank(bank_file)
+    assert os.path.exists(quiz_cache.cache_path(bank_file))
+    _same(built, questions)
+    loaded = quiz_cache.load_bank(bank_file)
+    assert loaded.header == built.header
+    _same(loaded, questions)
+    built.close()
+    loaded.close()
+
+
+def test_indexes_match_fresh_build(bank_file):
+    questions = _parsed(bank_file)
+    bank = quiz_cache.load_bank(bank_file)
+    parsed = quiz_cache.ParsedBank(questions)
+    for query in ('中国特色社会主义', '新时代 发展', '人', '不存在的词组'):
+        assert quiz_search.search(bank, query) == quiz_search.search(parsed, query)
+    cached, fresh = quiz_source.index_for(bank), quiz_source.index_for(parsed)
+    assert np.array_equal(cached.chapter, fresh.chapter)
+    assert np.array_equal(cached.first, fresh.first)
+    assert np.array_equal(cached.last, fresh.last)
+    assert cached.documents.keys() == fresh.documents.keys()
+    for doc, ids in fresh.documents.items():
+        assert np.array_equal(cached.documents[doc], ids)
+
+
+def test_touch_keeps_cache(bank_file):
+    bank = quiz_cache.load_bank(bank_file)
+    sha = bank.header['sha256']
+    st = os.stat(bank_file)
+    os.utime(bank_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    again = quiz_cache.load_bank(bank_file)
+    assert again.header['sha256'] == sha
+    assert again.header['mtime_ns'] == st.st_mtime_ns + 10 ** 9
+
+
+def test_edit_rebuilds(bank_file):
+    quiz_cache.load_bank(bank_file)
+    with open(bank_file, 'a', encoding='utf-8') as f:
+        f.write("\n一、单项选择题\n999. 追加的题\nA. 甲\nB. 乙\n答案：A\n")
+    bank = quiz_cache.load_bank(bank_file)
+    questions = _parsed(bank_file)
+    assert questions[-1]['content'] == '追加的题'
+    _same(bank, questions)
+
+
+@pytest.mark.parametrize('damage', [b'', b'QBNK\xff\xff', b'junk' * 100])
+def test_damaged_cache_is_rebuilt(bank_file, damage):
+    with open(quiz_cache.cache_path(bank_file), 'wb') as f:
+        f.write(damage)
+    _same(quiz_cache.load_bank(bank_file), _parsed(bank_file))
+
+
+def test_copied_bank_rebuilds_key(bank_file, tmp_path):
+    quiz_cache.load_bank(bank_file)
+    moved = str(tmp_path / 'moved.txt')
+    shutil.copy(bank_file, moved)
+    shutil.copy(quiz_cache.cache_path(bank_file), quiz_cache.cache_path(moved))
+    bank = quiz_cache.load_bank(moved)
+    assert bank.header['source'] == os.path.abspath(moved)
+    _same(bank, _parsed(moved))
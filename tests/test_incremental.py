@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+import quiz_bench
+import quiz_parser
+from conftest import read_tiku
+
+# 随机编辑片段：题目开头、大标题、选项、答案行等都会碰到，覆盖跨片段、改题型的情况
+SNIPPETS = ['\n', '\n\n', '12.', '\n3. 新题干\nA. 甲\nB. 乙\n答案：A\n', '\n二、多项选择题\n',
+            '\n三、判断题\n', '\n四、简答题\n', '\n答案：对\n', '\nC. 新选项', '答案解析：补充', '．', ' A.', '改']
+
+
+def _random_edit(rng, text):
+    """在随机位置删除、插入或替换一段文字"""
+    a = rng.randrange(len(text) + 1)
+    b = min(len(text), a + rng.choice([0, 0, 1, 5, 40, 400]))
+    insert = rng.choice(SNIPPETS) if rng.random() < 0.8 else text[rng.randrange(len(text)):][:rng.randrange(200)]
+    return text[:a] + (insert if rng.random() < 0.7 else '') + text[b:]
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_random_edits_match_full_parse(seed):
+    rng = random.Random(seed)
+    text, _ = quiz_bench.generate_bank(300, seed=seed, tricky=0.3)
+    parser = quiz_parser.IncrementalParser(text)
+    assert parser.questions() == list(quiz_parser.iter_text_questions(text))
+    for _ in range(60):
+        text = _random_edit(rng, text)
+        parser.update(text)
+        assert parser.questions() == list(quiz_parser.iter_text_questions(text))
+
+
+def test_edits_on_tiku():
+    rng = random.Random(0)
+    text = read_tiku()
+    parser = quiz_parser.IncrementalParser(text)
+    for _ in range(30):
+        text = _random_edit(rng, text)
+        parser.update(text)
+        assert parser.questions() == list(quiz_parser.iter_text_questions(text))
+
+
+def test_unchanged_questions_are_reused():
+    text, _ = quiz_bench.generate_bank(200, seed=1, tricky=0)
+    parser = quiz_parser.IncrementalParser(text)
+    before = parser.questions()
+    at = text.index('\n', len(text) // 2)
+    assert parser.update(text[:at] + '改' + text[at:]) <= 3
+    after = parser.questions()
+    assert sum(a is b for a, b in zip(before, after)) >= len(before) - 2
+    assert parser.update(text[:at] + '改' + text[at:]) == 0
+
+
+def test_section_change_propagates():
+    text = "一、单项选择题\n1.甲\nA.a\nB.b\n答案：A\n2.乙\nA.a\nB.b\n答案：B\n"
+    parser = quiz_parser.IncrementalParser(text)
+    assert [q['type'] for q in parser.questions()] == ['single', 'single']
+    text = text.replace('一、单项选择题', '二、多项选择题')
+    parser.update(text)
+    assert [q['type'] for q in parser.questions()] == ['multi', 'multi']
+
+
+def test_copy_is_independent():
+    text, _ = quiz_bench.generate_bank(100, seed=2, tricky=0.2)
+    parser = quiz_parser.IncrementalParser(text)
+    other = parser.copy()
+    other.update(text + "\n99. 新题\nA. 甲\nB. 乙\n答案：A\n")
+    assert len(other.questions()) == len(parser.questions()) + 1
+    assert parser.questions() == list(quiz_parser.iter_text_questions(text))
+
+
+def test_crlf_input():
+    text, _ = quiz_bench.generate_bank(50, seed=4, tricky=0.2)
+    parser = quiz_parser.IncrementalParser(text.replace('\n', '\r\n'))
+    assert parser.questions() == list(quiz_parser.iter_text_questions(text))
@@ -0,0 +1,81 @@
+import io
+
+import pytest
+
+import quiz_bench
+import quiz_parser
+from conftest import read_tiku
+
+
+def _line_parse(text):
+    """只走逐行状态机的解析结果（快速通道的参照）"""
+    return list(quiz_parser.iter_questions(text.replace('\r\n', '\n').split('\n')))
+
+
+def _fields(questions, expected):
+    return [{k: q[k] for k in want} for q, want in zip(questions, expected)]
+
+
+@pytest.mark.parametrize('tricky', [0, 0.15, 0.4])
+def test_generated_bank(tricky):
+    text, expected = quiz_bench.generate_bank(600, seed=7, tricky=tricky)
+    questions = list(quiz_parser.iter_text_questions(text))
+    assert len(questions) == len(expected)
+    assert _fields(questions, expected) == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_fast_path_matches_line_parser(seed):
+    text, _ = quiz_bench.generate_bank(400, seed=seed, tricky=0.3)
+    assert list(quiz_parser.iter_text_questions(text)) == _line_parse(text)
+
+
+def test_fast_path_matches_line_parser_on_tiku():
+    text = read_tiku()
+    questions = list(quiz_parser.iter_text_questions(text))
+    assert questions
+    assert questions == _line_parse(text)
+
+
+def test_fast_path_normalizes_crlf_and_fullwidth_dot():
+    text = ("一、单项选择题\r\n1．题干\r\nA．甲\r\nB．乙\r\n答案：B\r\n答案解析：解析\r\n"
+            "三、判断题\r\n2. 判断\r\n答案：错\r\n")
+    single, multi, judge = quiz_parser.parse_text(text)
+    assert single == [{'type': 'single', 'id': '1', 'content': '题干', 'options': {'A': '甲', 'B': '乙'},
+                       'answer': 'B', 'explanation': '解析'}]
+    assert multi == []
+    assert judge[0]['answer'] == 'B' and judge[0]['options'] == {'A': '对', 'B': '错'}
+
+
+def test_glued_and_inline_options_fall_back():
+    text = "二、多项选择题\n1.题干 A.甲 B.乙\nC.丙 D.丁\n答案：ACD\n"
+    (q,) = list(quiz_parser.iter_text_questions(text))
+    assert q['content'] == '题干'
+    assert q['options'] == {'A': '甲', 'B': '乙', 'C': '丙', 'D': '丁'}
+    assert q['answer'] == 'ACD'
+
+
+@pytest.mark.parametrize('chunk_size', [64, 1000, 1 << 16])
+def test_stream_matches_whole_text(chunk_size):
+    text, _ = quiz_bench.generate_bank(300, seed=3, tricky=0.3)
+    streamed = list(quiz_parser.iter_stream_questions(io.StringIO(text), chunk_size=chunk_size))
+    assert streamed == list(quiz_parser.iter_text_questions(text))
+
+
+def test_format_round_trip():
+    text, _ = quiz_bench.generate_bank(200, seed=11, tricky=0.3)
+    questions = list(quiz_parser.iter_text_questions(text))
+    again = list(quiz_parser.iter_text_questions(quiz_parser.format_questions(questions)))
+    key = lambda q: (q['type'], q['content'], sorted(q['options'].items()), q['answer'], q['explanation'])
+    assert sorted(map(key, again)) == sorted(map(key, questions))
+
+
+def test_lines_after_answer():
+    # 有解析时折行接到解析后面；答案之后的选项行仍算选项；没有解析时其余行拼到题干 / 上一个选项
+    text = ("一、单项选择题\n1.题干\n答案：B\nA.甲\nB.乙\n答案解析：解\n释\nC.丙\n"
+            "2.题二\nA.a\nB.b\n答案：A\n续行\n三、判断题\n3.判断\n答案：对\n补充\n")
+    single, _, judge = quiz_parser.parse_text(text)
+    assert single[0]['options'] == {'A': '甲', 'B': '乙', 'C': '丙'}
+    assert single[0]['explanation'] == '解释'
+    assert single[1]['options'] == {'A': 'a', 'B': 'b 续行'}
+    assert judge[0]['content'] == '判断补充'